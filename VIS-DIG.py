@@ -7,144 +7,174 @@ from sqlalchemy.exc import OperationalError # Para manejar errores de conexión
 import logging # Para registrar eventos
 import tkinter as tk
 from tkinter import filedialog
+from cache_dimensiones import obtener_cache # Archivo local: cache_dimensiones.py
+from cargamasiva import insertar_con_ids # Archivo local: cargamasiva.py
+from bloqueos import seccion_critica # Archivo local: bloqueos.py
+from lectura_excel import leer_excels_en_paralelo # Archivo local: lectura_excel.py
+from registro_cargas import archivos_pendientes, registrar_cargas, forzar_recarga # Archivo local: registro_cargas.py
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-# ==============================
-# 1️⃣ Configuración PostgreSQL
-# ==============================
-usuario = 'postgres'
-contraseña = 'pasante'
-host = 'localhost'
-puerto = '5432'
-base_datos = 'digital'
-
-engine = create_engine(f'postgresql+psycopg2://{usuario}:{contraseña}@{host}:{puerto}/{base_datos}')
-
 
 # ==============================
-# 2️⃣ Seleccionar archivo Excel manualmente
+# 🧹 Normalización de cada hoja (corre en los procesos de lectura)
 # ==============================
-root = tk.Tk()
-root.withdraw()  # Ocultar ventana principal
-ruta_excel = filedialog.askopenfilename(
-    title="Seleccione un archivo Excel",
-    filetypes=[("Archivos Excel", "*.xlsx *.xls")]
-)
-
-if not ruta_excel:
-    sys.exit("❌ No se seleccionó ningún archivo.")
+def normalizar_hoja(df_hoja, mes_carpeta):
+    """Limpia una hoja de DIGITAL dejando los datos exactos del Excel."""
+    df_hoja.columns = [col.lower().strip() for col in df_hoja.columns]
 
-nombre_archivo = os.path.basename(ruta_excel)
-carpeta_principal = os.path.dirname(ruta_excel)
-mes_carpeta = os.path.basename(carpeta_principal).upper()  # Se puede tomar la carpeta como mes
+    # Mantener mes
+    if 'mes' not in df_hoja.columns:
+        df_hoja['mes'] = mes_carpeta
+    else:
+        df_hoja['mes'] = df_hoja['mes'].fillna(mes_carpeta).astype(str).str.strip().str.upper()
 
-df_list = []
+    # Mantener texto_extraido exactamente como en Excel
+    if 'texto_extraido' not in df_hoja.columns:
+        df_hoja['texto_extraido'] = ''
+    else:
+        df_hoja['texto_extraido'] = df_hoja['texto_extraido'].apply(lambda x: x.strip() if pd.notna(x) else '')
 
-# ==============================
-# 3️⃣ Leer hojas y mantener datos exactos
-# ==============================
-try:
-    hojas = pd.read_excel(ruta_excel, sheet_name=None, dtype=str)
-    for nombre_hoja, df_hoja in hojas.items():
-        df_hoja.columns = [col.lower().strip() for col in df_hoja.columns]
-
-        # Mantener mes
-        if 'mes' not in df_hoja.columns:
-            df_hoja['mes'] = mes_carpeta
-        else:
-            df_hoja['mes'] = df_hoja['mes'].fillna(mes_carpeta).astype(str).str.strip().str.upper()
-
-        # Mantener texto_extraido exactamente como en Excel
-        if 'texto_extraido' not in df_hoja.columns:
-            df_hoja['texto_extraido'] = ''
+    # Mantener identificacion y nombre_completo exactos
+    for col in ['identificacion','nombre_completo']:
+        if col not in df_hoja.columns:
+            df_hoja[col] = ''
         else:
-            df_hoja['texto_extraido'] = df_hoja['texto_extraido'].apply(lambda x: x.strip() if pd.notna(x) else '')
-
-        # Mantener identificacion y nombre_completo exactos
-        for col in ['identificacion','nombre_completo']:
-            if col not in df_hoja.columns:
-                df_hoja[col] = ''
-            else:
-                df_hoja[col] = df_hoja[col].apply(lambda x: x.strip() if pd.notna(x) else '')
-
-        # Celular
-        if 'celular' in df_hoja.columns:
-            df_hoja['celular'] = df_hoja['celular'].astype(str).str.replace(r'\.0$', '', regex=True)
-            df_hoja['celular'] = df_hoja['celular'].apply(lambda x: x if x.startswith('0') else '0'+x)
-
-        df_list.append(df_hoja)
-
-    total_registros = sum(len(df_hoja) for df_hoja in hojas.values())
-    print(f"✅ Leído {nombre_archivo} ({total_registros} filas) con mes {mes_carpeta}")
-except Exception as e:
-    raise SystemExit(f"⚠️ Error leyendo {nombre_archivo}: {e}")
-
-df = pd.concat(df_list, ignore_index=True)
-print(f"📊 Total registros combinados: {len(df)}")
-
-# ==============================
-# 4️⃣ Normalizar columnas adicionales
-# ==============================
-df['año'] = '2025'
-df['mes'] = df['mes'].str.replace(r'^\d{2}\.', '', regex=True).str.upper()
-
-# ==============================
-# 5️⃣ Obtener IDs de años y meses
-# ==============================
-anio_db = pd.read_sql('SELECT id_anio, valor FROM anio', engine)
-anio_db['valor'] = anio_db['valor'].astype(str).str.strip()
-mes_db = pd.read_sql('SELECT id_mes, nombre_mes FROM mes', engine)
-mes_db['nombre_mes'] = mes_db['nombre_mes'].astype(str).str.strip().str.upper()
-
-df = df.merge(anio_db, left_on='año', right_on='valor', how='left')
-df = df.merge(mes_db, left_on='mes', right_on='nombre_mes', how='left')
-
-if df['id_anio'].isnull().any() or df['id_mes'].isnull().any():
-    sys.exit("❌ Hay años o meses que no existen en la DB.")
-
-# ==============================
-# 6️⃣ Insertar periodos únicos
-# ==============================
-df_periodos = df[['id_anio','id_mes','texto_extraido']].drop_duplicates()
-df_periodos.to_sql('periodo_carga', engine, if_exists='append', index=False, method='multi')
-print(f"✅ Periodos únicos insertados: {len(df_periodos)}")
-
-# ==============================
-# 7️⃣ Asignar id_periodo con diccionario
-# ==============================
-df_periodos_db = pd.read_sql('SELECT * FROM periodo_carga', engine)
-periodo_map = df_periodos_db.set_index(['id_anio','id_mes','texto_extraido'])['id_periodo'].to_dict()
-df['id_periodo'] = df.apply(lambda row: periodo_map.get((row['id_anio'], row['id_mes'], row['texto_extraido'])), axis=1)
-
-# ==============================
-# 8️⃣ Insertar clientes EXACTAMENTE como en Excel
-# ==============================
-df_cliente = df[['identificacion','nombre_completo','celular']].copy()
-df_cliente.to_sql('cliente', engine, if_exists='append', index=False, method='multi')
-print(f"✅ Clientes insertados: {len(df_cliente)}")  
-
-# ==============================
-# 9️⃣ Asignar id_cliente fila a fila
-# ==============================
-df_clientes_db = pd.read_sql('SELECT id_cliente, identificacion, nombre_completo, celular FROM cliente', engine)
-excel_keys = list(zip(df['identificacion'], df['nombre_completo'], df['celular']))
-db_keys = list(zip(df_clientes_db['identificacion'], df_clientes_db['nombre_completo'], df_clientes_db['celular']))
-id_cliente_map = dict(zip(db_keys, df_clientes_db['id_cliente']))
-df['id_cliente'] = [id_cliente_map.get(k) for k in excel_keys]
-
-# ==============================
-# 🔟 Insertar cliente_plan_info
-# ==============================
-df_plan_info = df[['id_cliente','id_periodo']].copy()
-df_plan_info.to_sql('cliente_plan_info', engine, if_exists='append', index=False, method='multi')
-print(f"✅ Cliente_plan_info insertados: {len(df_plan_info)}")
-
-# ==============================
-# 1️⃣1️⃣ Resumen final por mes
-# ==============================
-resumen_mes = df.groupby('mes').size().reset_index(name='registros')
-print("\n📊 Registros por mes:")
-print(resumen_mes)
-
-print("\n🎉 ¡Carga completa en PostgreSQL con todos los registros exactos y vacíos respetados!")
+            df_hoja[col] = df_hoja[col].apply(lambda x: x.strip() if pd.notna(x) else '')
+
+    # Celular
+    if 'celular' in df_hoja.columns:
+        df_hoja['celular'] = df_hoja['celular'].astype(str).str.replace(r'\.0$', '', regex=True)
+        df_hoja['celular'] = df_hoja['celular'].apply(lambda x: x if x.startswith('0') else '0'+x)
+
+    return df_hoja
+
+
+def main():
+    """Carga de un Excel de DIGITAL elegido por el usuario."""
+    # ==============================
+    # 1️⃣ Configuración PostgreSQL
+    # ==============================
+    usuario = 'postgres'
+    contraseña = 'pasante'
+    host = 'localhost'
+    puerto = '5432'
+    base_datos = 'digital'
+
+    engine = create_engine(f'postgresql+psycopg2://{usuario}:{contraseña}@{host}:{puerto}/{base_datos}')
+
+    cache = obtener_cache(engine)
+
+
+    # ==============================
+    # 2️⃣ Seleccionar archivo Excel manualmente
+    # ==============================
+    root = tk.Tk()
+    root.withdraw()  # Ocultar ventana principal
+    ruta_excel = filedialog.askopenfilename(
+        title="Seleccione un archivo Excel",
+        filetypes=[("Archivos Excel", "*.xlsx *.xls")]
+    )
+
+    if not ruta_excel:
+        sys.exit("❌ No se seleccionó ningún archivo.")
+
+    # Omitir el archivo si ya está en load_ledger (salvo con --force)
+    pendientes = archivos_pendientes(engine, [ruta_excel], forzar=forzar_recarga())
+    if not pendientes:
+        print("ℹ️ El archivo ya fue cargado. Use --force para recargarlo.")
+        return
+
+    nombre_archivo = os.path.basename(ruta_excel)
+    carpeta_principal = os.path.dirname(ruta_excel)
+    mes_carpeta = os.path.basename(carpeta_principal).upper()  # Se puede tomar la carpeta como mes
+
+    df_list = []
+
+    # ==============================
+    # 3️⃣ Leer hojas y mantener datos exactos
+    # ==============================
+    try:
+        # Cada hoja se lee y limpia en su propio proceso
+        resultado = leer_excels_en_paralelo([(ruta_excel, {'mes_carpeta': mes_carpeta})], normalizar_hoja, por_hoja=True)[0]
+        if resultado['error'] is not None:
+            raise resultado['error']
+        df_list.extend(df_hoja for _, df_hoja in resultado['hojas'])
+        print(f"✅ Leído {nombre_archivo} ({resultado['filas']} filas) con mes {mes_carpeta} en {resultado['segundos']:.2f} s")
+    except Exception as e:
+        raise SystemExit(f"⚠️ Error leyendo {nombre_archivo}: {e}")
+
+    df = pd.concat(df_list, ignore_index=True)
+    print(f"📊 Total registros combinados: {len(df)}")
+
+    # ==============================
+    # 4️⃣ Normalizar columnas adicionales
+    # ==============================
+    df['año'] = '2025'
+    df['mes'] = df['mes'].str.replace(r'^\d{2}\.', '', regex=True).str.upper()
+
+    # ==============================
+    # 5️⃣ Obtener IDs de años y meses
+    # ==============================
+    anio_db = cache.tabla(engine, 'anio')
+    mes_db = cache.tabla(engine, 'mes')
+
+    df = df.merge(anio_db, left_on='año', right_on='valor', how='left')
+    df = df.merge(mes_db, left_on='mes', right_on='nombre_mes', how='left')
+
+    if df['id_anio'].isnull().any() or df['id_mes'].isnull().any():
+        sys.exit("❌ Hay años o meses que no existen en la DB.")
+
+    # ==============================
+    # 6️⃣ Insertar periodos únicos
+    # ==============================
+    df_periodos = df[['id_anio','id_mes','texto_extraido']].drop_duplicates()
+    # Solo los períodos que aún no existen (antes se duplicaban en cada ejecución)
+    # Con el bloqueo de periodo_carga: otra carga simultánea no inserta el mismo período
+    with seccion_critica(engine, 'periodo_carga') as conn:
+        df_periodos_db = pd.read_sql('SELECT id_anio, id_mes, texto_extraido FROM periodo_carga', conn)
+        df_periodos = df_periodos.merge(df_periodos_db, on=['id_anio','id_mes','texto_extraido'], how='left', indicator=True)
+        df_periodos = df_periodos[df_periodos['_merge'] == 'left_only'].drop(columns='_merge')
+        df_periodos.to_sql('periodo_carga', conn, if_exists='append', index=False, method='multi')
+        df_periodos_db = pd.read_sql('SELECT * FROM periodo_carga', conn)
+    print(f"✅ Periodos nuevos insertados: {len(df_periodos)}")
+
+    # ==============================
+    # 7️⃣ Asignar id_periodo con diccionario
+    # ==============================
+    periodo_map = df_periodos_db.set_index(['id_anio','id_mes','texto_extraido'])['id_periodo'].to_dict()
+    df['id_periodo'] = df.apply(lambda row: periodo_map.get((row['id_anio'], row['id_mes'], row['texto_extraido'])), axis=1)
+
+    # ==============================
+    # 8️⃣ Insertar clientes EXACTAMENTE como en Excel
+    # ==============================
+    df_cliente = df[['identificacion','nombre_completo','celular']].copy()
+    # id_cliente reservado de la secuencia: no se busca por contenido en cliente
+    # Clientes, cliente_plan_info y load_ledger en UNA transacción: si algo
+    # falla no queda nada a medias y el archivo se vuelve a cargar completo
+    pendientes[0]['filas'] = len(df)
+    with engine.begin() as conn:
+        df['id_cliente'] = insertar_con_ids(df_cliente, 'cliente', 'id_cliente', conn)
+        print(f"✅ Clientes insertados: {len(df_cliente)}")
+
+        # 🔟 Insertar cliente_plan_info
+        df_plan_info = df[['id_cliente','id_periodo']].copy()
+        df_plan_info.to_sql('cliente_plan_info', conn, if_exists='append', index=False, method='multi')
+        print(f"✅ Cliente_plan_info insertados: {len(df_plan_info)}")
+
+        # Registrar el archivo en load_ledger para no volver a cargarlo
+        registrar_cargas(conn, pendientes, df['id_periodo'])
+
+    # ==============================
+    # 1️⃣1️⃣ Resumen final por mes
+    # ==============================
+    resumen_mes = df.groupby('mes').size().reset_index(name='registros')
+    print("\n📊 Registros por mes:")
+    print(resumen_mes)
+
+    print("\n🎉 ¡Carga completa en PostgreSQL con todos los registros exactos y vacíos respetados!")
+
+
+# Necesario para ProcessPoolExecutor: los procesos hijos importan este archivo
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 import tkinter as tk  # Interfaz gráfica
-from tkinter import messagebox  # Mensajes emergentes
-import subprocess  # Ejecutar scripts
+from tkinter import messagebox, ttk, scrolledtext  # Mensajes emergentes, tabla y salida de la cola
+import queue  # Eventos de la cola de cargas
 import os  # Manejo de rutas
-import sys  # Manejo de sistema
+from ejecutor_cargas import IndiceScripts, EjecutorCargas, FINALIZADO, ERROR  # Archivo local: ejecutor_cargas.py
 
 # ======================================
 # Diccionario de scripts
@@ -19,42 +19,131 @@ scripts_objetivo = {
 }
 
 # ======================================
-# Buscar script (con ruta fija de Movistar)
+# Índice de scripts y cola de cargas
 # ======================================
-def buscar_script(nombre_script):
-
-    movistar_path = r"C:\Users\pasante.ti2\Desktop\cargarBases-20250917T075622Z-1-001\Bases.Movi"
+# Primero la carpeta de MOVISTAR, luego la carpeta normal del programa.
+# Se recorren una sola vez (no en cada clic)
+movistar_path = r"C:\Users\pasante.ti2\Desktop\cargarBases-20250917T075622Z-1-001\Bases.Movi"
+base_dir = os.path.dirname(os.path.abspath(__file__))
+indice_scripts = IndiceScripts([movistar_path, base_dir])
 
-    # 1️⃣ Buscar primero en MOVISTAR
-    for root, _, files in os.walk(movistar_path):
-        if nombre_script in files:
-            return os.path.join(root, nombre_script)
+# Varias cargas a la vez (p. ej. Pospago + Pyme + Movistar Digital)
+ejecutor = EjecutorCargas(indice_scripts)
 
-    # 2️⃣ Buscar en la carpeta normal del programa
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    for root, _, files in os.walk(base_dir):
-        if nombre_script in files:
-            return os.path.join(root, nombre_script)
-
-    return None
+def buscar_script(nombre_script):
+    return indice_scripts.buscar(nombre_script)
 
 # ======================================
-# Ejecutar script
+# Encolar script (sin bloquear la ventana)
 # ======================================
 def ejecutar_script(nombre_logico):
     nombre_script = scripts_objetivo[nombre_logico]
-    ruta = buscar_script(nombre_script)
-
-    if not ruta:
+    try:
+        ejecutor.encolar(nombre_logico, nombre_script)
+    except FileNotFoundError:
         messagebox.showerror("❌ Error", f"No se encontró '{nombre_script}'.")
         return
+    mostrar_cola()
 
+# ======================================
+# Ventana de la cola: estado, duración y salida de cada carga
+# ======================================
+ventana_cola = None
+tabla_cola = None
+texto_salida = None
+
+def formato_duracion(segundos):
+    minutos, segundos = divmod(int(segundos), 60)
+    return f"{minutos:02d}:{segundos:02d}"
+
+def mostrar_cola():
+    global ventana_cola, tabla_cola, texto_salida
+    if ventana_cola is not None and ventana_cola.winfo_exists():
+        ventana_cola.deiconify()
+        ventana_cola.lift()
+        return
+
+    ventana_cola = tk.Toplevel(ventana)
+    ventana_cola.title("📋 Cola de cargas")
+    ventana_cola.geometry("760x460")
+
+    tabla_cola = ttk.Treeview(ventana_cola, columns=("carga", "estado", "duracion", "etapa"),
+                              show="headings", height=6)
+    for columna, titulo, ancho in [("carga", "Carga", 150), ("estado", "Estado", 90),
+                                   ("duracion", "Duración", 70), ("etapa", "Etapa actual", 430)]:
+        tabla_cola.heading(columna, text=titulo)
+        tabla_cola.column(columna, width=ancho, anchor="w")
+    tabla_cola.pack(fill="x", padx=10, pady=(10, 5))
+    tabla_cola.bind("<<TreeviewSelect>>", lambda _: mostrar_salida())
+
+    texto_salida = scrolledtext.ScrolledText(ventana_cola, font=("Consolas", 9), height=18)
+    texto_salida.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+
+    for trabajo in ejecutor.trabajos:
+        actualizar_fila(trabajo)
+
+def trabajo_seleccionado():
+    seleccion = tabla_cola.selection()
+    if not seleccion:
+        return None
+    return ejecutor.trabajos[int(seleccion[0]) - 1]
+
+def mostrar_salida():
+    trabajo = trabajo_seleccionado()
+    texto_salida.delete("1.0", "end")
+    if trabajo is not None:
+        texto_salida.insert("end", "\n".join(trabajo.lineas) + "\n")
+        if trabajo.estado in (FINALIZADO, ERROR):
+            texto_salida.insert("end", resumen_trabajo(trabajo))
+        texto_salida.see("end")
+
+def resumen_trabajo(trabajo):
+    resumen = f"\n⏱️ {trabajo.nombre}: {trabajo.estado} en {formato_duracion(trabajo.duracion())}\n"
+    etapas = trabajo.resumen_etapas()
+    return resumen + (f"⏱️ Etapas más lentas:\n{etapas}\n" if etapas else "")
+
+def actualizar_fila(trabajo):
+    if tabla_cola is None or not tabla_cola.winfo_exists():
+        return
+    valores = (trabajo.nombre, trabajo.estado, formato_duracion(trabajo.duracion()), trabajo.etapa)
+    iid = str(trabajo.id)
+    if tabla_cola.exists(iid):
+        tabla_cola.item(iid, values=valores)
+    else:
+        tabla_cola.insert("", "end", iid=iid, values=valores)
+        tabla_cola.selection_set(iid)
+
+def revisar_eventos():
+    """Lee los eventos de los trabajadores desde el hilo de Tk."""
     try:
-        messagebox.showinfo("⏳ Ejecutando", f"Iniciando {nombre_script}...")
-        subprocess.run([sys.executable, ruta], check=True)
-        messagebox.showinfo("✅ Finalizado", f"{nombre_script} se ejecutó correctamente.")
-    except subprocess.CalledProcessError as e:
-        messagebox.showerror("⚠️ Error", f"Ocurrió un error ejecutando {nombre_script}\n\n{e}")
+        while True:
+            tipo, trabajo, dato = ejecutor.eventos.get_nowait()
+            actualizar_fila(trabajo)
+            seleccionado = tabla_cola is not None and tabla_cola.winfo_exists() and trabajo_seleccionado() is trabajo
+            if tipo == 'linea' and seleccionado:
+                texto_salida.insert("end", dato + "\n")
+                texto_salida.see("end")
+            elif tipo == 'estado' and dato in (FINALIZADO, ERROR):
+                if seleccionado:
+                    texto_salida.insert("end", resumen_trabajo(trabajo))
+                    texto_salida.see("end")
+                if dato == ERROR:
+                    messagebox.showerror("⚠️ Error", f"Ocurrió un error ejecutando {trabajo.nombre} "
+                                                    f"(código {trabajo.codigo}).")
+    except queue.Empty:
+        pass
+
+    # Duración de lo que sigue en cola o ejecutándose
+    for trabajo in ejecutor.en_curso():
+        actualizar_fila(trabajo)
+    ventana.after(300, revisar_eventos)
+
+def cerrar_aplicacion():
+    if ejecutor.en_curso() and not messagebox.askyesno(
+            "⚠️ Cargas en curso", "Hay cargas en cola o ejecutándose. ¿Cerrar y detenerlas?"):
+        return
+    ejecutor.cerrar()
+    ventana.destroy()
 
 # ======================================
 # Función volver al menú
@@ -71,6 +160,7 @@ ventana = tk.Tk()
 ventana.title("🚀 Cargador de Bases")
 ventana.geometry("440x420")
 ventana.resizable(False, False)
+ventana.protocol("WM_DELETE_WINDOW", cerrar_aplicacion)
 
 canvas = tk.Canvas(ventana, width=440, height=420, highlightthickness=0)
 canvas.pack(fill="both", expand=True)
@@ -175,4 +265,9 @@ tk.Button(movistar_frame, text="🔙 Volver", font=("Segoe UI Semibold", 11),
           bg="#FFD4D4", fg="black",
           command=volver_menu).pack(pady=30)
 
+tk.Button(menu_frame, text="📋 Ver cola de cargas", font=("Segoe UI", 10),
+          bg="#FDFFDE", fg="#320773", relief="flat",
+          command=mostrar_cola).pack(pady=(5, 0))
+
+ventana.after(300, revisar_eventos)
 ventana.mainloop()
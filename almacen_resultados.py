@@ -0,0 +1,205 @@
+import pandas as pd # Requiere: pip install pandas pyarrow
+import logging # Para logging
+import os # Archivos del almacén
+import re # Validación de tokens
+import importlib.util # Saber si pyarrow está instalado sin importarlo
+import secrets # Tokens impredecibles
+import tempfile # Carpeta temporal del sistema
+import threading # Limpieza desde varios hilos de Flask
+import time # TTL de los resultados
+
+
+# ==============================
+# Almacén de resultados por token (descargas de /buscar)
+# ==============================
+# Cada búsqueda guarda su resultado completo en un archivo propio
+# <token>.parquet y la página de resultados enlaza la descarga con ese
+# token: dos usuarios nunca comparten archivo. Los archivos vencen a los TTL
+# segundos y, si la carpeta pasa de MAX_BYTES, se borran los más antiguos.
+# Sin pyarrow se guardan como pickle (mismo token, extensión .pkl).
+CARPETA = os.environ.get('RESULTADOS_DIR') or os.path.join(tempfile.gettempdir(), 'bases_completas_resultados')
+TTL = float(os.environ.get('RESULTADOS_TTL', 0)) or 3600.0
+MAX_BYTES = int(float(os.environ.get('RESULTADOS_MB', 0)) or 1024) * 1024 * 1024
+EXTENSIONES = ('.parquet', '.pkl')
+TOKEN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+_lock = threading.Lock()
+
+PARQUET = importlib.util.find_spec('pyarrow') is not None
+if not PARQUET:
+    logging.warning("⚠️ pyarrow no está instalado: los resultados se guardan como pickle.")
+
+
+def _ruta(token, extension):
+    return os.path.join(CARPETA, token + extension)
+
+
+def _archivos():
+    """(ruta, bytes, fecha de modificación) de los resultados guardados."""
+    if not os.path.isdir(CARPETA):
+        return []
+    archivos = []
+    for nombre in os.listdir(CARPETA):
+        if nombre.endswith(EXTENSIONES + ('.tmp',)):
+            ruta = os.path.join(CARPETA, nombre)
+            try:
+                info = os.stat(ruta)
+            except OSError:
+                continue
+            archivos.append((ruta, info.st_size, info.st_mtime))
+    return archivos
+
+
+def limpiar():
+    """
+    Borra los resultados vencidos y, si hace falta espacio, los más antiguos.
+    Los .tmp vigentes se están escribiendo (guardar_lotes): no se cuentan ni
+    se borran; solo se borran cuando ya pasaron el TTL (quedaron abandonados).
+    """
+    with _lock:
+        ahora = time.time()
+        vigentes = []
+        for ruta, tamano, fecha in _archivos():
+            if ahora - fecha > TTL:
+                _borrar(ruta)
+            elif not ruta.endswith('.tmp'):
+                vigentes.append((ruta, tamano, fecha))
+
+        total = sum(tamano for _, tamano, _ in vigentes)
+        for ruta, tamano, _ in sorted(vigentes, key=lambda a: a[2]):
+            if total <= MAX_BYTES:
+                break
+            _borrar(ruta)
+            total -= tamano
+
+
+def _borrar(ruta):
+    # Ya borrado por otro hilo, o en uso (Windows): queda para la próxima limpieza
+    try:
+        os.remove(ruta)
+    except OSError as e:
+        if not isinstance(e, FileNotFoundError):
+            logging.warning(f"⚠️ No se pudo borrar {ruta}: {e}")
+
+
+def guardar(df):
+    """Guarda `df` y retorna su token."""
+    os.makedirs(CARPETA, exist_ok=True)
+    token = secrets.token_urlsafe(24)
+    extension = EXTENSIONES[0] if PARQUET else EXTENSIONES[1]
+    ruta = _ruta(token, extension)
+
+    # Se escribe con otro nombre y se renombra: nadie lee un archivo a medias
+    temporal = ruta + '.tmp'
+    if PARQUET:
+        df.to_parquet(temporal, index=False)
+    else:
+        df.to_pickle(temporal)
+    os.replace(temporal, ruta)
+
+    limpiar()
+    return token
+
+
+def _encontrar(token):
+    """Ruta vigente del resultado de `token`, o None."""
+    if not token or not TOKEN.match(token):
+        return None
+    for extension in EXTENSIONES:
+        ruta = _ruta(token, extension)
+        try:
+            if time.time() - os.stat(ruta).st_mtime <= TTL:
+                return ruta
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def existe(token):
+    return _encontrar(token) is not None
+
+
+def cargar(token):
+    """El DataFrame guardado con `token`, o None si no existe o ya venció."""
+    ruta = _encontrar(token)
+    if ruta is None:
+        return None
+    try:
+        df = pd.read_parquet(ruta) if ruta.endswith('.parquet') else pd.read_pickle(ruta)
+    except FileNotFoundError:
+        # Lo borró la limpieza entre la búsqueda y la lectura
+        return None
+    logging.info(f"📦 Resultado {token[:8]}… leído del almacén ({len(df)} filas).")
+    return df
+
+
+# ==============================
+# Resultados grandes por lotes (solo con pyarrow)
+# ==============================
+# Para las consultas de ciclo: el token es la huella de la consulta, así
+# que todos los que piden el mismo resultado leen el mismo archivo.
+def _tabla(pa, columnas, filas, esquema=None):
+    datos = {c: list(v) for c, v in zip(columnas, zip(*filas))} if filas else {c: [] for c in columnas}
+    if esquema is not None:
+        return pa.table(datos, schema=esquema)
+    tabla = pa.table(datos)
+    # Columnas sin ningún valor en el primer lote: texto
+    campos = [pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in tabla.schema]
+    return tabla.cast(pa.schema(campos))
+
+
+def guardar_lotes(token, lotes_filas):
+    """
+    Escribe los lotes (columnas, filas) en <token>.parquet a medida que
+    llegan, con memoria constante. Retorna el número de filas.
+    """
+    import pyarrow as pa # Requiere: pip install pyarrow
+    import pyarrow.parquet as pq # Escritura por grupos de filas
+
+    if not TOKEN.match(token):
+        raise ValueError(f"Token inválido: {token}")
+    os.makedirs(CARPETA, exist_ok=True)
+    ruta = _ruta(token, '.parquet')
+    temporal = ruta + '.tmp'
+
+    escritor, total = None, 0
+    try:
+        for columnas, filas in lotes_filas:
+            filas = list(filas)
+            tabla = _tabla(pa, columnas, filas, escritor.schema if escritor else None)
+            if escritor is None:
+                escritor = pq.ParquetWriter(temporal, tabla.schema)
+            escritor.write_table(tabla)
+            total += len(filas)
+        escritor.close()
+        os.replace(temporal, ruta)
+    except BaseException:
+        if escritor is not None:
+            escritor.close()
+        _borrar(temporal)
+        raise
+
+    logging.info(f"📦 Resultado {token[:8]}… guardado en el almacén ({total} filas).")
+    limpiar()
+    return total
+
+
+def lotes_guardados(token, lote=20000):
+    """Lee <token>.parquet por lotes (columnas, filas); None si no está."""
+    ruta = _encontrar(token)
+    if ruta is None or not ruta.endswith('.parquet'):
+        return None
+    import pyarrow.parquet as pq # Lectura por lotes
+
+    archivo = pq.ParquetFile(ruta)
+
+    def _lotes():
+        columnas = archivo.schema_arrow.names
+        vacio = True
+        for batch in archivo.iter_batches(batch_size=lote):
+            vacio = False
+            yield columnas, list(zip(*(c.to_pylist() for c in batch.columns)))
+        if vacio:
+            yield columnas, []
+
+    return _lotes()
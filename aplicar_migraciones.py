@@ -0,0 +1,161 @@
+import argparse # Argumentos de línea de comandos
+import hashlib # Suma de control de cada migración
+import logging # Para logging
+import os # Rutas de las migraciones
+import re # Versión y nombre desde el nombre del archivo
+import time # Duración de cada migración
+from sqlalchemy import create_engine, text # Requiere: pip install sqlalchemy psycopg2-binary
+from sqlalchemy.engine import URL # Para construir la URL de conexión
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+# ==============================
+# Migraciones versionadas (carpeta migraciones/)
+# ==============================
+# Uso: python aplicar_migraciones.py [base ...] [--listar]
+# Cada archivo NNN_nombre.sql se aplica una sola vez por base, en orden de
+# versión, y queda registrado en schema_migraciones. Las sentencias se
+# ejecutan fuera de transacción (CREATE INDEX CONCURRENTLY lo requiere),
+# por eso cada una debe poder repetirse (IF NOT EXISTS).
+CARPETA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migraciones')
+PATRON = re.compile(r"^(\d+)_(\w+)\.sql$")
+# Nombre del índice de cada CREATE INDEX de una migración
+PATRON_INDICE = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.IGNORECASE
+)
+
+usuario = "analista"
+contraseña = "2025Anal1st@"
+host = "192.168.10.116"
+puerto = 5432
+BASES = ['BcorpPymePrueba', 'BcorpPostPrueba', 'BcorpPrePrueba']
+
+DDL_REGISTRO = """
+    CREATE TABLE IF NOT EXISTS schema_migraciones (
+        version INTEGER PRIMARY KEY,
+        nombre TEXT NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        fecha_aplicada TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def listar(carpeta=CARPETA):
+    """Migraciones de la carpeta como dicts {version, nombre, ruta, sql, checksum}, ordenadas."""
+    migraciones = []
+    for archivo in sorted(os.listdir(carpeta)):
+        coincide = PATRON.match(archivo)
+        if not coincide:
+            continue
+        ruta = os.path.join(carpeta, archivo)
+        with open(ruta, encoding='utf-8') as f:
+            sql = f.read()
+        migraciones.append({
+            'version': int(coincide.group(1)),
+            'nombre': coincide.group(2),
+            'ruta': ruta,
+            'sql': sql,
+            'checksum': hashlib.sha256(sql.encode('utf-8')).hexdigest(),
+        })
+    return sorted(migraciones, key=lambda m: m['version'])
+
+
+def sentencias(sql):
+    """Sentencias de un archivo (sin comentarios de línea), separadas por ';'."""
+    sin_comentarios = "\n".join(linea for linea in sql.splitlines() if not linea.strip().startswith('--'))
+    return [s.strip() for s in sin_comentarios.split(';') if s.strip()]
+
+
+def indices_creados(sql):
+    """Nombres de los índices que crea una migración (sin mirar los comentarios)."""
+    return [nombre.lower() for sentencia in sentencias(sql) for nombre in PATRON_INDICE.findall(sentencia)]
+
+
+def indices_invalidos(conn, nombres):
+    """
+    Índices de `nombres` que quedaron INVALID (un CREATE INDEX CONCURRENTLY
+    interrumpido). Los inválidos ajenos a la migración no se revisan.
+    """
+    if not nombres:
+        return []
+    return conn.execute(text("""
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE NOT i.indisvalid AND n.nspname = current_schema()
+          AND c.relname = ANY(:nombres)
+    """), {"nombres": list(nombres)}).scalars().all()
+
+
+def ejecutar(conn, migracion):
+    """Ejecuta las sentencias de una migración en `conn` (en modo AUTOCOMMIT)."""
+    inicio = time.perf_counter()
+    for sentencia in sentencias(migracion['sql']):
+        conn.exec_driver_sql(sentencia)
+    invalidos = indices_invalidos(conn, indices_creados(migracion['sql']))
+    if invalidos:
+        # IF NOT EXISTS no los vuelve a crear: hay que borrarlos y reintentar
+        raise RuntimeError(f"Índices inválidos tras {migracion['nombre']}: {', '.join(invalidos)} (DROP INDEX y reintentar)")
+    return time.perf_counter() - inicio
+
+
+def aplicar(engine, migraciones=None):
+    """Aplica las migraciones pendientes en la base de `engine`. Retorna las versiones aplicadas."""
+    migraciones = listar() if migraciones is None else migraciones
+    base = engine.url.database
+    aplicadas = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(DDL_REGISTRO))
+        registradas = dict(conn.execute(text("SELECT version, checksum FROM schema_migraciones")).all())
+
+        for migracion in migraciones:
+            version = migracion['version']
+            if version in registradas:
+                if registradas[version].strip() != migracion['checksum']:
+                    logging.warning(f"⚠️ {base}: la migración {version} cambió después de aplicarse.")
+                continue
+
+            segundos = ejecutar(conn, migracion)
+            conn.execute(text("""
+                INSERT INTO schema_migraciones (version, nombre, checksum)
+                VALUES (:version, :nombre, :checksum)
+            """), {k: migracion[k] for k in ('version', 'nombre', 'checksum')})
+            logging.info(f"🧱 {base}: migración {version:03d} {migracion['nombre']} aplicada en {segundos:.1f} s")
+            aplicadas.append(version)
+
+    if not aplicadas:
+        logging.info(f"✅ {base}: sin migraciones pendientes.")
+    return aplicadas
+
+
+def crear_engine(base_datos):
+    url = URL.create(
+        drivername="postgresql+psycopg2",
+        username=usuario,
+        password=contraseña,
+        host=host,
+        port=puerto,
+        database=base_datos,
+    )
+    return create_engine(url, pool_pre_ping=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aplica las migraciones de la carpeta migraciones/.")
+    parser.add_argument('bases', nargs='*', default=BASES, help="Bases a migrar (por defecto las tres de app.py)")
+    parser.add_argument('--listar', action='store_true', help="Solo mostrar las migraciones disponibles")
+    args = parser.parse_args()
+
+    if args.listar:
+        for m in listar():
+            print(f"{m['version']:03d}  {m['nombre']}  ({len(sentencias(m['sql']))} sentencias)")
+        raise SystemExit(0)
+
+    for base_datos in args.bases:
+        engine = crear_engine(base_datos)
+        try:
+            aplicar(engine)
+        finally:
+            engine.dispose()
@@ -1,12 +1,22 @@
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import pandas as pd
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine import URL
 import logging
-import io
 from flask import send_file
 import traceback 
 import re
+import os
+import time
+import itertools
+import tempfile
+import threading
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from cache_resultados import CacheResultados, clave_valores
+import exportacion
+import almacen_resultados
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -31,6 +41,14 @@ map_base_to_id = {
     'prepago': 2
 }
 
+# Las tres bases se consultan a la vez; cada una tiene TIMEOUT_BASE segundos
+# desde que empieza su consulta. Si una base no responde a tiempo se muestran
+# los resultados de las demás. statement_timeout no cubre la conexión, que
+# tiene su propio límite (connect_timeout de libpq, en segundos enteros).
+TIMEOUT_BASE = float(os.environ.get('BUSCAR_TIMEOUT', 0)) or 10.0
+TIMEOUT_CONEXION = int(os.environ.get('BUSCAR_TIMEOUT_CONEXION', 0)) or 5
+
+
 def create_engine_for(db_name):
     url = URL.create(
         drivername="postgresql+psycopg2",
@@ -40,7 +58,7 @@ def create_engine_for(db_name):
         port=puerto,
         database=db_name
     )
-    eng = create_engine(url, pool_pre_ping=True)
+    eng = create_engine(url, pool_pre_ping=True, connect_args={"connect_timeout": TIMEOUT_CONEXION})
     try:
         with eng.connect() as conn:
             logging.info(f"✅ Conexión OK → DB={db_name}")
@@ -52,67 +70,129 @@ def create_engine_for(db_name):
 # Crear engines para todas las bases
 engines = {name: create_engine_for(db) for name, db in map_nombres_bases.items()}
 
+# Resultados de /buscar y /buscar_ciclo (TTL + LRU, invalidado por las cargas).
+# Las versiones de las bases se releen en segundo plano desde el arranque.
+cache = CacheResultados()
+cache.versiones(engines)
+
 # ==============================
 # Función unificada de búsqueda
 # ==============================
-def buscar_en_bases_por_identificacion(valores, tipo):
-    resultados = pd.DataFrame()
 
+
+def query_busqueda(base, tipo):
+    filtro_mes_pyme = "AND m.id_mes >= 10" if base == "base_pyme" else ""
+
+    if tipo == '1':  # ORIGEN
+        return f"""
+            SELECT
+                c.identificacion,
+                c.celular,
+                c.nombre_completo,
+                a.valor AS año,
+                m.nombre_mes AS mes,
+                '{base}' AS origen
+            FROM cliente_plan_info cp
+            JOIN cliente c ON c.id_cliente = cp.id_cliente
+            JOIN periodo_carga p ON p.id_periodo = cp.id_periodo
+            JOIN anio a ON a.id_anio = p.id_anio
+            JOIN mes m ON m.id_mes = p.id_mes
+            WHERE (c.identificacion IN :valores OR c.celular IN :valores)
+            {filtro_mes_pyme}
+            ORDER BY c.identificacion, c.celular, a.valor, m.id_mes
+        """
+
+    # TITULARIDAD
+    return f"""
+        SELECT
+            c.identificacion,
+            c.celular,
+            c.nombre_completo,
+            p.nombre_base
+        FROM cliente_plan_info cp
+        JOIN cliente c ON c.id_cliente = cp.id_cliente
+        JOIN periodo_carga p ON cp.id_periodo = p.id_periodo
+        WHERE( c.identificacion IN :valores OR c.celular IN :valores)
+         {filtro_mes_pyme}
+        ORDER BY c.identificacion, c.celular
+    """
+
+
+def consultar_base(base, valores, tipo, inicios):
+    """
+    Consulta una base (en un hilo del pool). Anota en `inicios` cuándo
+    empezó: el plazo de la base corre desde ahí. Retorna (df, segundos).
+    """
+    inicio = inicios[base] = time.perf_counter()
+    with engines[base].begin() as conn:
+        # PostgreSQL cancela la consulta al vencer el plazo y libera el hilo
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(TIMEOUT_BASE * 1000)}")
+        df = pd.read_sql(text(query_busqueda(base, tipo)), conn, params={"valores": valores})
+    return df, time.perf_counter() - inicio
+
+
+def esperar_bases(futuros, inicios):
+    """
+    Espera las consultas {base: futuro} hasta que todas terminen o cada una
+    lleve TIMEOUT_BASE segundos desde que empezó (según `inicios`).
+    """
+    pendientes = dict(futuros)
+    while pendientes:
+        ahora = time.perf_counter()
+        # Una tarea que aún no empezó no tiene plazo corriendo
+        plazos = {base: inicios.get(base, ahora) + TIMEOUT_BASE for base in pendientes}
+        pendientes = {base: f for base, f in pendientes.items() if not f.done() and plazos[base] > ahora}
+        if pendientes:
+            restante = min(plazos[base] for base in pendientes) - ahora
+            wait(pendientes.values(), timeout=restante, return_when=FIRST_COMPLETED)
+
+
+def buscar_en_bases_por_identificacion(valores, tipo):
+    """
+    Busca `valores` en las tres bases a la vez. Retorna (resultados,
+    tiempos): `tiempos` tiene por base los segundos, las filas y el estado
+    ('ok', 'timeout' o 'error').
+    """
     # Convertir a tupla si viene como string
     if isinstance(valores, str):
         valores = tuple([v.strip() for v in valores.split(',')])
-    elif isinstance(valores, list):
+    else:
         valores = tuple(valores)
 
-    try:
-        for base, engine in engines.items():
-            if tipo == '1':  # ORIGEN
-                filtro_mes_pyme = "AND m.id_mes >= 10" if base == "base_pyme" else ""
-                
-                query = f"""
-                    SELECT
-                        c.identificacion,
-                        c.celular,
-                        c.nombre_completo,
-                        a.valor AS año,
-                        m.nombre_mes AS mes,
-                        '{base}' AS origen
-                    FROM cliente_plan_info cp
-                    JOIN cliente c ON c.id_cliente = cp.id_cliente
-                    JOIN periodo_carga p ON p.id_periodo = cp.id_periodo
-                    JOIN anio a ON a.id_anio = p.id_anio
-                    JOIN mes m ON m.id_mes = p.id_mes
-                    WHERE (c.identificacion IN :valores OR c.celular IN :valores)
-                    {filtro_mes_pyme}
-                    ORDER BY c.identificacion, c.celular, a.valor, m.id_mes
-                """
-                df = pd.read_sql(text(query), engine, params={"valores": tuple (valores)})
-
-            elif tipo == '2':  # TITULARIDAD
-                filtro_mes_pyme = "AND m.id_mes >= 10" if base == "base_pyme" else ""
-                query = f"""
-                    SELECT
-                        c.identificacion,
-                        c.celular,
-                        c.nombre_completo,
-                        p.nombre_base
-                    FROM cliente_plan_info cp
-                    JOIN cliente c ON c.id_cliente = cp.id_cliente
-                    JOIN periodo_carga p ON cp.id_periodo = p.id_periodo
-                    WHERE( c.identificacion IN :valores OR c.celular IN :valores)
-                     {filtro_mes_pyme}
-                    ORDER BY c.identificacion, c.celular
-                """
-                df = pd.read_sql(text(query), engine, params={"valores": tuple (valores)})
-
-
-            if not df.empty:
-                resultados = pd.concat([resultados, df], ignore_index=True)
-
-    except Exception as e:
-        logging.error(f"❌ Error consultando bases: {e}")
+    if tipo not in ('1', '2'):
+        return [], []
 
-    return resultados.to_dict(orient='records') if not resultados.empty else []
+    # Un pool por búsqueda: las búsquedas simultáneas no esperan en la cola
+    # de otra (eso contaba como plazo y daba 'timeout' en bases sanas)
+    inicios = {}
+    pool = ThreadPoolExecutor(max_workers=len(engines), thread_name_prefix='buscar')
+    try:
+        futuros = {base: pool.submit(consultar_base, base, valores, tipo, inicios) for base in engines}
+        esperar_bases(futuros, inicios)
+    finally:
+        # Sin esperar: una consulta vencida termina sola por statement_timeout
+        pool.shutdown(wait=False)
+
+    frames, tiempos = [], []
+    for base, futuro in futuros.items():  # mismo orden de siempre: pyme, pospago, prepago
+        transcurrido = time.perf_counter() - inicios.get(base, time.perf_counter())
+        if not futuro.done():
+            logging.warning(f"⏱️ {base}: sin respuesta en {TIMEOUT_BASE:.0f} s, se omite")
+            tiempos.append({'base': base, 'segundos': transcurrido, 'filas': 0, 'estado': 'timeout'})
+            continue
+        try:
+            df, segundos = futuro.result()
+        except Exception as e:
+            logging.error(f"❌ Error consultando {base}: {e}")
+            tiempos.append({'base': base, 'segundos': transcurrido, 'filas': 0, 'estado': 'error'})
+            continue
+        tiempos.append({'base': base, 'segundos': segundos, 'filas': len(df), 'estado': 'ok'})
+        if not df.empty:
+            frames.append(df)
+
+    logging.info("🔎 Búsqueda: " + ", ".join(f"{t['base']}={t['segundos']:.2f}s ({t['estado']})" for t in tiempos))
+    resultados = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return (resultados.to_dict(orient='records') if not resultados.empty else []), tiempos
 
 # ==============================
 # Rutas Flask
@@ -133,6 +213,9 @@ def buscar():
     
     valores_input = ""
     valores = []
+    tiempos = []
+    en_cache = False
+    token = None
 
     # SOLO leer valores cuando el usuario hace POST
     if request.method == 'POST':
@@ -144,14 +227,161 @@ def buscar():
             mensaje = "⚠️ Debes ingresar al menos una cédula o celular."
             return render_template('buscar.html', tipo=tipo, resultados=[], mensaje=mensaje, valores_input=valores_input)
 
-        # Ejecutar búsqueda
-        resultados = buscar_en_bases_por_identificacion(valores, tipo)
+        # Ejecutar búsqueda (o tomarla del caché)
+        clave = ('buscar', tipo, clave_valores(valores))
+        versiones = cache.versiones(engines)
+        guardado = cache.obtener(clave, versiones)
+        if guardado is not None:
+            resultados, tiempos, token = guardado
+            en_cache = True
+        else:
+            resultados, tiempos = buscar_en_bases_por_identificacion(valores, tipo)
+
+        # Resultado completo para los enlaces de descarga (archivo propio por token)
+        token_nuevo = bool(resultados) and not almacen_resultados.existe(token)
+        if token_nuevo:
+            token = almacen_resultados.guardar(pd.DataFrame(resultados))
 
-        if not resultados:
-            mensaje = "❌ No se encontraron resultados."
+        fallidas = [t['base'] for t in tiempos if t['estado'] != 'ok']
+        if fallidas:
+            mensaje = f"⚠️ Resultados parciales: sin respuesta de {', '.join(fallidas)}."
+        else:
+            # Los resultados parciales no se guardan
+            if not en_cache or token_nuevo:
+                cache.guardar(clave, (resultados, tiempos, token), versiones)
+            if not resultados:
+                mensaje = "❌ No se encontraron resultados."
 
     # GET: simplemente mostrar la página vacía
-    return render_template('buscar.html', tipo=tipo, resultados=resultados, mensaje=mensaje, valores_input=valores_input)
+    return render_template('buscar.html', tipo=tipo, resultados=resultados, mensaje=mensaje,
+                           valores_input=valores_input, tiempos=tiempos, en_cache=en_cache, token=token)
+
+
+# --------------------------------------------------------
+# Búsqueda por ciclo (pospago)
+# --------------------------------------------------------
+# Todos los años en una sola consulta. a.valor se compara sin ::text para
+# que pueda usar el índice único de anio.
+QUERY_CICLO = """
+    SELECT 
+        c.identificacion,
+        c.celular,
+        c.nombre_completo,
+        cp.id_ciclo AS ciclo,
+        a.valor AS anio
+    FROM cliente c
+    JOIN cliente_plan_info cp ON c.id_cliente = cp.id_cliente
+    JOIN periodo_carga p ON cp.id_periodo = p.id_periodo
+    JOIN anio a ON p.id_anio = a.id_anio
+    WHERE a.valor = ANY(:anios)
+      AND cp.id_ciclo = :ciclo
+"""
+
+
+# Total de la vista previa: sin la tabla cliente (id_cliente es FK), se
+# resuelve con el índice de cliente_plan_info (id_periodo, id_ciclo)
+QUERY_CONTEO_CICLO = """
+    SELECT COUNT(*)
+    FROM cliente_plan_info cp
+    JOIN periodo_carga p ON cp.id_periodo = p.id_periodo
+    JOIN anio a ON p.id_anio = a.id_anio
+    WHERE a.valor = ANY(:anios)
+      AND cp.id_ciclo = :ciclo
+      AND cp.id_cliente IS NOT NULL
+"""
+LIMITE_VISTA_PREVIA = 200
+
+# Resultado completo de cada consulta de ciclo, guardado en segundo plano
+# en almacen_resultados con su huella como token: la descarga lo lee de ahí
+# en lugar de repetir la consulta
+materializador = ThreadPoolExecutor(max_workers=2, thread_name_prefix='materializar')
+materializando = {}  # huella → futuro
+materializando_lock = threading.Lock()
+
+
+def params_ciclo(años, ciclo):
+    """Parámetros de QUERY_CICLO. ValueError (con el mensaje para el usuario) si faltan o no son válidos."""
+    if not años or not ciclo:
+        raise ValueError("⚠️ Seleccione al menos un año y un ciclo.")
+    if not str(ciclo).strip().isdecimal():
+        raise ValueError("⚠️ El ciclo debe ser un número.")
+    return {"anios": sorted({str(a) for a in años}), "ciclo": int(ciclo)}
+
+
+def huella_ciclo(params):
+    """
+    Huella de la consulta de ciclo: texto, parámetros y versión de los datos
+    de pospago. None si no se conoce la versión (no se usa lo guardado).
+    """
+    version = cache.version('pospago', engines['pospago'])
+    if version is None:
+        return None
+    contenido = json.dumps([QUERY_CICLO, params, version], sort_keys=True)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:32]
+
+
+def materializar_ciclo(params):
+    """Guarda en segundo plano el resultado completo (si no está ya o en curso)."""
+    if not almacen_resultados.PARQUET:
+        return
+    huella = huella_ciclo(params)
+    if huella is None:
+        return
+    with materializando_lock:
+        if huella in materializando or almacen_resultados.existe(huella):
+            return
+        futuro = materializador.submit(
+            almacen_resultados.guardar_lotes, huella, exportacion.lotes(engines['pospago'], QUERY_CICLO, params)
+        )
+        materializando[huella] = futuro
+
+    def _terminar(f):
+        with materializando_lock:
+            materializando.pop(huella, None)
+        if f.exception() is not None:
+            logging.error(f"❌ Error guardando el resultado {huella[:8]}…: {f.exception()}")
+    futuro.add_done_callback(_terminar)
+
+
+def lotes_ciclo(params):
+    """
+    Filas de la consulta de ciclo para descargar: del resultado guardado si
+    existe (esperando al que esté en curso), si no directamente de la base.
+    """
+    huella = huella_ciclo(params)
+    if huella is None:
+        return exportacion.lotes(engines['pospago'], QUERY_CICLO, params)
+    with materializando_lock:
+        futuro = materializando.get(huella)
+    if futuro is not None:
+        try:
+            futuro.result()
+        except Exception:
+            pass  # Ya se registró; se consulta la base
+    guardadas = almacen_resultados.lotes_guardados(huella)
+    if guardadas is not None:
+        logging.info(f"📦 Descarga de ciclo desde el resultado guardado {huella[:8]}…")
+        return guardadas
+    return exportacion.lotes(engines['pospago'], QUERY_CICLO, params)
+
+
+def catalogos_ciclo():
+    """
+    Años y ciclos de los select, leídos de las tablas anio y ciclo. Quedan en
+    el caché de resultados: se releen cuando una carga marca un cambio.
+    """
+    engine_pospago = engines['pospago']
+    clave = ('catalogos_ciclo',)
+    versiones = cache.versiones({'pospago': engine_pospago})
+    guardado = cache.obtener(clave, versiones)
+    if guardado is not None:
+        return guardado
+
+    with engine_pospago.connect() as conn:
+        años = conn.execute(text("SELECT valor FROM anio ORDER BY valor DESC")).scalars().all()
+        ciclos = conn.execute(text("SELECT id_ciclo FROM ciclo ORDER BY id_ciclo")).scalars().all()
+    cache.guardar(clave, (años, ciclos), versiones)
+    return años, ciclos
 
 
 @app.route('/buscar_ciclo', methods=['GET', 'POST'])
@@ -160,12 +390,10 @@ def buscar_ciclo():
 
     # Obtener listas para los select
     try:
-        with engine_pospago.connect() as conn:
-            años = pd.read_sql("SELECT DISTINCT valor FROM anio ORDER BY valor DESC", conn)
-            ciclos = pd.read_sql("SELECT DISTINCT id_ciclo FROM cliente_plan_info ORDER BY id_ciclo", conn)
+        años, ciclos = catalogos_ciclo()
     except Exception as e:
         logging.error(f"❌ Error cargando años/ciclos: {e}")
-        años = ciclos = pd.DataFrame()
+        años, ciclos = [], []
 
     año_sel = []
     ciclo_sel = None
@@ -176,40 +404,36 @@ def buscar_ciclo():
         año_sel = request.form.getlist('anio')  # lista de años
         ciclo_sel = request.form.get('ciclo')
 
-        if not año_sel or not ciclo_sel:
-            mensaje = "⚠️ Seleccione al menos un año y un ciclo."
-        else:
-            resultados_df = pd.DataFrame()
+        try:
+            params = params_ciclo(año_sel, ciclo_sel)
+        except ValueError as e:
+            params, mensaje = None, str(e)
+
+        if params is not None:
             try:
-                with engine_pospago.connect() as conn:
-                    for anio in año_sel:
-                        df = pd.read_sql(
-                            text("""
-                                SELECT 
-                                    c.identificacion,
-                                    c.celular,
-                                    c.nombre_completo,
-                                    cp.id_ciclo AS ciclo,
-                                    a.valor AS anio
-                                FROM cliente c
-                                JOIN cliente_plan_info cp ON c.id_cliente = cp.id_cliente
-                                JOIN periodo_carga p ON cp.id_periodo = p.id_periodo
-                                JOIN anio a ON p.id_anio = a.id_anio
-                                WHERE a.valor::text = :anio
-                                  AND cp.id_ciclo = :ciclo
-                            """),
-                            conn,
-                            params={"anio": str(anio), "ciclo": int(ciclo_sel)}
+                clave = ('buscar_ciclo', tuple(params['anios']), params['ciclo'])
+                versiones = cache.versiones({'pospago': engine_pospago})
+                guardado = cache.obtener(clave, versiones)
+                if guardado is not None:
+                    resultados, total = guardado
+                else:
+                    # Vista previa: solo LIMITE_VISTA_PREVIA filas y el conteo
+                    with engine_pospago.connect() as conn:
+                        resultados_df = pd.read_sql(
+                            text(QUERY_CICLO + f"    LIMIT {LIMITE_VISTA_PREVIA}"), conn, params=params
                         )
-                        if not df.empty:
-                            resultados_df = pd.concat([resultados_df, df], ignore_index=True)
+                        total = conn.execute(text(QUERY_CONTEO_CICLO), params).scalar()
+                    resultados = resultados_df.to_dict(orient='records')
+                    cache.guardar(clave, (resultados, total), versiones)
 
-                if resultados_df.empty:
+                if not total:
                     mensaje = "❌ No se encontraron registros."
                 else:
-                    # Limitar la vista previa a 200 registros
-                    resultados = resultados_df.head(200).to_dict(orient='records')
-                    mensaje = f"⚡ Mostrando {len(resultados)} de {len(resultados_df)} registros. Para ver todos, descargue el Excel."
+                    # El resultado completo se prepara mientras el usuario ve la vista previa
+                    if total > len(resultados):
+                        materializar_ciclo(params)
+                    origen = " (caché)" if guardado is not None else ""
+                    mensaje = f"⚡ Mostrando {len(resultados)} de {total} registros{origen}. Para ver todos, descargue el Excel."
 
             except Exception as e:
                 logging.error(f"❌ Error consulta ciclo-pospago: {e}")
@@ -217,60 +441,84 @@ def buscar_ciclo():
 
     return render_template(
         'buscar_ciclo.html',
-        años=años['valor'].tolist() if not años.empty else [],
-        ciclos=ciclos['id_ciclo'].tolist() if not ciclos.empty else [],
+        años=años,
+        ciclos=ciclos,
         año_sel=año_sel,
         ciclo_sel=ciclo_sel,
         resultados=resultados,
         mensaje=mensaje
     )
 
+# --------------------------------------------------------
+# Estado del caché de resultados
+# --------------------------------------------------------
+@app.route('/cache')
+def estado_cache():
+    return jsonify(cache.estadisticas())
+
+
+@app.route('/cache/invalidar', methods=['POST'])
+def invalidar_cache():
+    # Las cargas invalidan solas (cache_resultados.marcar_cambio); esto es para hacerlo a mano
+    cache.invalidar(request.args.get('ruta'))
+    return jsonify(cache.estadisticas())
+
+
+def enviar_excel(filas, nombre_archivo, mensaje_vacio):
+    """
+    Escribe los lotes `filas` en un xlsx temporal (en disco, no en memoria)
+    y lo envía; el archivo se borra al cerrar la respuesta.
+    """
+    temporal = tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False)
+    temporal.close()
+    try:
+        total = exportacion.escribir_excel(temporal.name, filas)
+    except Exception:
+        os.remove(temporal.name)
+        raise
+    if total == 0:
+        os.remove(temporal.name)
+        return mensaje_vacio, 404
+
+    respuesta = send_file(
+        temporal.name,
+        as_attachment=True,
+        download_name=nombre_archivo,
+        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+    respuesta.call_on_close(lambda: os.remove(temporal.name))
+    return respuesta
+
+
 @app.route('/descargar_excel')
 def descargar_excel():
     años = request.args.getlist("anio")  # múltiples años
     ciclo = request.args.get("ciclo")
+    formato = request.args.get("formato", "xlsx")  # xlsx | csv (csv.gz)
+    try:
+        params = params_ciclo(años, ciclo)
+    except ValueError as e:
+        return str(e), 400
+    nombre = f"base_anios_{'_'.join(params['anios'])}_ciclo_{params['ciclo']}"
 
     try:
-        engine = engines['pospago']
-
-        resultados_df = pd.DataFrame()
-        with engine.connect() as conn:
-            for anio in años:
-                df = pd.read_sql(
-                    text("""
-                        SELECT 
-                            c.identificacion,
-                            c.celular,
-                            c.nombre_completo,
-                            cp.id_ciclo AS ciclo,
-                            a.valor AS anio
-                        FROM cliente c
-                        JOIN cliente_plan_info cp ON c.id_cliente = cp.id_cliente
-                        JOIN periodo_carga p ON cp.id_periodo = p.id_periodo
-                        JOIN anio a ON p.id_anio = a.id_anio
-                        WHERE a.valor::text = :anio
-                          AND cp.id_ciclo = :ciclo
-                    """),
-                    conn,
-                    params={"anio": str(anio), "ciclo": int(ciclo)}
-                )
-                if not df.empty:
-                    resultados_df = pd.concat([resultados_df, df], ignore_index=True)
-
-        if resultados_df.empty:
-            return "❌ No se encontraron registros para descargar.", 404
-
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-            resultados_df.to_excel(writer, index=False, sheet_name="Datos")
-        output.seek(0)
-
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=f"base_anios_{'_'.join(años)}_ciclo_{ciclo}.xlsx",
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        # Resultado guardado de la vista previa, o cursor del servidor:
+        # las filas llegan por lotes y se escriben al vuelo
+        filas = lotes_ciclo(params)
+
+        if formato == 'csv':
+            # El primer lote se lee antes de responder para poder devolver 404
+            primero = next(filas)
+            if not primero[1]:
+                filas.close()
+                return "❌ No se encontraron registros para descargar.", 404
+            return Response(
+                stream_with_context(exportacion.csv_gzip(itertools.chain([primero], filas))),
+                mimetype="application/gzip",
+                headers={"Content-Disposition": f"attachment; filename={nombre}.csv.gz"}
+            )
+
+        return enviar_excel(filas, f"{nombre}.xlsx", "❌ No se encontraron registros para descargar.")
 
     except Exception as e:
         logging.error(traceback.format_exc())
@@ -278,54 +526,33 @@ def descargar_excel():
 
 
 # --------------------------------------------------------
-# Descarga Excel origen
+# Descarga Excel origen / titularidad
 # --------------------------------------------------------
+# Se descarga exactamente el resultado que vio el usuario: /buscar lo dejó
+# en almacen_resultados con un token propio (no se vuelve a consultar).
+def descargar_resultado(nombre_archivo):
+    token = request.args.get("token", "")
+    resultados_df = almacen_resultados.cargar(token)
+    if resultados_df is None:
+        return "❌ El resultado ya no está disponible. Vuelva a realizar la búsqueda.", 404
+    return enviar_excel(exportacion.lotes_dataframe(resultados_df), nombre_archivo, "❌ No hay registros para descargar.")
+
+
 @app.route('/descargar_excel_origen')
 def descargar_excel_origen():
     try:
-        resultados_df = pd.read_pickle("/tmp/resultados_buscar_origen.pkl")
-        if resultados_df.empty:
-            return "❌ No hay registros para descargar.", 404
-
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-            resultados_df.to_excel(writer, index=False, sheet_name="Datos")
-        output.seek(0)
-
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name="consulta_origen_completa.xlsx",
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-
+        return descargar_resultado("consulta_origen_completa.xlsx")
     except Exception as e:
         logging.error(traceback.format_exc())
         return f"Error exportando: {e}", 500
-    
+
 
 # titularidad
 
 @app.route('/descargar_excel_titularidad')
 def descargar_excel_titularidad():
     try:
-        # Recuperar los resultados de titularidad guardados temporalmente
-        resultados_df = pd.read_pickle("/tmp/resultados_buscar_titularidad.pkl")
-        if resultados_df.empty:
-            return "❌ No hay registros para descargar.", 404
-
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-            resultados_df.to_excel(writer, index=False, sheet_name="Datos")
-        output.seek(0)
-
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name="consulta_titularidad_completa.xlsx",
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-
+        return descargar_resultado("consulta_titularidad_completa.xlsx")
     except Exception as e:
         logging.error(traceback.format_exc())
         return f"Error exportando: {e}", 500
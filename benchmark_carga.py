@@ -0,0 +1,99 @@
+import pandas as pd # Requiere: pip install pandas sqlalchemy psycopg2-binary
+import numpy as np # Generación de datos sintéticos
+import time # Medición de tiempos
+import sys # Argumentos de línea de comandos
+from sqlalchemy import create_engine, text # Requiere: pip install sqlalchemy
+from sqlalchemy.engine import URL # Para construir la URL de conexión
+import logging # Para logging
+from cargamasiva import copiar_dataframe # Archivo local: cargamasiva.py
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# ==============================
+# 1️⃣ Conexión (base de pruebas local)
+# ==============================
+usuario = "postgres"
+contraseña = "12345"
+host = "localhost"
+puerto = 5432
+base_datos = "BcorpPostPrueba"
+
+url = URL.create(
+    drivername="postgresql+psycopg2",
+    username=usuario,
+    password=contraseña,
+    host=host,
+    port=puerto,
+    database=base_datos,
+)
+engine = create_engine(url, pool_pre_ping=True)
+
+# Uso: python benchmark_carga.py [filas]
+filas = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+# ==============================
+# 2️⃣ Datos sintéticos con la forma de 'cliente'
+# ==============================
+rng = np.random.default_rng(2025)
+df = pd.DataFrame({
+    'identificacion': rng.integers(100000000, 2499999999, filas).astype(str),
+    'nombre_completo': 'CLIENTE ' + pd.Series(np.arange(filas)).astype(str),
+    'celular': '09' + pd.Series(rng.integers(10000000, 99999999, filas)).astype(str),
+    'fecha_alta': pd.to_datetime('2025-01-01') + pd.to_timedelta(rng.integers(0, 365, filas), unit='D'),
+    'id_tipo_ident': rng.integers(1, 4, filas).astype(float),
+    'id_provincia': rng.integers(1, 25, filas).astype(float),
+    'id_ciudad': rng.integers(1, 200, filas).astype(float),
+})
+
+# ==============================
+# 3️⃣ Métodos a comparar
+# ==============================
+# Tabla normal (no TEMP) para que to_sql la detecte; se elimina al final de cada método
+def crear_tabla(conn):
+    conn.execute(text("DROP TABLE IF EXISTS bench_cliente"))
+    conn.execute(text("""
+        CREATE TABLE bench_cliente (
+            id_cliente SERIAL PRIMARY KEY,
+            identificacion VARCHAR(20),
+            nombre_completo VARCHAR(200),
+            celular VARCHAR(15),
+            fecha_alta DATE,
+            id_tipo_ident INTEGER,
+            id_provincia INTEGER,
+            id_ciudad INTEGER
+        )
+    """))
+
+metodos = {
+    'to_sql': lambda conn: df.to_sql('bench_cliente', conn, if_exists='append', index=False),
+    'to_sql multi': lambda conn: df.to_sql('bench_cliente', conn, if_exists='append', index=False,
+                                           method='multi', chunksize=1000),
+    'execute_values': lambda conn: copiar_dataframe(df, 'bench_cliente', conn, metodo='values'),
+    'COPY': lambda conn: copiar_dataframe(df, 'bench_cliente', conn),
+}
+
+# ==============================
+# 4️⃣ Ejecutar y reportar filas/segundo
+# ==============================
+resultados = []
+for nombre, metodo in metodos.items():
+    with engine.begin() as conn:
+        crear_tabla(conn)
+        inicio = time.perf_counter()
+        metodo(conn)
+        segundos = time.perf_counter() - inicio
+        insertadas = conn.execute(text("SELECT COUNT(*) FROM bench_cliente")).scalar()
+        conn.execute(text("DROP TABLE bench_cliente"))
+    resultados.append({
+        'metodo': nombre,
+        'filas': insertadas,
+        'segundos': round(segundos, 2),
+        'filas_por_segundo': int(insertadas / segundos) if segundos else 0,
+    })
+    logging.info(f"⏱️ {nombre}: {insertadas} filas en {segundos:.2f}s")
+
+resumen = pd.DataFrame(resultados)
+base = resumen.loc[resumen['metodo'] == 'to_sql', 'filas_por_segundo'].iloc[0]
+resumen['aceleracion'] = (resumen['filas_por_segundo'] / base).round(1) if base else None
+print("\n📊 Comparativa de inserción en 'cliente':")
+print(resumen.to_string(index=False))
@@ -0,0 +1,226 @@
+import pandas as pd # Requiere: pip install pandas sqlalchemy psycopg2-binary
+import numpy as np # Generación de datos sintéticos
+import json # Planes de EXPLAIN en formato JSON
+import sys # Argumentos de línea de comandos
+import logging # Para logging
+from sqlalchemy import create_engine, text # Requiere: pip install sqlalchemy
+from sqlalchemy.engine import URL # Para construir la URL de conexión
+from sqlalchemy.pool import NullPool # Conexiones sin reutilizar (search_path propio)
+from cargamasiva import copiar_dataframe # Archivo local: cargamasiva.py
+import aplicar_migraciones # Archivo local: aplicar_migraciones.py
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# ==============================
+# 1️⃣ Conexión (base de pruebas local)
+# ==============================
+# Todo se crea en el esquema ESQUEMA, que se borra al final: las tablas
+# reales no se tocan. Las migraciones se aplican con ese search_path.
+usuario = "postgres"
+contraseña = "12345"
+host = "localhost"
+puerto = 5432
+base_datos = "BcorpPostPrueba"
+ESQUEMA = "bench_indices"
+
+url = URL.create(
+    drivername="postgresql+psycopg2",
+    username=usuario,
+    password=contraseña,
+    host=host,
+    port=puerto,
+    database=base_datos,
+)
+engine = create_engine(url, poolclass=NullPool, connect_args={"options": f"-c search_path={ESQUEMA}"})
+
+# Uso: python benchmark_indices.py [clientes] [repeticiones] [textos_por_mes]
+clientes = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+# Períodos por año y mes: cada carga puede traer su propio texto_extraido
+textos_por_mes = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+# ==============================
+# 2️⃣ Esquema y datos sintéticos con la forma de texet
+# ==============================
+DDL = """
+    CREATE TABLE anio (id_anio SERIAL PRIMARY KEY, valor VARCHAR(4) UNIQUE NOT NULL);
+    CREATE TABLE mes (id_mes SERIAL PRIMARY KEY, nombre_mes VARCHAR(20) UNIQUE NOT NULL);
+    CREATE TABLE periodo_carga (
+        id_periodo SERIAL PRIMARY KEY,
+        id_anio INTEGER REFERENCES anio(id_anio),
+        id_mes INTEGER REFERENCES mes(id_mes),
+        texto_extraido VARCHAR(50) NOT NULL,
+        nombre_base VARCHAR(100)
+    );
+    CREATE TABLE cliente (
+        id_cliente SERIAL PRIMARY KEY,
+        identificacion VARCHAR(20),
+        nombre_completo VARCHAR(200),
+        celular VARCHAR(15)
+    );
+    CREATE TABLE cliente_plan_info (
+        id_cliente_plan_info SERIAL PRIMARY KEY,
+        id_cliente INTEGER REFERENCES cliente(id_cliente),
+        id_ciclo INTEGER,
+        id_periodo INTEGER REFERENCES periodo_carga(id_periodo)
+    );
+"""
+
+MESES = ['ENERO', 'FEBRERO', 'MARZO', 'ABRIL', 'MAYO', 'JUNIO', 'JULIO',
+         'AGOSTO', 'SEPTIEMBRE', 'OCTUBRE', 'NOVIEMBRE', 'DICIEMBRE']
+ANIOS = [str(a) for a in range(2019, 2026)]
+
+rng = np.random.default_rng(2025)
+df_periodos = pd.DataFrame(
+    [(i + 1, m + 1, f"{MESES[m][:3]}{a}" + (f"-{k:03d}" if k else ""), f"b_pos_{a}{m + 1:02d}")
+     for i, a in enumerate(ANIOS) for m in range(12) for k in range(textos_por_mes)],
+    columns=['id_anio', 'id_mes', 'texto_extraido', 'nombre_base'],
+)
+df_cliente = pd.DataFrame({
+    'identificacion': rng.integers(100000000, 2499999999, clientes).astype(str),
+    'nombre_completo': 'CLIENTE ' + pd.Series(np.arange(clientes)).astype(str),
+    'celular': '09' + pd.Series(rng.integers(10000000, 99999999, clientes)).astype(str),
+})
+# Cada cliente aparece en 1 a 5 períodos
+apariciones = rng.integers(1, 6, clientes)
+df_plan = pd.DataFrame({
+    'id_cliente': np.repeat(np.arange(1, clientes + 1), apariciones),
+    'id_ciclo': rng.integers(1, 31, apariciones.sum()),
+    'id_periodo': rng.integers(1, len(df_periodos) + 1, apariciones.sum()),
+})
+
+
+def crear_datos():
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {ESQUEMA}"))
+        conn.exec_driver_sql(DDL)
+        copiar_dataframe(pd.DataFrame({'valor': ANIOS}), 'anio', conn)
+        copiar_dataframe(pd.DataFrame({'nombre_mes': MESES}), 'mes', conn)
+        copiar_dataframe(df_periodos, 'periodo_carga', conn)
+        copiar_dataframe(df_cliente, 'cliente', conn)
+        copiar_dataframe(df_plan, 'cliente_plan_info', conn)
+    analizar()
+    logging.info(f"🧪 Esquema {ESQUEMA}: {clientes} clientes, {len(df_plan)} filas en cliente_plan_info.")
+
+
+def analizar():
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+
+# ==============================
+# 3️⃣ Consultas de app.py y de las cargas (copiadas tal cual)
+# ==============================
+muestra = rng.choice(clientes, 5, replace=False)
+valores = tuple(df_cliente['identificacion'].iloc[muestra[:3]]) + tuple(df_cliente['celular'].iloc[muestra[3:]])
+
+CONSULTAS = {
+    # app.py → query_busqueda(base, '1')
+    'buscar origen': ("""
+        SELECT c.identificacion, c.celular, c.nombre_completo, a.valor AS año, m.nombre_mes AS mes, 'pospago' AS origen
+        FROM cliente_plan_info cp
+        JOIN cliente c ON c.id_cliente = cp.id_cliente
+        JOIN periodo_carga p ON p.id_periodo = cp.id_periodo
+        JOIN anio a ON a.id_anio = p.id_anio
+        JOIN mes m ON m.id_mes = p.id_mes
+        WHERE (c.identificacion IN :valores OR c.celular IN :valores)
+        ORDER BY c.identificacion, c.celular, a.valor, m.id_mes
+    """, {"valores": valores}),
+    # app.py → query_busqueda(base, '2')
+    'buscar titularidad': ("""
+        SELECT c.identificacion, c.celular, c.nombre_completo, p.nombre_base
+        FROM cliente_plan_info cp
+        JOIN cliente c ON c.id_cliente = cp.id_cliente
+        JOIN periodo_carga p ON cp.id_periodo = p.id_periodo
+        WHERE (c.identificacion IN :valores OR c.celular IN :valores)
+        ORDER BY c.identificacion, c.celular
+    """, {"valores": valores}),
+    # app.py → QUERY_CICLO (buscar_ciclo / descargar_excel, todos los años a la vez)
+    'buscar ciclo': ("""
+        SELECT c.identificacion, c.celular, c.nombre_completo, cp.id_ciclo AS ciclo, a.valor AS anio
+        FROM cliente c
+        JOIN cliente_plan_info cp ON c.id_cliente = cp.id_cliente
+        JOIN periodo_carga p ON cp.id_periodo = p.id_periodo
+        JOIN anio a ON p.id_anio = a.id_anio
+        WHERE a.valor = ANY(:anios)
+          AND cp.id_ciclo = :ciclo
+    """, {"anios": ['2023', '2024'], "ciclo": 15}),
+    # dimensiones.asegurar_periodos (el texto llega con otras mayúsculas)
+    'periodo por año/mes/texto': ("""
+        SELECT p.id_periodo
+        FROM periodo_carga p
+        WHERE p.id_anio = :id_anio AND p.id_mes = :id_mes
+          AND UPPER(p.texto_extraido) = UPPER(:texto)
+    """, {"id_anio": 6, "id_mes": 3, "texto": 'Mar2024'}),
+    # ORIGEN.PY: último período de cada cliente
+    'último período por cliente': ("""
+        SELECT DISTINCT ON (cpi.id_cliente) cpi.id_cliente, cpi.id_periodo
+        FROM cliente_plan_info cpi
+        WHERE cpi.id_cliente = ANY(CAST(:clientes AS integer[]))
+        ORDER BY cpi.id_cliente, cpi.id_periodo DESC
+    """, {"clientes": [int(i) for i in rng.integers(1, clientes + 1, 1000)]}),
+}
+
+
+# ==============================
+# 4️⃣ EXPLAIN (ANALYZE, BUFFERS)
+# ==============================
+def _indices(plan):
+    """Índices que aparecen en el plan."""
+    propios = [plan['Index Name']] if 'Index Name' in plan else []
+    return propios + [i for hijo in plan.get('Plans', []) for i in _indices(hijo)]
+
+
+def medir(nombre, sql, params):
+    """Mediana de `repeticiones` ejecuciones (más una de calentamiento)."""
+    tiempos, plan = [], None
+    with engine.connect() as conn:
+        for _ in range(repeticiones + 1):
+            salida = conn.execute(text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql), params).scalar()
+            plan = (json.loads(salida) if isinstance(salida, str) else salida)[0]
+            tiempos.append(plan['Execution Time'])
+    nodo = plan['Plan']
+    return {
+        'consulta': nombre,
+        'ms': round(float(np.median(tiempos[1:])), 2),
+        'buffers': nodo.get('Shared Hit Blocks', 0) + nodo.get('Shared Read Blocks', 0),
+        'indices': ", ".join(sorted(set(_indices(nodo)))) or '(ninguno)',
+    }
+
+
+def medir_todas(etapa):
+    filas = []
+    for nombre, (sql, params) in CONSULTAS.items():
+        fila = medir(nombre, sql, params)
+        logging.info(f"⏱️ [{etapa}] {nombre}: {fila['ms']} ms, {fila['buffers']} buffers")
+        filas.append(fila)
+    return pd.DataFrame(filas)
+
+
+# ==============================
+# 5️⃣ Antes y después de cada migración
+# ==============================
+etapas = {}
+try:
+    crear_datos()
+    etapas['antes'] = medir_todas('antes')
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for migracion in aplicar_migraciones.listar():
+            segundos = aplicar_migraciones.ejecutar(conn, migracion)
+            logging.info(f"🧱 Migración {migracion['version']:03d} {migracion['nombre']}: {segundos:.1f} s")
+            analizar()
+            etapas[f"{migracion['version']:03d}"] = medir_todas(f"{migracion['version']:03d}")
+finally:
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE"))
+
+# ms de cada consulta tras cada etapa; índices y aceleración de la última
+resumen = pd.DataFrame({etapa: df.set_index('consulta')['ms'] for etapa, df in etapas.items()})
+final = etapas[list(etapas)[-1]].set_index('consulta')
+resumen['aceleracion'] = (resumen['antes'] / final['ms'].where(final['ms'] > 0)).round(1)
+resumen['indices'] = final['indices']
+print(f"\n📊 EXPLAIN (ANALYZE, BUFFERS) en ms antes y después de cada migración "
+      f"({clientes} clientes, {len(df_periodos)} períodos, mediana de {repeticiones}):")
+print(resumen.reset_index().to_string(index=False))
@@ -0,0 +1,71 @@
+import pandas as pd # Requiere: pip install pandas numpy
+import numpy as np # Generación de datos sintéticos
+import time # Medición de tiempos
+import sys # Argumentos de línea de comandos
+from tests.test_normalizacion import PARES # Funciones actuales (por fila) y vectorizadas
+
+# Uso: python benchmark_normalizacion.py [filas]
+# La equivalencia con las funciones por fila se comprueba en
+# tests/test_normalizacion.py (python -m pytest tests).
+filas = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+rng = np.random.default_rng(2025)
+
+
+# ==============================
+# 1️⃣ Micro-benchmark con datos realistas
+# ==============================
+def datos_realistas(n):
+    numeros = rng.integers(10000000, 99999999, n).astype(str)
+    formato = rng.integers(0, 4, n)
+    celular = np.where(formato == 0, '09' + numeros,
+              np.where(formato == 1, '9' + numeros,
+              np.where(formato == 2, numeros + '.0', numeros)))
+    identificacion = rng.integers(100000000, 2499999999, n).astype(str)
+    identificacion = np.where(rng.random(n) < 0.5, np.char.add(identificacion, '.0'), identificacion)
+    formas = np.array(['Débito automático', 'TARJETA DE CRÉDITO', 'Efectivo', 'débito/cuenta', 'Transferencia  bancaria'])
+    return pd.DataFrame({
+        'celular': celular,
+        'identificacion': identificacion,
+        'desc_forma_pago': formas[rng.integers(0, len(formas), n)],
+    }).astype(object)
+
+
+def medir(funcion, repeticiones=3):
+    """Mejor tiempo de varias ejecuciones (una sola varía mucho en la misma máquina)."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def benchmark():
+    df = datos_realistas(filas)
+    columnas = {
+        'limpiar_sin_tildes': 'desc_forma_pago',
+        'normalizar_celular': 'celular',
+        'normalizar_celular_prepago': 'celular',
+        'limpiar_identificacion': 'identificacion',
+        'mask_celular_invalido': 'celular',
+        'celular_norm': 'celular',
+    }
+    resultados = []
+    for nombre, vectorizada, por_fila, _ in PARES:
+        serie = df[columnas[nombre]]
+        antes = medir(lambda: serie.apply(por_fila))
+        despues = medir(lambda: vectorizada(serie))
+        resultados.append({
+            'funcion': nombre,
+            'apply_s': round(antes, 2),
+            'vectorizada_s': round(despues, 2),
+            'aceleracion': round(antes / despues, 1) if despues else None,
+        })
+        print(f"⏱️ {nombre}: apply {antes:.2f}s → vectorizada {despues:.2f}s")
+
+    print(f"\n📊 Normalización de {filas} filas:")
+    print(pd.DataFrame(resultados).to_string(index=False))
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,36 @@
+import logging # Para logging
+import time # Para medir la espera de los bloqueos
+from contextlib import contextmanager # Para las secciones críticas
+from sqlalchemy import text # Requiere: pip install sqlalchemy
+
+
+# ==============================
+# Bloqueos consultivos para cargas simultáneas
+# ==============================
+# Cada recurso compartido entre cargas (periodo_carga, cada tabla de
+# dimensión) tiene su propio pg_advisory_xact_lock. El bloqueo es de
+# transacción: se libera con el COMMIT o el ROLLBACK, así que la carga que
+# estaba esperando ya ve las filas que insertó la otra. Las filas de
+# cliente y cliente_plan_info no se bloquean: sus ids salen de la
+# secuencia (cargamasiva.insertar_con_ids), nunca del orden de la tabla.
+PREFIJO = 'bases_completas'
+
+
+def bloquear(conn, recurso):
+    """Toma el bloqueo de `recurso` hasta que termine la transacción de `conn`."""
+    inicio = time.perf_counter()
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:clave))"), {"clave": f"{PREFIJO}:{recurso}"})
+    espera = time.perf_counter() - inicio
+    if espera >= 1:
+        logging.info(f"🔒 Bloqueo '{recurso}' obtenido tras {espera:.1f} s de espera (otra carga en curso).")
+
+
+@contextmanager
+def seccion_critica(engine, recurso):
+    """
+    Transacción corta con el bloqueo de `recurso`:
+        with seccion_critica(engine, 'periodo_carga') as conn: ...
+    """
+    with engine.begin() as conn:
+        bloquear(conn, recurso)
+        yield conn
@@ -0,0 +1,222 @@
+import pandas as pd # Requiere: pip install pandas sqlalchemy psycopg2-binary
+import logging # Para logging
+import threading # Acceso concurrente al caché
+from collections import defaultdict # Contadores de aciertos/fallos
+from sqlalchemy import text # Requiere: pip install sqlalchemy
+from dimensiones import DIMENSIONES, asegurar_dimension, asegurar_ciudades # Archivo local: dimensiones.py
+
+
+# ==============================
+# Tablas cacheadas: tabla → (columna id, columnas clave, normalizar con UPPER/TRIM)
+# ==============================
+TABLAS = {
+    'tipo_identificacion': ('id_tipo_ident', ['nombre_tipo'], True),
+    'provincia': ('id_provincia', ['nombre_provincia'], True),
+    'ciudad': ('id_ciudad', ['nombre_ciudad'], True),
+    'institucion_financiera': ('id_institucion', ['nombre_institucion'], True),
+    'forma_pago': ('id_forma_pago', ['desc_forma_pago'], True),
+    'subproducto': ('id_subproducto', ['id_subproducto'], True),
+    'ciclo': ('id_ciclo', ['id_ciclo'], True),
+    'anio': ('id_anio', ['valor'], True),
+    'mes': ('id_mes', ['nombre_mes'], True),
+    'periodo_carga': ('id_periodo', ['id_anio', 'id_mes', 'texto_extraido', 'nombre_base'], False),
+}
+
+
+def _texto(valor, normalizar):
+    """Convierte un valor a la forma de clave usada en el caché."""
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    valor = str(valor).strip()
+    return valor.upper() if normalizar else valor
+
+
+class CacheDimensiones:
+    """
+    Mapas nombre → id de las tablas de dimensión de UNA base de datos.
+    Cada tabla se lee una sola vez por proceso; después solo se consultan
+    (o insertan) en el servidor los valores que no estén en el caché, y el
+    resultado se agrega al mapa. Si la transacción que insertó valores se
+    revierte hay que llamar a invalidar().
+    """
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self._mapas = {}
+        self._lock = threading.RLock()
+        self.aciertos = defaultdict(int)
+        self.fallos = defaultdict(int)
+
+    # ------------------------------
+    # Carga y claves
+    # ------------------------------
+    def _clave(self, tabla, valor):
+        _, columnas, normalizar = TABLAS[tabla]
+        if len(columnas) == 1:
+            return _texto(valor, normalizar)
+        return tuple(_texto(v, normalizar) for v in valor)
+
+    def mapa(self, conn, tabla):
+        """Devuelve el mapa completo clave → id de `tabla` (lo lee la primera vez)."""
+        with self._lock:
+            if tabla not in self._mapas:
+                columna_id, columnas, _ = TABLAS[tabla]
+                df = pd.read_sql(text(f"SELECT {columna_id}, {', '.join(columnas)} FROM {tabla} ORDER BY {columna_id}"), conn)
+                mapa = {}
+                for fila in df.itertuples(index=False, name=None):
+                    clave = self._clave(tabla, fila[1] if len(columnas) == 1 else fila[1:])
+                    mapa.setdefault(clave, fila[0])
+                self._mapas[tabla] = mapa
+                logging.info(f"🗂️ Caché '{self.nombre}.{tabla}' cargado: {len(mapa)} registros.")
+            return self._mapas[tabla]
+
+    def tabla(self, conn, tabla):
+        """El mapa de una tabla de una sola clave como DataFrame [columna id, columna clave]."""
+        columna_id, columnas, _ = TABLAS[tabla]
+        mapa = self.mapa(conn, tabla)
+        return pd.DataFrame({columna_id: list(mapa.values()), columnas[0]: list(mapa.keys())})
+
+    def agregar(self, tabla, clave, id_valor):
+        """Registra un id recién insertado sin volver a leer la tabla."""
+        with self._lock:
+            if tabla in self._mapas:
+                self._mapas[tabla][self._clave(tabla, clave)] = id_valor
+
+    def invalidar(self, tabla=None):
+        """Descarta el mapa de `tabla` (o de todas) para releerlo en el próximo uso."""
+        with self._lock:
+            if tabla is None:
+                self._mapas.clear()
+            else:
+                self._mapas.pop(tabla, None)
+        logging.info(f"♻️ Caché '{self.nombre}' invalidado: {tabla or 'todas las tablas'}.")
+
+    # ------------------------------
+    # Búsquedas
+    # ------------------------------
+    def obtener(self, conn, tabla, valor):
+        """id de un valor, o None si no existe en la tabla."""
+        clave = self._clave(tabla, valor)
+        mapa = self.mapa(conn, tabla)
+        if clave in mapa:
+            self.aciertos[tabla] += 1
+            return mapa[clave]
+        self.fallos[tabla] += 1
+        # Puede haberlo insertado otro proceso: se consulta solo esa clave
+        self._releer(conn, tabla, [clave])
+        return self.mapa(conn, tabla).get(clave)
+
+    def _releer(self, conn, tabla, claves):
+        columna_id, columnas, normalizar = TABLAS[tabla]
+        if len(columnas) != 1 or not claves:
+            if tabla in self._mapas and claves:
+                self.invalidar(tabla)
+                self.mapa(conn, tabla)
+            return
+        expr = f"UPPER(TRIM({columnas[0]}::text))" if normalizar else f"{columnas[0]}::text"
+        df = pd.read_sql(text(f"""
+            SELECT MIN({columna_id}) AS id, {expr} AS clave
+            FROM {tabla}
+            WHERE {expr} = ANY(CAST(:claves AS text[]))
+            GROUP BY {expr}
+        """), conn, params={"claves": list(claves)})
+        for id_valor, clave in df.itertuples(index=False, name=None):
+            self.agregar(tabla, clave, id_valor)
+
+    def resolver(self, conn, tabla, serie):
+        """
+        Devuelve [columna id, columna clave] para los valores de `serie`.
+        Los que faltan en el caché se insertan con asegurar_dimension (solo
+        esos) o, en tablas de solo lectura como anio/mes, se releen.
+        """
+        columna_id, columnas, _ = TABLAS[tabla]
+        mapa = self.mapa(conn, tabla)
+        claves = {self._clave(tabla, v) for v in serie.dropna().unique()}
+        faltantes = [c for c in claves if c not in mapa]
+        self.aciertos[tabla] += len(claves) - len(faltantes)
+        self.fallos[tabla] += len(faltantes)
+
+        if faltantes:
+            if tabla in DIMENSIONES:
+                nuevos = asegurar_dimension(conn, tabla, pd.Series(faltantes))
+                for id_valor, clave in nuevos[[columna_id, columnas[0]]].itertuples(index=False, name=None):
+                    self.agregar(tabla, clave, id_valor)
+            else:
+                self._releer(conn, tabla, faltantes)
+            mapa = self.mapa(conn, tabla)
+
+        return pd.DataFrame(
+            [(mapa[c], c) for c in claves if c in mapa],
+            columns=[columna_id, columnas[0]]
+        )
+
+    def resolver_ciudades(self, conn, df_ciudad):
+        """Como resolver(), para ciudad: las faltantes se insertan con su provincia."""
+        mapa = self.mapa(conn, 'ciudad')
+        df_ciudad = df_ciudad[['ciudad', 'provincia']].dropna().drop_duplicates()
+        claves = df_ciudad['ciudad'].map(lambda v: self._clave('ciudad', v))
+        es_faltante = ~claves.isin(list(mapa.keys()))
+        faltantes = df_ciudad[es_faltante]
+        unicas = set(claves)
+        self.fallos['ciudad'] += claves[es_faltante].nunique()
+        self.aciertos['ciudad'] += len(unicas) - claves[es_faltante].nunique()
+
+        if not faltantes.empty:
+            nuevos = asegurar_ciudades(conn, faltantes)
+            for id_valor, clave in nuevos.itertuples(index=False, name=None):
+                self.agregar('ciudad', clave, id_valor)
+
+        return pd.DataFrame(
+            [(mapa[c], c) for c in unicas if c in mapa],
+            columns=['id_ciudad', 'nombre_ciudad']
+        )
+
+    # ------------------------------
+    # Estadísticas
+    # ------------------------------
+    def estadisticas(self):
+        """DataFrame con aciertos, fallos y tasa de acierto por tabla."""
+        tablas = sorted(set(self.aciertos) | set(self.fallos))
+        df = pd.DataFrame({
+            'tabla': tablas,
+            'aciertos': [self.aciertos[t] for t in tablas],
+            'fallos': [self.fallos[t] for t in tablas],
+        })
+        total = df['aciertos'] + df['fallos']
+        df['tasa_acierto'] = (df['aciertos'] / total.where(total > 0)).round(3)
+        return df
+
+    def registrar_estadisticas(self):
+        df = self.estadisticas()
+        if not df.empty:
+            logging.info(f"📈 Caché de dimensiones '{self.nombre}':\n{df.to_string(index=False)}")
+
+
+# ==============================
+# Un caché por base de datos en todo el proceso
+# ==============================
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def obtener_cache(engine):
+    """Devuelve el CacheDimensiones compartido de la base a la que apunta `engine`."""
+    nombre = engine.url.database
+    clave = engine.url.render_as_string(hide_password=True)
+    with _caches_lock:
+        if clave not in _caches:
+            _caches[clave] = CacheDimensiones(nombre)
+        return _caches[clave]
+
+
+def invalidar_caches(tabla=None):
+    """
+    Invalida `tabla` (o todas) en los cachés de todas las bases. Se llama
+    cuando una dimensión cambia fuera del caché, como nombre_base en
+    actualizar_nombre_base.
+    """
+    with _caches_lock:
+        for cache in _caches.values():
+            cache.invalidar(tabla)
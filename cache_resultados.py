@@ -0,0 +1,239 @@
+import logging # Para logging
+import os # Límites configurables por variables de entorno
+import sys # Tamaño aproximado de las entradas
+import threading # Acceso concurrente desde los hilos de Flask
+import time # TTL de las entradas
+from collections import OrderedDict, defaultdict # Orden LRU y contadores por ruta
+from sqlalchemy import text # Requiere: pip install sqlalchemy
+from sqlalchemy.exc import ProgrammingError # Tabla version_resultados aún sin crear
+
+
+# ==============================
+# Caché de resultados de /buscar y /buscar_ciclo (app.py)
+# ==============================
+# Cada entrada vive TTL segundos y el caché no pasa de MAX_BYTES: al
+# llenarse se descartan primero las entradas usadas hace más tiempo (LRU).
+# Las cargas corren en otros procesos, así que avisan por la base: al
+# terminar, en una transacción aparte después de confirmar sus datos,
+# incrementan version_resultados (marcar_cambio). Una entrada guardada con
+# otra versión de esa base ya no se usa. Entre la confirmación de los datos
+# y el aviso, más lo que tarde en releerse la versión, se pueden servir
+# resultados sin la carga nueva.
+#
+# La versión de cada base la relee un hilo propio cada VERIFICAR_CADA
+# segundos (con statement_timeout): una base lenta no frena las consultas.
+# Si la lectura falla, o la última lectura tiene más de VIGENCIA segundos,
+# la versión queda desconocida y las entradas de esa base no se usan ni se
+# guardan.
+TTL = float(os.environ.get('CACHE_RESULTADOS_TTL', 0)) or 600.0
+MAX_BYTES = int(float(os.environ.get('CACHE_RESULTADOS_MB', 0)) or 256) * 1024 * 1024
+# Cada cuántos segundos se relee la versión de cada base
+VERIFICAR_CADA = 5.0
+# Antigüedad máxima de una versión leída antes de darla por desconocida
+VIGENCIA = 4 * VERIFICAR_CADA
+
+DDL_VERSION = """
+    CREATE TABLE IF NOT EXISTS version_resultados (
+        id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+        version BIGINT NOT NULL DEFAULT 0,
+        ids_periodo INTEGER[],
+        fecha_cambio TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def asegurar_tabla(conn):
+    conn.execute(text(DDL_VERSION))
+
+
+# ==============================
+# Lado de las cargas
+# ==============================
+def marcar_cambio(conn, ids_periodo=None):
+    """
+    Invalida los resultados cacheados de esta base. Se llama después de
+    confirmar la carga (en otra transacción): hasta que se confirma el aviso
+    los datos nuevos ya se ven pero el caché todavía no lo sabe.
+    """
+    asegurar_tabla(conn)
+    version = conn.execute(text("""
+        INSERT INTO version_resultados (id, version, ids_periodo)
+        VALUES (TRUE, 1, CAST(:ids AS integer[]))
+        ON CONFLICT (id) DO UPDATE SET
+            version = version_resultados.version + 1,
+            ids_periodo = EXCLUDED.ids_periodo,
+            fecha_cambio = CURRENT_TIMESTAMP
+        RETURNING version
+    """), {"ids": [int(i) for i in (ids_periodo or [])]}).scalar()
+    logging.info(f"♻️ Caché de resultados invalidado (versión {version}).")
+    return version
+
+
+# ==============================
+# Lado de la aplicación
+# ==============================
+def _tamano(valor):
+    """Bytes aproximados de un resultado (DataFrame, lista de dicts o escalar)."""
+    if hasattr(valor, 'memory_usage'):
+        return int(valor.memory_usage(index=True, deep=True).sum())
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(_tamano(k) + _tamano(v) for k, v in valor.items())
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(_tamano(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+def clave_valores(valores):
+    """Valores de búsqueda normalizados: sin espacios ni repetidos y ordenados."""
+    return tuple(sorted({str(v).strip() for v in valores if str(v).strip()}))
+
+
+def _desconocida(versiones):
+    """True si falta la versión de alguna base: no se puede saber si la entrada vale."""
+    return any(version is None for _, version in versiones)
+
+
+class CacheResultados:
+    """
+    Resultados por clave (ruta, tipo, valores...). Cada entrada recuerda las
+    versiones de las bases de las que salió; si alguna cambió, la entrada se
+    descarta. Los contadores se leen con estadisticas().
+    """
+
+    def __init__(self, ttl=TTL, max_bytes=MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()  # clave → (valor, versiones, vence, bytes)
+        self._bytes = 0
+        self._versiones = {}  # base → (version, leída en)
+        self._vigiladas = set()  # bases con su hilo de versión
+        self._lock = threading.Lock()
+        self.aciertos = defaultdict(int)
+        self.fallos = defaultdict(int)
+        self.desalojos = 0
+
+    # ------------------------------
+    # Versiones de las bases
+    # ------------------------------
+    def _leer_version(self, engine):
+        """Lee la versión de la base de `engine` (con statement_timeout)."""
+        try:
+            with engine.begin() as conn:
+                conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(VERIFICAR_CADA * 1000)}")
+                return conn.execute(text("SELECT version FROM version_resultados")).scalar() or 0
+        except ProgrammingError as e:
+            # Sin la tabla (ninguna carga la creó aún) la versión es 0
+            if getattr(e.orig, 'pgcode', None) == '42P01':
+                return 0
+            raise
+
+    def _vigilar(self, base, engine):
+        """Hilo de `base`: relee su versión cada VERIFICAR_CADA segundos."""
+        fallando = False
+        while True:
+            try:
+                version = self._leer_version(engine)
+                if fallando:
+                    logging.info(f"✅ Versión de {base} leída de nuevo: se vuelve a usar el caché.")
+                fallando = False
+            except Exception as e:
+                version = None
+                # Se registra al empezar a fallar, no en cada intento
+                if not fallando:
+                    logging.warning(f"⚠️ No se pudo leer la versión de {base}, sin caché para esa base: {e}")
+                fallando = True
+            with self._lock:
+                self._versiones[base] = (version, time.monotonic())
+            time.sleep(VERIFICAR_CADA)
+
+    def version(self, base, engine):
+        """
+        Última versión leída de `base`, sin consultar la base. None si aún no
+        se leyó, si falló la última lectura o si es más vieja que VIGENCIA.
+        """
+        with self._lock:
+            if base not in self._vigiladas:
+                self._vigiladas.add(base)
+                threading.Thread(target=self._vigilar, args=(base, engine),
+                                 name=f'version-{base}', daemon=True).start()
+            guardada = self._versiones.get(base)
+        if guardada is None or time.monotonic() - guardada[1] > VIGENCIA:
+            return None
+        return guardada[0]
+
+    def versiones(self, engines):
+        """Versiones actuales de las bases {nombre: engine} de las que sale un resultado."""
+        return tuple((base, self.version(base, engine)) for base, engine in engines.items())
+
+    # ------------------------------
+    # Entradas
+    # ------------------------------
+    def _quitar(self, clave):
+        _, _, _, bytes_entrada = self._entradas.pop(clave)
+        self._bytes -= bytes_entrada
+
+    def obtener(self, clave, versiones):
+        """Resultado guardado para `clave`, o None si no hay, venció o cambió la base."""
+        ruta = clave[0]
+        with self._lock:
+            if _desconocida(versiones):
+                self.fallos[ruta] += 1
+                return None
+            entrada = self._entradas.get(clave)
+            if entrada is not None and (entrada[2] < time.monotonic() or entrada[1] != versiones):
+                self._quitar(clave)
+                entrada = None
+            if entrada is None:
+                self.fallos[ruta] += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos[ruta] += 1
+            return entrada[0]
+
+    def guardar(self, clave, valor, versiones):
+        """Guarda un resultado; si no cabe se desalojan los menos usados."""
+        if _desconocida(versiones):
+            return
+        bytes_entrada = _tamano(valor)
+        if bytes_entrada > self.max_bytes:
+            logging.info(f"🗃️ Resultado de {bytes_entrada / 1e6:.1f} MB: no se guarda en el caché.")
+            return
+        with self._lock:
+            if clave in self._entradas:
+                self._quitar(clave)
+            self._entradas[clave] = (valor, versiones, time.monotonic() + self.ttl, bytes_entrada)
+            self._bytes += bytes_entrada
+            while self._bytes > self.max_bytes:
+                self._quitar(next(iter(self._entradas)))
+                self.desalojos += 1
+
+    def invalidar(self, ruta=None):
+        """Descarta las entradas de `ruta` (o todas) en este proceso."""
+        with self._lock:
+            for clave in [c for c in self._entradas if ruta is None or c[0] == ruta]:
+                self._quitar(clave)
+        logging.info(f"♻️ Caché de resultados invalidado: {ruta or 'todas las rutas'}.")
+
+    # ------------------------------
+    # Estadísticas
+    # ------------------------------
+    def estadisticas(self):
+        """Aciertos, fallos y tasa de acierto por ruta, más el uso de memoria."""
+        with self._lock:
+            rutas = sorted(set(self.aciertos) | set(self.fallos))
+            por_ruta = {}
+            for ruta in rutas:
+                total = self.aciertos[ruta] + self.fallos[ruta]
+                por_ruta[ruta] = {
+                    'aciertos': self.aciertos[ruta],
+                    'fallos': self.fallos[ruta],
+                    'tasa_acierto': round(self.aciertos[ruta] / total, 3) if total else None,
+                }
+            return {
+                'rutas': por_ruta,
+                'entradas': len(self._entradas),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'desalojos': self.desalojos,
+            }
@@ -5,19 +5,37 @@ import os # Manejo de rutas
 import glob # Manejo de archivos
 import sys # Manejo de sistema
 import traceback    # Manejo de trazas de error
+from cargamasiva import copiar_dataframe, insertar_con_ids # COPY FROM STDIN para inserciones masivas
+from bloqueos import seccion_critica # Bloqueos para cargas simultáneas
+from cache_dimensiones import obtener_cache # Caché de dimensiones compartido por el proceso
+from lectura_excel import tipos_como_excel # Tipos equivalentes a releer el Excel
+import normalizacion # Normalizadores vectorizados compartidos
 
 # ==============================
 # Función principal (recibe engine del primer script)
 # ==============================
-def run_cargarpre(engine, ruta_excel):
+def run_cargarpre(engine, datos, nombre_base=None):
+    """
+    `datos` puede ser el DataFrame ya preparado por prepago.py, la ruta de
+    un .parquet o la ruta del Excel copia-. Si no se indica `nombre_base`
+    se toma del nombre del archivo (sin el prefijo copia-).
+    Retorna los id_periodo de la carga.
+    """
     print("🔄 Iniciando carga desde cargarpre.py usando engine recibido...")
 
     try:
-        df = pd.read_excel(ruta_excel)
+        if isinstance(datos, pd.DataFrame):
+            # Mismos tipos que si se hubiera releído la copia en Excel
+            df = tipos_como_excel(datos)
+        elif str(datos).lower().endswith('.parquet'):
+            df = tipos_como_excel(pd.read_parquet(datos))
+        else:
+            df = pd.read_excel(datos)
         df.columns = [c.lower().strip() for c in df.columns]
-        print(f"📊 {len(df)} registros leídos desde {ruta_excel}")
+        origen = "memoria" if isinstance(datos, pd.DataFrame) else datos
+        print(f"📊 {len(df)} registros leídos desde {origen}")
     except Exception as e:
-        sys.exit(f"Error leyendo Excel: {e}")
+        sys.exit(f"Error leyendo datos: {e}")
 
     # ==============================
     # 4️⃣ Normalización y limpieza
@@ -28,28 +46,10 @@ def run_cargarpre(engine, ruta_excel):
         if col in df.columns:
             df[col] = df[col].astype(str).str.strip()
 
-    def limpiar_identificacion(valor):
-        valor = str(valor).strip()
-        if valor.endswith('.0'):
-            try:
-                return str(int(float(valor)))
-            except ValueError:
-                return valor
-        return valor
-
-    df['identificacion'] = df['identificacion'].apply(limpiar_identificacion)
+    df['identificacion'] = normalizacion.limpiar_identificacion(df['identificacion'])
     df.loc[df['identificacion'] == '', 'identificacion'] = '9999999999'
 
-    def normalizar_celular(valor):
-        valor = str(valor).strip()
-        if valor == '':
-            return ''
-        try:
-            return str(int(float(valor))).zfill(10)
-        except ValueError:
-            return valor
-
-    df['celular'] = df['celular'].apply(normalizar_celular)
+    df['celular'] = normalizacion.normalizar_celular_prepago(df['celular'])
 
     # ==============================
     # 5️⃣ Funciones para SQL con transacción y excepciones
@@ -76,8 +76,9 @@ def run_cargarpre(engine, ruta_excel):
     # ==============================
     # 6️⃣ Cargar tablas de referencia
     # ==============================
-    df_anio = leer_sql('SELECT * FROM anio')
-    df_mes = leer_sql('SELECT * FROM mes')
+    cache = obtener_cache(engine)
+    df_anio = cache.tabla(engine, 'anio')
+    df_mes = cache.tabla(engine, 'mes')
 
     df = df.merge(df_anio, left_on='anio', right_on='valor', how='left')
     df = df.merge(df_mes, left_on='mes', right_on='nombre_mes', how='left')
@@ -90,39 +91,45 @@ def run_cargarpre(engine, ruta_excel):
     # ==============================
 
     # Tomar nombre del archivo sin prefijo copia- ni extensión
-    nombre_base = os.path.splitext(os.path.basename(ruta_excel.replace("copia-", "")))[0]
+    if nombre_base is None:
+        nombre_base = os.path.splitext(os.path.basename(str(datos).replace("copia-", "")))[0]
 
     df['nombre_base'] = nombre_base  # añadir como columna interna
 
     # Periodo basado en: año + mes + texto_extraido + nombre_base
     df_periodos = df[['id_anio', 'id_mes', 'texto_extraido', 'nombre_base']].drop_duplicates()
 
-    # Periodos existentes (ahora incluye nombre_base)
-    periodos_existentes = leer_sql(
-        'SELECT id_anio, id_mes, texto_extraido, nombre_base FROM periodo_carga'
-    )
-
-    # Detectar periodos completamente nuevos
-    df_nuevos_periodos = df_periodos.merge(
-        periodos_existentes,
-        on=['id_anio', 'id_mes', 'texto_extraido', 'nombre_base'],
-        how='left',
-        indicator=True
-    )
-    df_nuevos_periodos = df_nuevos_periodos[df_nuevos_periodos['_merge'] == 'left_only'] \
-        .drop(columns=['_merge'])
-
-    if not df_nuevos_periodos.empty:
-        print(f"Insertando {len(df_nuevos_periodos)} nuevos periodos...")
-        try:
-            df_nuevos_periodos.to_sql('periodo_carga', engine, if_exists='append', index=False)
-        except SQLAlchemyError as e:
-            sys.exit(f"Error insertando nuevos periodos: {e}")
-    else:
-        print("No hay nuevos periodos.")
-
-    # Refrescar periodo_carga
-    df_periodos_actualizados = leer_sql('SELECT id_periodo,id_anio,id_mes,texto_extraido,nombre_base FROM periodo_carga')
+    # Lectura e inserción con el bloqueo de periodo_carga: otra carga
+    # simultánea no inserta el mismo período
+    try:
+        with seccion_critica(engine, 'periodo_carga') as conn:
+            # Periodos existentes (ahora incluye nombre_base)
+            periodos_existentes = pd.read_sql(
+                'SELECT id_anio, id_mes, texto_extraido, nombre_base FROM periodo_carga', conn
+            )
+
+            # Detectar periodos completamente nuevos
+            df_nuevos_periodos = df_periodos.merge(
+                periodos_existentes,
+                on=['id_anio', 'id_mes', 'texto_extraido', 'nombre_base'],
+                how='left',
+                indicator=True
+            )
+            df_nuevos_periodos = df_nuevos_periodos[df_nuevos_periodos['_merge'] == 'left_only'] \
+                .drop(columns=['_merge'])
+
+            if not df_nuevos_periodos.empty:
+                print(f"Insertando {len(df_nuevos_periodos)} nuevos periodos...")
+                df_nuevos_periodos.to_sql('periodo_carga', conn, if_exists='append', index=False)
+            else:
+                print("No hay nuevos periodos.")
+
+            # Refrescar periodo_carga
+            df_periodos_actualizados = pd.read_sql(
+                'SELECT id_periodo,id_anio,id_mes,texto_extraido,nombre_base FROM periodo_carga', conn
+            )
+    except SQLAlchemyError as e:
+        sys.exit(f"Error insertando nuevos periodos: {e}")
     df = df.merge(df_periodos_actualizados, on=['id_anio','id_mes','texto_extraido','nombre_base'], how='left')
 
     # ==============================
@@ -131,27 +138,16 @@ def run_cargarpre(engine, ruta_excel):
     df_clientes = df[['identificacion','celular','monto_recarga','nombre_completo']].copy()
     print(f"Insertando {len(df_clientes)} registros en tabla cliente...")
 
-    try:
-        df_clientes.to_sql('cliente', engine, if_exists='append', index=False)
-    except SQLAlchemyError as e:
-        sys.exit(f"Error insertando clientes: {e}")
-
     # ==============================
     # 9️⃣ Asociar id_cliente
     # ==============================
-    clientes_totales = leer_sql('SELECT id_cliente,identificacion,celular,nombre_completo FROM cliente')
-    n = len(df_clientes)
-    clientes_nuevos = clientes_totales.tail(n).copy()
-
-    df_clientes = df_clientes.reset_index(drop=True)
-    clientes_nuevos = clientes_nuevos.reset_index(drop=True)
-    df_clientes['idx'] = df_clientes.index
-    clientes_nuevos['idx'] = clientes_nuevos.index
-
-    df_merged = pd.merge(df_clientes, clientes_nuevos[['id_cliente','idx']], on='idx')
-    df = df.reset_index(drop=True)
-    df['idx'] = df.index
-    df = df.merge(df_merged[['idx','id_cliente']], on='idx', how='left')
+    # Cada fila recibe su id_cliente de la secuencia al insertarse (antes se
+    # tomaban las últimas n filas de cliente, que pueden ser de otra carga)
+    try:
+        with engine.begin() as conn:
+            df['id_cliente'] = insertar_con_ids(df_clientes, 'cliente', 'id_cliente', conn)
+    except SQLAlchemyError as e:
+        sys.exit(f"Error insertando clientes: {e}")
 
     # ==============================
     # 🔟 Insertar cliente_plan_info
@@ -160,7 +156,11 @@ def run_cargarpre(engine, ruta_excel):
     print(f"Insertando {len(df_stg)} registros en cliente_plan_info...")
 
     try:
-        df_stg.to_sql('cliente_plan_info', engine, if_exists='append', index=False)
+        with engine.begin() as conn:
+            copiar_dataframe(df_stg, 'cliente_plan_info', conn)
         print("✅ Carga completa en cliente_plan_info.")
     except SQLAlchemyError as e:
         print(f"Error al insertar en cliente_plan_info: {e}")
+
+    # Períodos tocados por esta carga (para actualizar su nombre_base)
+    return sorted(df['id_periodo'].dropna().astype(int).unique().tolist())
@@ -0,0 +1,139 @@
+import pandas as pd # Requiere: pip install pandas sqlalchemy psycopg2-binary
+import io # Buffers en memoria para COPY
+import csv # Formato CSV compatible con COPY
+import logging # Para logging
+from sqlalchemy import text # Requiere: pip install sqlalchemy
+from sqlalchemy.exc import DBAPIError # Para envolver errores del driver
+
+
+# Cantidad de filas que se envían en cada COPY / execute_values
+TAMANO_LOTE = 50000
+
+
+# ==============================
+# Utilidades internas
+# ==============================
+def _cursor(conn):
+    """
+    Devuelve un cursor DBAPI (psycopg2) sobre la MISMA transacción
+    de la conexión SQLAlchemy recibida.
+    """
+    return conn.connection.cursor()
+
+
+def _preparar_columnas(df):
+    """
+    Ajusta tipos para que el texto generado sea aceptado por PostgreSQL:
+    columnas float que en realidad son enteros (ids que quedaron como 3.0
+    tras un merge con NaN) se convierten a Int64.
+    """
+    df = df.copy()
+    for col in df.columns:
+        serie = df[col]
+        if pd.api.types.is_float_dtype(serie):
+            valores = serie.dropna()
+            if len(valores) == 0 or (valores % 1 == 0).all():
+                df[col] = serie.astype('Int64')
+    return df
+
+
+def _lotes(df, tamano_lote):
+    for inicio in range(0, len(df), tamano_lote):
+        yield df.iloc[inicio:inicio + tamano_lote]
+
+
+# ==============================
+# COPY FROM STDIN
+# ==============================
+def _copiar(cur, df, tabla, columnas, tamano_lote):
+    sql = (
+        f"COPY {tabla} ({', '.join(columnas)}) FROM STDIN "
+        f"WITH (FORMAT csv, NULL '\\N')"
+    )
+    for lote in _lotes(df, tamano_lote):
+        buffer = io.StringIO()
+        lote.to_csv(buffer, index=False, header=False, na_rep='\\N',
+                    quoting=csv.QUOTE_MINIMAL, date_format='%Y-%m-%d %H:%M:%S')
+        buffer.seek(0)
+        cur.copy_expert(sql, buffer)
+
+
+# ==============================
+# execute_values (respaldo)
+# ==============================
+def _insertar_values(cur, df, tabla, columnas, tamano_lote):
+    from psycopg2.extras import execute_values # Requiere: pip install psycopg2-binary
+
+    sql = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES %s"
+    for lote in _lotes(df, tamano_lote):
+        filas = [
+            tuple(None if pd.isna(v) else v for v in fila)
+            for fila in lote.astype(object).itertuples(index=False, name=None)
+        ]
+        execute_values(cur, sql, filas, page_size=len(filas))
+
+
+# ==============================
+# Función pública
+# ==============================
+def copiar_dataframe(df, tabla, conn, metodo='copy', tamano_lote=TAMANO_LOTE):
+    """
+    Inserta un DataFrame en `tabla` usando COPY FROM STDIN.
+    Si el driver no soporta COPY (o metodo='values') se usa execute_values.
+    `conn` es una conexión SQLAlchemy abierta con engine.begin(): la carga
+    participa de su transacción y se revierte junto con ella.
+    Retorna el número de filas enviadas.
+    """
+    if df.empty:
+        return 0
+
+    columnas = list(df.columns)
+    df = _preparar_columnas(df)
+    cur = _cursor(conn)
+
+    if metodo == 'copy' and not hasattr(cur, 'copy_expert'):
+        logging.warning(f"⚠️ El driver no soporta COPY. Se usa execute_values para '{tabla}'.")
+        metodo = 'values'
+
+    try:
+        if metodo == 'copy':
+            _copiar(cur, df, tabla, columnas, tamano_lote)
+        else:
+            _insertar_values(cur, df, tabla, columnas, tamano_lote)
+    except conn.dialect.dbapi.Error as e:
+        raise DBAPIError(f"{metodo.upper()} {tabla}", None, e) from e
+    finally:
+        cur.close()
+
+    logging.info(f"⚡ {len(df)} filas enviadas a '{tabla}' ({metodo}).")
+    return len(df)
+
+
+# ==============================
+# Inserción con ids reservados
+# ==============================
+def reservar_ids(conn, tabla, columna_id, cantidad):
+    """
+    Reserva `cantidad` valores de la secuencia de tabla.columna_id.
+    nextval nunca entrega el mismo valor a dos cargas, así que los ids se
+    conocen antes de insertar aunque otras cargas inserten a la vez.
+    """
+    if cantidad == 0:
+        return []
+    return conn.execute(
+        text("SELECT nextval(pg_get_serial_sequence(:tabla, :columna)) FROM generate_series(1, :cantidad)"),
+        {"tabla": tabla, "columna": columna_id, "cantidad": int(cantidad)},
+    ).scalars().all()
+
+
+def insertar_con_ids(df, tabla, columna_id, conn, metodo='copy'):
+    """
+    Inserta cada fila de `df` en `tabla` con un id reservado de la
+    secuencia (una fila, un id, aunque haya filas repetidas). Reemplaza a
+    leer los últimos n ids de la tabla, que mezcla filas de cargas
+    simultáneas. Retorna una Serie con los ids alineada con df.index.
+    """
+    ids = pd.Series(reservar_ids(conn, tabla, columna_id, len(df)), index=df.index, name=columna_id, dtype='int64')
+    copiar_dataframe(df.assign(**{columna_id: ids}), tabla, conn, metodo=metodo)
+    logging.info(f"🔑 {len(ids)} ids de '{tabla}' reservados de la secuencia.")
+    return ids
@@ -1,5 +1,5 @@
 import pandas as pd # Requiere: pip install pandas openpyxl sqlalchemy psycopg2-binary
-from sqlalchemy import create_engine, text # Requiere: pip install sqlalchemy
+from sqlalchemy import create_engine # Requiere: pip install sqlalchemy
 import glob # Requiere: pip install pandas openpyxl sqlalchemy psycopg2-binary
 import os # Requiere: pip install pandas openpyxl sqlalchemy psycopg2-binary
 import sys # Requiere: pip install pandas openpyxl sqlalchemy psycopg2-binary
@@ -8,6 +8,11 @@ from tkinter import filedialog # Requiere: pip install pandas openpyxl sqlalchem
 from sqlalchemy.engine.url import URL # Requiere: pip install sqlalchemy
 from sqlalchemy.exc import OperationalError # Requiere: pip install sqlalchemy
 import logging # Requiere: pip install pandas openpyxl sqlalchemy psycopg2-binary
+from cargamasiva import insertar_con_ids # Archivo local: cargamasiva.py
+from dimensiones import asegurar_planes, asegurar_periodos, actualizar_nombre_base # Archivo local: dimensiones.py
+import cache_resultados # Archivo local: cache_resultados.py
+from cache_dimensiones import obtener_cache, invalidar_caches # Archivo local: cache_dimensiones.py
+from lectura_excel import leer_excel_por_lotes # Archivo local: lectura_excel.py
 
 
 
@@ -49,176 +54,24 @@ except OperationalError as e:
     logging.exception("❌ Error de conexión a PostgreSQL.")
     raise SystemExit(e)
 
-# ==============================
-# 2️⃣ Leer Excel (todas las hojas)
-# ==============================
-ruta_excel = r'C:\Users\pasante.ti2\Desktop\bases pospago\nuevo\base_2025.xlsx'
-try: 
-    print("📥 Leyendo archivo Excel (todas las hojas)...")
-    hojas = pd.read_excel(ruta_excel, sheet_name=None) 
-    df_list = []
-    for nombre_hoja, df_hoja in hojas.items(): 
-        df_hoja.columns = [col.lower().strip() for col in df_hoja.columns]
-        df_list.append(df_hoja)
-    df = pd.concat(df_list, ignore_index=True)
-    print(f"✅ Total registros cargados de todas las hojas: {len(df)}")
-except Exception as e:
-    sys.exit(f"❌ Error leyendo Excel: {e}")
-
-# ==============================
-# 🔧 Normalizar columnas de período
-# ==============================
-df['año'] = df['año'].astype(str).str.strip()
-df['mes'] = df['mes'].astype(str).str.strip().str.upper()
-df['texto_extraido'] = df['texto_extraido'].astype(str).str.strip().str.lower()
-
-# Obtener id_anio
-año = str(int(float(df['año'].dropna().unique()[0]))).strip()
-anio_result = pd.read_sql(f"SELECT id_anio FROM anio WHERE valor = '{año}'", engine)
-if anio_result.empty:
-    raise ValueError(f"❌ Año '{año}' no encontrado en la tabla 'anio'.")
-
-id_anio = anio_result.iloc[0]['id_anio']
-
-# Crear períodos únicos (por año, mes y texto_extraido)
-periodos = []
-combinaciones = df[['mes', 'texto_extraido']].dropna().drop_duplicates()
-
-for _, fila in combinaciones.iterrows():
-    mes = fila['mes']
-    texto_extraido = fila['texto_extraido']
-
-    mes_result = pd.read_sql(f"SELECT id_mes FROM mes WHERE nombre_mes = '{mes}'", engine)
-    if mes_result.empty:
-        raise ValueError(f"❌ Mes '{mes}' no encontrado en la tabla 'mes'.")
-    id_mes = mes_result.iloc[0]['id_mes']
-
-    # Verificar existencia del período
-    query = f"""
-        SELECT id_periodo FROM periodo_carga
-        WHERE id_anio = {id_anio} AND id_mes = {id_mes} AND UPPER(texto_extraido) = '{texto_extraido}'
-    """
-    existente = pd.read_sql(query, engine)
-
-    if not existente.empty:
-        id_periodo = existente.iloc[0]['id_periodo']
-        print(f"ℹ️ Período ya existente: {mes} {año} ({texto_extraido}) → id_periodo = {id_periodo}")
-    else:
-        df_periodo = pd.DataFrame([{
-            'id_anio': id_anio,
-            'id_mes': id_mes,
-            'texto_extraido': texto_extraido
-        }])
-        df_periodo.to_sql('periodo_carga', engine, if_exists='append', index=False)
-        id_periodo = pd.read_sql('SELECT MAX(id_periodo) AS id FROM periodo_carga', engine).iloc[0]['id']
-        print(f"🆕 Nuevo período insertado: {mes} {año} ({texto_extraido}) → id_periodo = {id_periodo}")
+cache = obtener_cache(engine)
 
-    periodos.append({'mes': mes, 'texto_extraido': texto_extraido, 'id_periodo': id_periodo})
-
-# Asignar id_periodo a cada fila
-periodo_map = pd.DataFrame(periodos)
-df = df.merge(periodo_map, on=['mes', 'texto_extraido'], how='left')
-
-# ==============================
-# 3️⃣ Normalizar columnas clave
-# ==============================
-cols_clave = [
-    'identificacion', 'tipo_identificacion', 'provincia', 'ciudad',
-    'institucion_financiera', 'desc_forma_pago', 'id_plan', 'id_ciclo', 'id_subproducto'
-]
-
-for col in cols_clave:
-    if col in df.columns:
-        df[col] = df[col].astype(str).str.strip().str.upper()
+# Archivo con todas las hojas; se procesa por lotes para no cargarlo entero en memoria
+ruta_excel = r'C:\Users\pasante.ti2\Desktop\bases pospago\nuevo\base_2025.xlsx'
 
 # ==============================
-# 4️⃣ Función para insertar en tablas auxiliares
+# 🧰 Funciones para tablas auxiliares y merges
 # ==============================
-def insertar_auxiliar(df_origen, columna, tabla_sql, columna_sql):
+def insertar_auxiliar(df_origen, columna, tabla_sql):
+    # Desde el caché; solo los valores que falten se insertan en el servidor
     print(f"\n📋 Tabla: {tabla_sql}")
-    df_aux = pd.DataFrame({columna_sql: df_origen[columna].dropna().drop_duplicates()})
-    df_aux[columna_sql] = df_aux[columna_sql].astype(str).str.strip().str.upper()
-
-    existentes = pd.read_sql(f'SELECT {columna_sql} FROM {tabla_sql}', engine)
-    existentes[columna_sql] = existentes[columna_sql].astype(str).str.strip().str.upper()
-
-    df_aux = df_aux[~df_aux[columna_sql].isin(existentes[columna_sql])]
-    print(f"🆕 Nuevos a insertar: {len(df_aux)}")
-
-    if not df_aux.empty:
-        try:
-            df_aux.to_sql(tabla_sql, engine, if_exists='append', index=False)
-            print(f"✅ Insertados en '{tabla_sql}': {len(df_aux)}")
-        except Exception as e:
-            print(f"❌ Error al insertar en '{tabla_sql}': {e}")
-    else:
-        print(f"⚠️ Todos los registros ya existen en '{tabla_sql}'.")
-
-# ==============================
-# 5️⃣ Insertar tablas auxiliares
-# ==============================
-insertar_auxiliar(df, 'tipo_identificacion', 'tipo_identificacion', 'nombre_tipo')
-insertar_auxiliar(df, 'provincia', 'provincia', 'nombre_provincia')
-insertar_auxiliar(df, 'institucion_financiera', 'institucion_financiera', 'nombre_institucion')
-insertar_auxiliar(df, 'desc_forma_pago', 'forma_pago', 'desc_forma_pago')
-insertar_auxiliar(df, 'id_subproducto', 'subproducto', 'id_subproducto')
-insertar_auxiliar(df, 'id_ciclo', 'ciclo', 'id_ciclo')
-
-# ==============================
-# 6️⃣ Insertar ciudad con mapeo de provincia
-# ==============================
-print("\n📋 Tabla: ciudad")
-prov_map = pd.read_sql('SELECT id_provincia, nombre_provincia FROM provincia', engine)
-prov_map['nombre_provincia'] = prov_map['nombre_provincia'].astype(str).str.strip().str.upper()
-
-df_ciudad = df[['ciudad', 'provincia']].dropna().drop_duplicates()
-df_ciudad = df_ciudad.merge(prov_map, left_on='provincia', right_on='nombre_provincia')
-df_ciudad = df_ciudad.rename(columns={'ciudad': 'nombre_ciudad'})
-
-existentes = pd.read_sql('SELECT nombre_ciudad FROM ciudad', engine)
-df_ciudad = df_ciudad[~df_ciudad['nombre_ciudad'].isin(existentes['nombre_ciudad'])]
-print(f"🆕 Nuevos a insertar: {len(df_ciudad)}")
-
-if not df_ciudad.empty:
-    df_ciudad[['nombre_ciudad', 'id_provincia']].to_sql('ciudad', engine, if_exists='append', index=False)
-    print(f"✅ Insertados en 'ciudad': {len(df_ciudad)}")
-else:
-    print("⚠️ Todos los registros ya existen en 'ciudad'.")
-
-# ==============================
-# 7️⃣ Insertar planes
-# ==============================
-df_plan = df[['id_plan', 'descripcion_plan']].dropna().drop_duplicates()
-df_plan['id_plan'] = df_plan['id_plan'].astype(str).str.strip().str.upper()
-df_plan['descripcion_plan'] = df_plan['descripcion_plan'].astype(str).str.strip()
-
-existentes = pd.read_sql('SELECT id_plan FROM plan', engine)
-existentes['id_plan'] = existentes['id_plan'].astype(str).str.strip().str.upper()
-
-df_plan_filtrado = df_plan[~df_plan['id_plan'].isin(existentes['id_plan'])]
-print(f"🆕 Nuevos a insertar: {len(df_plan_filtrado)}")
-
-if not df_plan_filtrado.empty:
     try:
-        df_plan_filtrado.to_sql('plan', engine, if_exists='append', index=False)
-        print(f"✅ Insertados en 'plan': {len(df_plan_filtrado)}")
+        with engine.begin() as conn:
+            return cache.resolver(conn, tabla_sql, df_origen[columna])
     except Exception as e:
-        print(f"❌ Error al insertar en 'plan': {e}")
-else:
-    print("⚠️ Todos los registros ya existen en 'plan'.")
-# ==============================
-# 8️⃣ Mapear auxiliares para cliente y cliente_plan_info
-# ==============================
-def cargar_tabla_auxiliar(query, columna_clave):
-    tabla = pd.read_sql(query, engine)
-    tabla[columna_clave] = tabla[columna_clave].astype(str).str.strip().str.upper()
-    return tabla.drop_duplicates(subset=[columna_clave])
+        cache.invalidar(tabla_sql)
+        sys.exit(f"❌ Error al insertar en '{tabla_sql}': {e}")
 
-tipo_map = cargar_tabla_auxiliar('SELECT id_tipo_ident, nombre_tipo FROM tipo_identificacion', 'nombre_tipo')
-prov_map = cargar_tabla_auxiliar('SELECT id_provincia, nombre_provincia FROM provincia', 'nombre_provincia')
-ciudad_map = cargar_tabla_auxiliar('SELECT id_ciudad, nombre_ciudad FROM ciudad', 'nombre_ciudad')
-inst_map = cargar_tabla_auxiliar('SELECT id_institucion, nombre_institucion FROM institucion_financiera', 'nombre_institucion')
-pago_map = cargar_tabla_auxiliar('SELECT id_forma_pago, desc_forma_pago FROM forma_pago', 'desc_forma_pago')
 
 def merge_con_log(df, tabla_aux, columna_df, columna_aux, nombre_tabla):
     antes = len(df)
@@ -226,141 +79,194 @@ def merge_con_log(df, tabla_aux, columna_df, columna_aux, nombre_tabla):
     print(f"🔄 Merge con {nombre_tabla}: antes={antes}, después={len(df)}")
     return df
 
-df = merge_con_log(df, tipo_map, 'tipo_identificacion', 'nombre_tipo', 'tipo_identificacion')
-df = merge_con_log(df, prov_map, 'provincia', 'nombre_provincia', 'provincia')
-df = merge_con_log(df, ciudad_map, 'ciudad', 'nombre_ciudad', 'ciudad')
-df = merge_con_log(df, inst_map, 'institucion_financiera', 'nombre_institucion', 'institucion_financiera')
-df = merge_con_log(df, pago_map, 'desc_forma_pago', 'desc_forma_pago', 'forma_pago')
 
 # ==============================
-# 9️⃣ Insertar clientes
+# 📦 Procesar un lote del Excel (pasos 3️⃣ a 12️⃣)
 # ==============================
-df_cliente = df[['identificacion', 'nombre_completo', 'celular', 'fecha_alta']].copy()
-df_cliente['celular'] = df_cliente['celular'].astype(str).str.strip().apply(lambda x: x if x.startswith('0') else '0' + x)
-df_cliente['fecha_alta'] = pd.to_datetime(df_cliente['fecha_alta'], errors='coerce', dayfirst=True)
-df_cliente['id_tipo_ident'] = df['id_tipo_ident']
-df_cliente['id_provincia'] = df['id_provincia']
-df_cliente['id_ciudad'] = df['id_ciudad']
+def procesar_lote(df):
+    # ==============================
+    # 🔧 Normalizar columnas de período
+    # ==============================
+    df['año'] = df['año'].astype(str).str.strip()
+    df['mes'] = df['mes'].astype(str).str.strip().str.upper()
+    df['texto_extraido'] = df['texto_extraido'].astype(str).str.strip().str.lower()
+
+    # Obtener id_anio
+    año = str(int(float(df['año'].dropna().unique()[0]))).strip()
+    id_anio = cache.obtener(engine, 'anio', año)
+    if id_anio is None:
+        raise ValueError(f"❌ Año '{año}' no encontrado en la tabla 'anio'.")
+
+    # Crear períodos únicos (por año, mes y texto_extraido): todas las
+    # combinaciones del lote se resuelven en una sola sentencia
+    combinaciones = df[['mes', 'texto_extraido']].dropna().drop_duplicates()
+    combinaciones['id_mes'] = combinaciones['mes'].map(lambda mes: cache.obtener(engine, 'mes', mes))
+    sin_mes = combinaciones.loc[combinaciones['id_mes'].isna(), 'mes']
+    if not sin_mes.empty:
+        raise ValueError(f"❌ Mes '{sin_mes.iloc[0]}' no encontrado en la tabla 'mes'.")
+    combinaciones['id_mes'] = combinaciones['id_mes'].astype(int)
 
-print(f"🔢 Registros a insertar en cliente: {len(df_cliente)}")
-df_cliente.to_sql('cliente', engine, if_exists='append', index=False)
-print(f"✅ Insertados en 'cliente': {len(df_cliente)}")
+    with engine.begin() as conn:
+        periodos = asegurar_periodos(conn, id_anio, combinaciones[['id_mes', 'texto_extraido']])
+    periodo_map = combinaciones.merge(periodos, on=['id_mes', 'texto_extraido'], how='left')
+    for _, fila in periodo_map.iterrows():
+        if fila['nuevo']:
+            print(f"🆕 Nuevo período insertado: {fila['mes']} {año} ({fila['texto_extraido']}) → id_periodo = {fila['id_periodo']}")
+        else:
+            print(f"ℹ️ Período ya existente: {fila['mes']} {año} ({fila['texto_extraido']}) → id_periodo = {fila['id_periodo']}")
+
+    # Asignar id_periodo a cada fila
+    df = df.merge(periodo_map[['mes', 'texto_extraido', 'id_periodo']], on=['mes', 'texto_extraido'], how='left')
+
+    # ==============================
+    # 3️⃣ Normalizar columnas clave
+    # ==============================
+    cols_clave = [
+        'identificacion', 'tipo_identificacion', 'provincia', 'ciudad',
+        'institucion_financiera', 'desc_forma_pago', 'id_plan', 'id_ciclo', 'id_subproducto'
+    ]
+
+    for col in cols_clave:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip().str.upper()
+
+    # ==============================
+    # 5️⃣ Insertar tablas auxiliares
+    # ==============================
+    tipo_map = insertar_auxiliar(df, 'tipo_identificacion', 'tipo_identificacion')
+    prov_map = insertar_auxiliar(df, 'provincia', 'provincia')
+    inst_map = insertar_auxiliar(df, 'institucion_financiera', 'institucion_financiera')
+    pago_map = insertar_auxiliar(df, 'desc_forma_pago', 'forma_pago')
+    insertar_auxiliar(df, 'id_subproducto', 'subproducto')
+    insertar_auxiliar(df, 'id_ciclo', 'ciclo')
+
+    # ==============================
+    # 6️⃣ Insertar ciudad con mapeo de provincia
+    # ==============================
+    print("\n📋 Tabla: ciudad")
+    with engine.begin() as conn:
+        ciudad_map = cache.resolver_ciudades(conn, df)
 
-# ==============================
-# 🔟 Mapear id_cliente
-# ==============================
-def normalizar_celular(c):
-    c = str(c).strip()
-    if c.startswith('0'):
-        return c
-    elif len(c) == 9:
-        return '0' + c
-    return c
-
-cliente_map = pd.read_sql('SELECT id_cliente, identificacion, celular FROM cliente', engine)
-cliente_map['identificacion'] = cliente_map['identificacion'].astype(str).str.strip().str.upper()
-cliente_map['celular'] = cliente_map['celular'].apply(normalizar_celular)
-cliente_map = cliente_map.drop_duplicates(subset=['identificacion', 'celular'], keep='last')
-
-df['identificacion'] = df['identificacion'].astype(str).str.strip().str.upper()
-df['celular'] = df['celular'].apply(normalizar_celular)
-
-df = df.merge(cliente_map, on=['identificacion', 'celular'], how='left')
-print(f"✅ Registros con id_cliente asignado: {df['id_cliente'].notnull().sum()}")
-print(f"❌ Registros sin id_cliente asignado: {df['id_cliente'].isnull().sum()}")
+    # ==============================
+    # 7️⃣ Insertar planes
+    # ==============================
+    print("\n📋 Tabla: plan")
+    try:
+        with engine.begin() as conn:
+            asegurar_planes(conn, df)
+    except Exception as e:
+        print(f"❌ Error al insertar en 'plan': {e}")
+
+    # ==============================
+    # 8️⃣ Mapear auxiliares para cliente y cliente_plan_info
+    # ==============================
+    # Los mapas ya vienen de los upserts anteriores (sin releer las tablas)
+    df = merge_con_log(df, tipo_map, 'tipo_identificacion', 'nombre_tipo', 'tipo_identificacion')
+    df = merge_con_log(df, prov_map, 'provincia', 'nombre_provincia', 'provincia')
+    df = merge_con_log(df, ciudad_map, 'ciudad', 'nombre_ciudad', 'ciudad')
+    df = merge_con_log(df, inst_map, 'institucion_financiera', 'nombre_institucion', 'institucion_financiera')
+    df = merge_con_log(df, pago_map, 'desc_forma_pago', 'desc_forma_pago', 'forma_pago')
+
+    # ==============================
+    # 9️⃣ Insertar clientes
+    # ==============================
+    df_cliente = df[['identificacion', 'nombre_completo', 'celular', 'fecha_alta']].copy()
+    df_cliente['celular'] = df_cliente['celular'].astype(str).str.strip().apply(lambda x: x if x.startswith('0') else '0' + x)
+    df_cliente['fecha_alta'] = pd.to_datetime(df_cliente['fecha_alta'], errors='coerce', dayfirst=True)
+    df_cliente['id_tipo_ident'] = df['id_tipo_ident']
+    df_cliente['id_provincia'] = df['id_provincia']
+    df_cliente['id_ciudad'] = df['id_ciudad']
+
+    print(f"🔢 Registros a insertar en cliente: {len(df_cliente)}")
+    # ==============================
+    # 🔟 Mapear id_cliente
+    # ==============================
+    # Cada fila recibe su id_cliente de la secuencia al insertarse, así que
+    # otras cargas simultáneas no alteran la asignación
+    with engine.begin() as conn:
+        df['id_cliente'] = insertar_con_ids(df_cliente, 'cliente', 'id_cliente', conn)
+    print(f"✅ Insertados en 'cliente': {len(df_cliente)}")
+    print(f"✅ Registros con id_cliente asignado: {df['id_cliente'].notnull().sum()}")
+    print(f"❌ Registros sin id_cliente asignado: {df['id_cliente'].isnull().sum()}")
+
+    # ==============================
+    # 11️⃣ Verificar campos nulos antes de insertar en cliente_plan_info
+    # ==============================
+    print("\n📊 Verificando campos nulos antes de insertar en cliente_plan_info:")
+    for col in ['id_cliente', 'id_plan', 'id_ciclo', 'id_forma_pago', 'id_institucion']:
+        print(f"❌ Registros sin {col}: {df[col].isnull().sum()}")
+
+    # ==============================
+    # 12️⃣ Insertar cliente_plan_info
+    # ==============================
+    df_plan_info = df[[
+        'id_cliente', 'id_plan', 'id_subproducto', 'id_ciclo', 'id_forma_pago',
+        'id_institucion', 'tb', 'categoria1', 'id_periodo'
+    ]].copy()
+
+    df_plan_info = df_plan_info.dropna(subset=[
+        'id_cliente', 'id_plan', 'id_subproducto', 'id_ciclo',
+        'id_forma_pago', 'id_institucion', 'id_periodo'
+    ])
+
+    df_plan_info['id_cliente'] = df_plan_info['id_cliente'].astype(int)
+    df_plan_info['id_plan'] = df_plan_info['id_plan'].astype(str).str.strip().str.upper()
+    df_plan_info['id_subproducto'] = df_plan_info['id_subproducto'].astype(str).str.strip().str.upper()
+    df_plan_info['id_ciclo'] = df_plan_info['id_ciclo'].astype(int)
+    df_plan_info['id_forma_pago'] = df_plan_info['id_forma_pago'].astype(int)
+    df_plan_info['id_institucion'] = df_plan_info['id_institucion'].astype(int)
+    df_plan_info['id_periodo'] = df_plan_info['id_periodo'].astype(int)
+    df_plan_info['tb'] = pd.to_numeric(df_plan_info['tb'], errors='coerce')
+    df_plan_info['categoria1'] = df_plan_info['categoria1'].astype(str).str.strip()
+    df_plan_info = df_plan_info.dropna(subset=['tb'])
+
+    # Insertar subproductos faltantes
+    insertar_auxiliar(df_plan_info, 'id_subproducto', 'subproducto')
+
+    # Insertar cliente_plan_info
+    print(f"🔢 Registros válidos a insertar en cliente_plan_info: {len(df_plan_info)}")
+    if not df_plan_info.empty:
+        try:
+            df_plan_info.to_sql('cliente_plan_info', engine, if_exists='append', index=False)
+            print(f"✅ Insertados en 'cliente_plan_info': {len(df_plan_info)}")
+        except Exception as e:
+            print(f"❌ Error al insertar en 'cliente_plan_info': {e}")
+    else:
+        print("⚠️ No hay registros válidos para insertar en 'cliente_plan_info'.")
+
+    # Períodos tocados por el lote (para el paso 13️⃣)
+    return periodo_map['id_periodo'].astype(int).tolist()
 
-# ==============================
-# 11️⃣ Verificar campos nulos antes de insertar en cliente_plan_info
-# ==============================
-print("\n📊 Verificando campos nulos antes de insertar en cliente_plan_info:")
-for col in ['id_cliente', 'id_plan', 'id_ciclo', 'id_forma_pago', 'id_institucion']:
-    print(f"❌ Registros sin {col}: {df[col].isnull().sum()}")
 
 # ==============================
-# 12️⃣ Insertar cliente_plan_info
+# 2️⃣ Leer Excel (todas las hojas) por lotes
 # ==============================
-df_plan_info = df[[
-    'id_cliente', 'id_plan', 'id_subproducto', 'id_ciclo', 'id_forma_pago',
-    'id_institucion', 'tb', 'categoria1', 'id_periodo'
-]].copy()
-
-df_plan_info = df_plan_info.dropna(subset=[
-    'id_cliente', 'id_plan', 'id_subproducto', 'id_ciclo',
-    'id_forma_pago', 'id_institucion', 'id_periodo'
-])
-
-df_plan_info['id_cliente'] = df_plan_info['id_cliente'].astype(int)
-df_plan_info['id_plan'] = df_plan_info['id_plan'].astype(str).str.strip().str.upper()
-df_plan_info['id_subproducto'] = df_plan_info['id_subproducto'].astype(str).str.strip().str.upper()
-df_plan_info['id_ciclo'] = df_plan_info['id_ciclo'].astype(int)
-df_plan_info['id_forma_pago'] = df_plan_info['id_forma_pago'].astype(int)
-df_plan_info['id_institucion'] = df_plan_info['id_institucion'].astype(int)
-df_plan_info['id_periodo'] = df_plan_info['id_periodo'].astype(int)
-df_plan_info['tb'] = pd.to_numeric(df_plan_info['tb'], errors='coerce')
-df_plan_info['categoria1'] = df_plan_info['categoria1'].astype(str).str.strip()
-df_plan_info = df_plan_info.dropna(subset=['tb'])
-
-# Insertar subproductos faltantes
-subproductos_existentes = pd.read_sql('SELECT id_subproducto FROM subproducto', engine)
-subproductos_existentes['id_subproducto'] = subproductos_existentes['id_subproducto'].astype(str).str.strip().str.upper()
-
-df_subproducto = pd.DataFrame({'id_subproducto': df_plan_info['id_subproducto'].dropna().unique()})
-df_subproducto['id_subproducto'] = df_subproducto['id_subproducto'].astype(str).str.strip().str.upper()
-
-df_subproducto_nuevos = df_subproducto[~df_subproducto['id_subproducto'].isin(subproductos_existentes['id_subproducto'])]
-
-if not df_subproducto_nuevos.empty:
-    df_subproducto_nuevos.to_sql('subproducto', engine, if_exists='append', index=False)
-    print(f"✅ Insertados en 'subproducto': {len(df_subproducto_nuevos)}")
-else:
-    print("⚠️ Todos los subproductos ya existen.")
-
-# Insertar cliente_plan_info
-print(f"🔢 Registros válidos a insertar en cliente_plan_info: {len(df_plan_info)}")
-if not df_plan_info.empty:
-    try:
-        df_plan_info.to_sql('cliente_plan_info', engine, if_exists='append', index=False)
-        print(f"✅ Insertados en 'cliente_plan_info': {len(df_plan_info)}")
-    except Exception as e:
-        print(f"❌ Error al insertar en 'cliente_plan_info': {e}")
-else:
-    print("⚠️ No hay registros válidos para insertar en 'cliente_plan_info'.")
+total_registros = 0
+periodos_cargados = set()
+try:
+    print("📥 Leyendo archivo Excel por lotes (todas las hojas)...")
+    for nombre_hoja, df in leer_excel_por_lotes(ruta_excel):
+        print(f"\n📦 Lote de la hoja '{nombre_hoja}': {len(df)} registros")
+        periodos_cargados.update(procesar_lote(df))
+        total_registros += len(df)
+except Exception as e:
+    sys.exit(f"❌ Error procesando Excel: {e}")
+print(f"✅ Total registros procesados de todas las hojas: {total_registros}")
+
+cache.registrar_estadisticas()
 
 
 # ==============================
 # 13️⃣ Actualizar nombre_base en periodo_carga según texto_extraido
 # ==============================
+# Una sola sentencia y solo para los períodos de esta carga
 try:
-    meses = {
-        "ene": "01", "feb": "02", "mar": "03", "abr": "04",
-        "may": "05", "jun": "06", "jul": "07", "ago": "08",
-        "sep": "09", "oct": "10", "nov": "11", "dic": "12"
-    }
-
     with engine.begin() as conn:
-        result = conn.execute(text("SELECT DISTINCT texto_extraido FROM periodo_carga WHERE texto_extraido IS NOT NULL"))
-        texto_list = [r[0] for r in result]
-
-        for texto in texto_list:
-            if texto:
-                texto_limpio = str(texto).strip().lower()
-                # Buscar abreviatura del mes y reemplazar por número
-                for mes_abv, mes_nro in meses.items():
-                    if mes_abv in texto_limpio:
-                        texto_limpio = texto_limpio.replace(mes_abv, mes_nro)
-                        break
-                # Crear el nombre_base en formato numérico
-                nombre_base = f"b_pos_{texto_limpio}"
-
-                conn.execute(
-                    text("""
-                        UPDATE periodo_carga
-                        SET nombre_base = :nombre
-                        WHERE texto_extraido = :texto
-                    """),
-                    {"nombre": nombre_base, "texto": texto}
-                )
-                print(f"✅ Actualizado: texto_extraido={texto} → nombre_base={nombre_base}")
+        actualizados = actualizar_nombre_base(conn, periodos_cargados, prefijo='b_pos_')
+        cache_resultados.marcar_cambio(conn, periodos_cargados)
+    invalidar_caches('periodo_carga')
+    for _, fila in actualizados.iterrows():
+        print(f"✅ Actualizado: texto_extraido={fila['texto_extraido']} → nombre_base={fila['nombre_base']}")
 
     print("✅ Todos los nombres_base fueron actualizados correctamente con formato numérico.")
 
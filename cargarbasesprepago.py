@@ -6,6 +6,11 @@ import tkinter as tk  # Interfaz gráfica para seleccionar archivos
 from tkinter import filedialog # Diálogo para seleccionar archivos
 from sqlalchemy.engine import URL  # Construir URLs de conexión a bases de datos
 import logging  # Registro de eventos para depuración y monitoreo
+from cache_dimensiones import obtener_cache # Caché de dimensiones compartido por el proceso
+from cargamasiva import insertar_con_ids # Ids de cliente reservados de la secuencia
+from bloqueos import seccion_critica # Bloqueos para cargas simultáneas
+import normalizacion # Normalizadores vectorizados compartidos
+import cache_resultados # Invalidar los resultados cacheados de app.py
 
 # ==============================
 # 1️⃣ Conexión segura a PostgreSQL
@@ -77,31 +82,13 @@ df['monto_recarga'] = df['monto_recarga'].astype(str).str.strip()
 df['identificacion'] = df['identificacion'].astype(str).str.strip()
 df['celular'] = df['celular'].astype(str).str.strip()
 
-def limpiar_identificacion(valor):
-    valor = str(valor).strip()
-    if valor.endswith('.0'):
-        try:
-            return str(int(float(valor)))
-        except ValueError:
-            return valor
-    return valor
-
-df['identificacion'] = df['identificacion'].apply(limpiar_identificacion)
+df['identificacion'] = normalizacion.limpiar_identificacion(df['identificacion'])
 df.loc[df['identificacion'] == '', 'identificacion'] = '9999999999'
 corregidos_identificacion = df['identificacion'].str.endswith('.0').sum()
 print(f"🔍 Identificaciones corregidas: {corregidos_identificacion}")
 
-def normalizar_celular(valor):
-    valor = str(valor).strip()
-    if valor == '':
-        return ''
-    try:
-        return str(int(float(valor))).zfill(10)
-    except ValueError:
-        return valor
-
-df['celular'] = df['celular'].apply(normalizar_celular)
-celulares_corregidos = df['celular'].apply(lambda x: len(x) < 10 or not x.isdigit()).sum()
+df['celular'] = normalizacion.normalizar_celular_prepago(df['celular'])
+celulares_corregidos = ((df['celular'].str.len() < 10) | ~df['celular'].str.isdigit()).sum()
 print(f"📱 Celulares potencialmente inconsistentes: {celulares_corregidos}")
 
 # ==============================
@@ -129,8 +116,9 @@ def leer_sql(query):
 # ==============================
 # 5️⃣ Cargar tablas de referencia
 # ==============================
-df_anio = leer_sql('SELECT * FROM anio')
-df_mes = leer_sql('SELECT * FROM mes')
+cache = obtener_cache(engine)
+df_anio = cache.tabla(engine, 'anio')
+df_mes = cache.tabla(engine, 'mes')
 
 df = df.merge(df_anio, left_on='anio', right_on='valor', how='left')
 df = df.merge(df_mes, left_on='mes', right_on='nombre_mes', how='left')
@@ -146,27 +134,31 @@ df_periodos = df[['id_anio', 'id_mes', 'texto_extraido']].drop_duplicates().copy
 # 👉 Agregar el campo nombre_base (en minúsculas con prefijo b_ppa_)
 df_periodos['nombre_base'] = 'b_ppa_' + df_periodos['texto_extraido'].str.lower()
 
-periodos_existentes = leer_sql('SELECT id_anio, id_mes, texto_extraido FROM periodo_carga')
-
-df_nuevos_periodos = df_periodos.merge(
-    periodos_existentes,
-    on=['id_anio', 'id_mes', 'texto_extraido'],
-    how='left',
-    indicator=True
-).query("_merge == 'left_only'").drop(columns=['_merge'])
-
-if not df_nuevos_periodos.empty:
-    print(f"🆕 Insertando {len(df_nuevos_periodos)} nuevos períodos...")
-    try:
-        df_nuevos_periodos.to_sql('periodo_carga', engine, if_exists='append', index=False)
-    except SQLAlchemyError as e:
-        print(f"❌ Error insertando nuevos periodos: {e}")
-else:
-    print("ℹ️ No hay nuevos períodos.")
+# Lectura e inserción con el bloqueo de periodo_carga: otra carga
+# simultánea no inserta el mismo período
+try:
+    with seccion_critica(engine, 'periodo_carga') as conn:
+        periodos_existentes = pd.read_sql('SELECT id_anio, id_mes, texto_extraido FROM periodo_carga', conn)
+
+        df_nuevos_periodos = df_periodos.merge(
+            periodos_existentes,
+            on=['id_anio', 'id_mes', 'texto_extraido'],
+            how='left',
+            indicator=True
+        ).query("_merge == 'left_only'").drop(columns=['_merge'])
+
+        if not df_nuevos_periodos.empty:
+            print(f"🆕 Insertando {len(df_nuevos_periodos)} nuevos períodos...")
+            df_nuevos_periodos.to_sql('periodo_carga', conn, if_exists='append', index=False)
+        else:
+            print("ℹ️ No hay nuevos períodos.")
+
+        df_periodos_actualizados = pd.read_sql(
+            'SELECT id_periodo, id_anio, id_mes, texto_extraido FROM periodo_carga', conn
+        )
+except SQLAlchemyError as e:
+    sys.exit(f"❌ Error insertando nuevos periodos: {e}")
 
-df_periodos_actualizados = leer_sql(
-    'SELECT id_periodo, id_anio, id_mes, texto_extraido FROM periodo_carga'
-)
 df = df.merge(df_periodos_actualizados, on=['id_anio', 'id_mes', 'texto_extraido'], how='left')
 
 # ==============================
@@ -175,28 +167,16 @@ df = df.merge(df_periodos_actualizados, on=['id_anio', 'id_mes', 'texto_extraido
 df_clientes = df[['identificacion', 'celular', 'monto_recarga', 'nombre_completo']].copy()
 print(f"📋 Insertando {len(df_clientes)} registros en tabla cliente...")
 
-try:
-    df_clientes.to_sql('cliente', engine, if_exists='append', index=False)
-except SQLAlchemyError as e:
-    sys.exit(f"❌ Error insertando clientes: {e}")
-
 # ==============================
 # 8️⃣ Relacionar filas con id_cliente
 # ==============================
-clientes_totales = leer_sql('SELECT id_cliente, identificacion, celular, nombre_completo FROM cliente')
-n = len(df_clientes)
-clientes_nuevos = clientes_totales.tail(n).copy()
-
-df_clientes = df_clientes.reset_index(drop=True)
-clientes_nuevos = clientes_nuevos.reset_index(drop=True)
-df_clientes['idx'] = df_clientes.index
-clientes_nuevos['idx'] = clientes_nuevos.index
-
-df_merged = pd.merge(df_clientes, clientes_nuevos[['id_cliente', 'idx']], on='idx')
-
-df = df.reset_index(drop=True)
-df['idx'] = df.index
-df = df.merge(df_merged[['idx', 'id_cliente']], on='idx', how='left')
+# Cada fila recibe su id_cliente de la secuencia al insertarse (antes se
+# tomaban las últimas n filas de cliente, que pueden ser de otra carga)
+try:
+    with engine.begin() as conn:
+        df['id_cliente'] = insertar_con_ids(df_clientes, 'cliente', 'id_cliente', conn)
+except SQLAlchemyError as e:
+    sys.exit(f"❌ Error insertando clientes: {e}")
 
 # ==============================
 # 9️⃣ Insertar cliente_plan_info con transacción
@@ -207,5 +187,7 @@ print(f"📥 Insertando {len(df_stg)} registros en cliente_plan_info...")
 try:
     df_stg.to_sql('cliente_plan_info', engine, if_exists='append', index=False)
     print("✅ Carga completa en cliente_plan_info.")
+    with engine.begin() as conn:
+        cache_resultados.marcar_cambio(conn, sorted(df_stg['id_periodo'].unique().tolist()))
 except SQLAlchemyError as e:
     print(f"❌ Error al insertar en cliente_plan_info: {e}")
@@ -0,0 +1,61 @@
+import pandas as pd # Requiere: pip install pandas openpyxl
+from openpyxl import Workbook # Requiere: pip install openpyxl
+import logging # Para logging
+import threading # Para guardar la copia sin detener la carga
+import time # Para medir el tiempo de escritura
+
+
+# ==============================
+# Escritura directa (sin reabrir el archivo)
+# ==============================
+def _valor(v):
+    """Celdas vacías para NaN/NaT, igual que DataFrame.to_excel."""
+    if v is None or (not isinstance(v, str) and pd.isna(v)):
+        return None
+    return v
+
+
+def guardar_excel(hojas, ruta):
+    """
+    Guarda un DataFrame (o un dict nombre_hoja → DataFrame) en `ruta` con
+    openpyxl en modo write_only: las filas se escriben una por una y los
+    encabezados quedan sin negrita desde el inicio, así que ya no hace falta
+    volver a abrir el archivo con quitar_negrita_excel.
+    """
+    if isinstance(hojas, pd.DataFrame):
+        hojas = {'Sheet1': hojas}
+
+    wb = Workbook(write_only=True)
+    for nombre_hoja, df in hojas.items():
+        ws = wb.create_sheet(title=nombre_hoja)
+        ws.append([str(c) for c in df.columns])
+        for fila in df.itertuples(index=False, name=None):
+            ws.append([_valor(v) for v in fila])
+    wb.save(ruta)
+
+
+# ==============================
+# Copia legible en segundo plano
+# ==============================
+def guardar_en_segundo_plano(hojas, ruta):
+    """
+    Escribe la copia en un hilo aparte para que la carga a PostgreSQL no la
+    espere. Se guarda una copia de los datos, así que el llamador puede
+    seguir modificando su DataFrame. Retorna el hilo (join() para esperarlo).
+    El hilo no es daemon: el proceso no termina hasta que la copia se guarde.
+    """
+    if isinstance(hojas, pd.DataFrame):
+        hojas = {'Sheet1': hojas}
+    hojas = {nombre: df.copy() for nombre, df in hojas.items()}
+
+    def _tarea():
+        inicio = time.perf_counter()
+        try:
+            guardar_excel(hojas, ruta)
+            logging.info(f"📂 Copia guardada en segundo plano: {ruta} ({time.perf_counter() - inicio:.1f} s)")
+        except Exception:
+            logging.exception(f"❌ Error guardando la copia {ruta}")
+
+    hilo = threading.Thread(target=_tarea, name="copia-excel")
+    hilo.start()
+    return hilo
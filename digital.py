@@ -6,175 +6,208 @@ from sqlalchemy import create_engine # pip install sqlalchemy psycopg2-binary
 from sqlalchemy.engine import URL # Para construir la URL de conexión
 from sqlalchemy.exc import OperationalError # Para manejar errores de conexión
 import logging # Para registrar eventos
+from cache_dimensiones import obtener_cache # Archivo local: cache_dimensiones.py
+from cargamasiva import insertar_con_ids # Archivo local: cargamasiva.py
+from bloqueos import seccion_critica # Archivo local: bloqueos.py
+from lectura_excel import leer_excels_en_paralelo # Archivo local: lectura_excel.py
+from registro_cargas import archivos_pendientes, registrar_cargas, forzar_recarga # Archivo local: registro_cargas.py
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-# ========= Conexión a la base de datos (PostgreSQL) =========
-usuario = "analista"
-contraseña = "2025Anal1st@"   # Déjala tal cual; URL.create la escapa
-host = "192.168.10.37"
-puerto = 5432
-base_datos = "BcorpDigitalPrueba"
-
-
-# Requiere: pip install psycopg2-binary
-url = URL.create(
-    drivername="postgresql+psycopg2",
-    username=usuario,
-    password=contraseña,
-    host=host,
-    port=puerto,
-    database=base_datos,
-)
-
-try:
-    engine = create_engine(
-        url,
-        pool_pre_ping=True,
-        pool_size=5,
-        max_overflow=10,
-        pool_timeout=60,
-    )
-    with engine.connect() as conn:
-        logging.info("✅ Conexión a PostgreSQL OK.")
-except OperationalError as e:
-    logging.exception("❌ Error de conexión a PostgreSQL.")
-    raise SystemExit(e)
-
-
-
 
 # ==============================
-# 2️⃣ Leer todos los Excel de la carpeta
+# 🧹 Normalización de cada hoja (corre en los procesos de lectura)
 # ==============================
-carpeta_principal = r'C:\Users\pasante.ti2\Documents\Movistar\DIGITAL'
-rutas_excel = glob.glob(os.path.join(carpeta_principal, '**', '*.xlsx'), recursive=True)
+def normalizar_hoja(df_hoja, mes_carpeta):
+    """Limpia una hoja de DIGITAL dejando los datos exactos del Excel."""
+    df_hoja.columns = [col.lower().strip() for col in df_hoja.columns]
 
-if not rutas_excel:
-    sys.exit("❌ No se encontraron archivos Excel en la carpeta indicada.")
+    # Mantener mes
+    if 'mes' not in df_hoja.columns:
+        df_hoja['mes'] = mes_carpeta
+    else:
+        df_hoja['mes'] = df_hoja['mes'].fillna(mes_carpeta).astype(str).str.strip().str.upper()
 
-df_list = []
+    # Mantener texto_extraido exactamente como en Excel
+    if 'texto_extraido' not in df_hoja.columns:
+        df_hoja['texto_extraido'] = ''
+    else:
+        df_hoja['texto_extraido'] = df_hoja['texto_extraido'].apply(lambda x: x.strip() if pd.notna(x) else '')
 
-# ==============================
-# 2️⃣ Leer hojas y mantener datos exactos
-# ==============================
-for ruta_excel in rutas_excel:
-    nombre_archivo = os.path.basename(ruta_excel)
-    if nombre_archivo.startswith('~$'):
-        continue
-    
-    carpeta_relativa = os.path.relpath(os.path.dirname(ruta_excel), carpeta_principal)
-    mes_carpeta = carpeta_relativa.split(os.sep)[0].upper()
+    # Mantener identificacion y nombre_completo exactos
+    if 'identificacion' not in df_hoja.columns:
+        df_hoja['identificacion'] = ''
+    else:
+        df_hoja['identificacion'] = df_hoja['identificacion'].apply(lambda x: x.strip() if pd.notna(x) else '')
 
-    try:
-        hojas = pd.read_excel(ruta_excel, sheet_name=None, dtype=str)
-        for nombre_hoja, df_hoja in hojas.items():
-            df_hoja.columns = [col.lower().strip() for col in df_hoja.columns]
-
-            # Mantener mes
-            if 'mes' not in df_hoja.columns:
-                df_hoja['mes'] = mes_carpeta
-            else:
-                df_hoja['mes'] = df_hoja['mes'].fillna(mes_carpeta).astype(str).str.strip().str.upper()
-
-            # Mantener texto_extraido exactamente como en Excel
-            if 'texto_extraido' not in df_hoja.columns:
-                df_hoja['texto_extraido'] = ''
-            else:
-                df_hoja['texto_extraido'] = df_hoja['texto_extraido'].apply(lambda x: x.strip() if pd.notna(x) else '')
-
-            # Mantener identificacion y nombre_completo exactos
-            if 'identificacion' not in df_hoja.columns:
-                df_hoja['identificacion'] = ''
-            else:
-                df_hoja['identificacion'] = df_hoja['identificacion'].apply(lambda x: x.strip() if pd.notna(x) else '')
-
-            if 'nombre_completo' not in df_hoja.columns:
-                df_hoja['nombre_completo'] = ''
-            else:
-                df_hoja['nombre_completo'] = df_hoja['nombre_completo'].apply(lambda x: x.strip() if pd.notna(x) else '')
-
-            # Celular
-            if 'celular' in df_hoja.columns:
-                df_hoja['celular'] = df_hoja['celular'].astype(str).str.replace(r'\.0$', '', regex=True)
-                df_hoja['celular'] = df_hoja['celular'].apply(lambda x: x if x.startswith('0') else '0'+x)
-
-            df_list.append(df_hoja)
-
-        total_registros = sum(len(df_hoja) for df_hoja in hojas.values())
-        print(f"✅ Leído {nombre_archivo} ({total_registros} filas) con mes {mes_carpeta}")
-    except Exception as e:
-        print(f"⚠️ Error leyendo {nombre_archivo}: {e}")
-
-if not df_list:
-    sys.exit("❌ No se pudo leer ningún Excel correctamente.")
-
-df = pd.concat(df_list, ignore_index=True)
-print(f"📊 Total registros combinados: {len(df)}")
+    if 'nombre_completo' not in df_hoja.columns:
+        df_hoja['nombre_completo'] = ''
+    else:
+        df_hoja['nombre_completo'] = df_hoja['nombre_completo'].apply(lambda x: x.strip() if pd.notna(x) else '')
 
-# ==============================
-# 3️⃣ Normalizar columnas adicionales
-# ==============================
-df['año'] = '2025'
-df['mes'] = df['mes'].str.replace(r'^\d{2}\.', '', regex=True).str.upper()
+    # Celular
+    if 'celular' in df_hoja.columns:
+        df_hoja['celular'] = df_hoja['celular'].astype(str).str.replace(r'\.0$', '', regex=True)
+        df_hoja['celular'] = df_hoja['celular'].apply(lambda x: x if x.startswith('0') else '0'+x)
 
-# ==============================
-# 4️⃣ Obtener IDs de años y meses
-# ==============================
-anio_db = pd.read_sql('SELECT id_anio, valor FROM anio', engine)
-anio_db['valor'] = anio_db['valor'].astype(str).str.strip()
-mes_db = pd.read_sql('SELECT id_mes, nombre_mes FROM mes', engine)
-mes_db['nombre_mes'] = mes_db['nombre_mes'].astype(str).str.strip().str.upper()
+    return df_hoja
 
-df = df.merge(anio_db, left_on='año', right_on='valor', how='left')
-df = df.merge(mes_db, left_on='mes', right_on='nombre_mes', how='left')
 
-if df['id_anio'].isnull().any() or df['id_mes'].isnull().any():
-    sys.exit("❌ Hay años o meses que no existen en la DB.")
+def main():
+    """Carga completa de los Excel de DIGITAL."""
+    # ========= Conexión a la base de datos (PostgreSQL) =========
+    usuario = "analista"
+    contraseña = "2025Anal1st@"   # Déjala tal cual; URL.create la escapa
+    host = "192.168.10.37"
+    puerto = 5432
+    base_datos = "BcorpDigitalPrueba"
 
-# ==============================
-# 5️⃣ Insertar periodos únicos
-# ==============================
-df_periodos = df[['id_anio','id_mes','texto_extraido']].drop_duplicates()
-df_periodos.to_sql('periodo_carga', engine, if_exists='append', index=False, method='multi')
-print(f"✅ Periodos únicos insertados: {len(df_periodos)}")
 
-# ==============================
-# 6️⃣ Asignar id_periodo con diccionario
-# ==============================
-df_periodos_db = pd.read_sql('SELECT * FROM periodo_carga', engine)
-periodo_map = df_periodos_db.set_index(['id_anio','id_mes','texto_extraido'])['id_periodo'].to_dict()
-df['id_periodo'] = df.apply(lambda row: periodo_map.get((row['id_anio'], row['id_mes'], row['texto_extraido'])), axis=1)
-
-# ==============================
-# 7️⃣ Insertar clientes EXACTAMENTE como en Excel
-# ==============================
-df_cliente = df[['identificacion','nombre_completo','celular']].copy()
-df_cliente.to_sql('cliente', engine, if_exists='append', index=False, method='multi')
-print(f"✅ Clientes insertados: {len(df_cliente)}")  # 57297
-
-# ==============================
-# 8️⃣ Asignar id_cliente fila a fila sin duplicar
-# ==============================
-df_clientes_db = pd.read_sql('SELECT id_cliente, identificacion, nombre_completo, celular FROM cliente', engine)
-excel_keys = list(zip(df['identificacion'], df['nombre_completo'], df['celular']))
-db_keys = list(zip(df_clientes_db['identificacion'], df_clientes_db['nombre_completo'], df_clientes_db['celular']))
-id_cliente_map = dict(zip(db_keys, df_clientes_db['id_cliente']))
-df['id_cliente'] = [id_cliente_map.get(k) for k in excel_keys]
-
-# ==============================
-# 9️⃣ Insertar cliente_plan_info EXACTAMENTE igual al número de filas original
-# ==============================
-df_plan_info = df[['id_cliente','id_periodo']].copy()  # No drop_duplicates
-df_plan_info.to_sql('cliente_plan_info', engine, if_exists='append', index=False, method='multi')
-print(f"✅ Cliente_plan_info insertados: {len(df_plan_info)}")  # 57297 ✅
-
-# ==============================
-# 🔟 Resumen final por mes
-# ==============================
-resumen_mes = df.groupby('mes').size().reset_index(name='registros')
-print("\n📊 Registros por mes:")
-print(resumen_mes)
+    # Requiere: pip install psycopg2-binary
+    url = URL.create(
+        drivername="postgresql+psycopg2",
+        username=usuario,
+        password=contraseña,
+        host=host,
+        port=puerto,
+        database=base_datos,
+    )
 
-print("\n🎉 ¡Carga completa en PostgreSQL con todos los registros exactos y vacíos respetados!")
+    try:
+        engine = create_engine(
+            url,
+            pool_pre_ping=True,
+            pool_size=5,
+            max_overflow=10,
+            pool_timeout=60,
+        )
+        with engine.connect() as conn:
+            logging.info("✅ Conexión a PostgreSQL OK.")
+    except OperationalError as e:
+        logging.exception("❌ Error de conexión a PostgreSQL.")
+        raise SystemExit(e)
+
+    cache = obtener_cache(engine)
+
+
+
+
+    # ==============================
+    # 2️⃣ Leer todos los Excel de la carpeta
+    # ==============================
+    carpeta_principal = r'C:\Users\pasante.ti2\Documents\Movistar\DIGITAL'
+    rutas_excel = glob.glob(os.path.join(carpeta_principal, '**', '*.xlsx'), recursive=True)
+
+    if not rutas_excel:
+        sys.exit("❌ No se encontraron archivos Excel en la carpeta indicada.")
+
+    # Omitir los archivos que ya están en load_ledger (salvo con --force)
+    rutas_excel = [r for r in rutas_excel if not os.path.basename(r).startswith('~$')]
+    pendientes = archivos_pendientes(engine, rutas_excel, forzar=forzar_recarga())
+    if not pendientes:
+        print("ℹ️ Todos los archivos ya fueron cargados. Use --force para recargarlos.")
+        return
+
+    df_list = []
+
+    # ==============================
+    # 2️⃣ Leer hojas en paralelo y mantener datos exactos
+    # ==============================
+    archivos = []
+    for archivo in pendientes:
+        ruta_excel = archivo['ruta']
+        carpeta_relativa = os.path.relpath(os.path.dirname(ruta_excel), carpeta_principal)
+        mes_carpeta = carpeta_relativa.split(os.sep)[0].upper()
+        archivos.append((ruta_excel, {'mes_carpeta': mes_carpeta}))
+
+    cargados = []
+    resultados = leer_excels_en_paralelo(archivos, normalizar_hoja)
+    for archivo, (_, argumentos), r in zip(pendientes, archivos, resultados):
+        nombre_archivo = os.path.basename(r['ruta'])
+        if r['error'] is not None:
+            print(f"⚠️ Error leyendo {nombre_archivo}: {r['error']}")
+            continue
+        df_list.extend(df_hoja for _, df_hoja in r['hojas'])
+        archivo['filas'] = r['filas']
+        cargados.append(archivo)
+        print(f"✅ Leído {nombre_archivo} ({r['filas']} filas) con mes {argumentos['mes_carpeta']} en {r['segundos']:.2f} s")
+
+    if not df_list:
+        sys.exit("❌ No se pudo leer ningún Excel correctamente.")
+
+    df = pd.concat(df_list, ignore_index=True)
+    print(f"📊 Total registros combinados: {len(df)}")
+
+    # ==============================
+    # 3️⃣ Normalizar columnas adicionales
+    # ==============================
+    df['año'] = '2025'
+    df['mes'] = df['mes'].str.replace(r'^\d{2}\.', '', regex=True).str.upper()
+
+    # ==============================
+    # 4️⃣ Obtener IDs de años y meses
+    # ==============================
+    anio_db = cache.tabla(engine, 'anio')
+    mes_db = cache.tabla(engine, 'mes')
+
+    df = df.merge(anio_db, left_on='año', right_on='valor', how='left')
+    df = df.merge(mes_db, left_on='mes', right_on='nombre_mes', how='left')
+
+    if df['id_anio'].isnull().any() or df['id_mes'].isnull().any():
+        sys.exit("❌ Hay años o meses que no existen en la DB.")
+
+    # ==============================
+    # 5️⃣ Insertar periodos únicos
+    # ==============================
+    df_periodos = df[['id_anio','id_mes','texto_extraido']].drop_duplicates()
+    # Solo los períodos que aún no existen (antes se duplicaban en cada ejecución)
+    # Con el bloqueo de periodo_carga: otra carga simultánea no inserta el mismo período
+    with seccion_critica(engine, 'periodo_carga') as conn:
+        df_periodos_db = pd.read_sql('SELECT id_anio, id_mes, texto_extraido FROM periodo_carga', conn)
+        df_periodos = df_periodos.merge(df_periodos_db, on=['id_anio','id_mes','texto_extraido'], how='left', indicator=True)
+        df_periodos = df_periodos[df_periodos['_merge'] == 'left_only'].drop(columns='_merge')
+        df_periodos.to_sql('periodo_carga', conn, if_exists='append', index=False, method='multi')
+        df_periodos_db = pd.read_sql('SELECT * FROM periodo_carga', conn)
+    print(f"✅ Periodos nuevos insertados: {len(df_periodos)}")
+
+    # ==============================
+    # 6️⃣ Asignar id_periodo con diccionario
+    # ==============================
+    periodo_map = df_periodos_db.set_index(['id_anio','id_mes','texto_extraido'])['id_periodo'].to_dict()
+    df['id_periodo'] = df.apply(lambda row: periodo_map.get((row['id_anio'], row['id_mes'], row['texto_extraido'])), axis=1)
+
+    # ==============================
+    # 7️⃣ Insertar clientes EXACTAMENTE como en Excel y cliente_plan_info
+    # ==============================
+    # Cada fila recibe su id_cliente de la secuencia al insertarse (antes se
+    # buscaba por identificacion/nombre/celular en toda la tabla cliente,
+    # que puede devolver la fila de otra carga o de un cliente repetido)
+    # Clientes, cliente_plan_info y load_ledger en UNA transacción: si algo
+    # falla no queda nada a medias y el archivo se vuelve a cargar completo
+    df_cliente = df[['identificacion','nombre_completo','celular']].copy()
+    with engine.begin() as conn:
+        df['id_cliente'] = insertar_con_ids(df_cliente, 'cliente', 'id_cliente', conn)
+        print(f"✅ Clientes insertados: {len(df_cliente)}")  # 57297
+
+        # cliente_plan_info EXACTAMENTE igual al número de filas original
+        df_plan_info = df[['id_cliente','id_periodo']].copy()  # No drop_duplicates
+        df_plan_info.to_sql('cliente_plan_info', conn, if_exists='append', index=False, method='multi')
+        print(f"✅ Cliente_plan_info insertados: {len(df_plan_info)}")  # 57297 ✅
+
+        # 📒 Registrar los archivos en load_ledger para no volver a cargarlos
+        registrar_cargas(conn, cargados, df['id_periodo'])
+
+    # ==============================
+    # 🔟 Resumen final por mes
+    # ==============================
+    resumen_mes = df.groupby('mes').size().reset_index(name='registros')
+    print("\n📊 Registros por mes:")
+    print(resumen_mes)
+
+    print("\n🎉 ¡Carga completa en PostgreSQL con todos los registros exactos y vacíos respetados!")
+
+
+# Necesario para ProcessPoolExecutor: los procesos hijos importan este archivo
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import pandas as pd # Requiere: pip install pandas sqlalchemy psycopg2-binary
+import logging # Para logging
+from sqlalchemy import text # Requiere: pip install sqlalchemy
+from bloqueos import bloquear # Archivo local: bloqueos.py
+
+
+# ==============================
+# Tablas de dimensión: tabla → (columna id, columna clave, tipo de la clave)
+# ==============================
+DIMENSIONES = {
+    'tipo_identificacion': ('id_tipo_ident', 'nombre_tipo', 'text'),
+    'provincia': ('id_provincia', 'nombre_provincia', 'text'),
+    'institucion_financiera': ('id_institucion', 'nombre_institucion', 'text'),
+    'forma_pago': ('id_forma_pago', 'desc_forma_pago', 'text'),
+    'subproducto': ('id_subproducto', 'id_subproducto', 'text'),
+    'ciclo': ('id_ciclo', 'id_ciclo', 'integer'),
+}
+
+
+def _valores(serie):
+    """Valores únicos no nulos de una Serie, como lista de str (para text[])."""
+    return [str(v) for v in serie.dropna().unique()]
+
+
+# ==============================
+# Dimensiones de una sola columna
+# ==============================
+def asegurar_dimension(conn, tabla, serie):
+    """
+    Inserta en `tabla` los valores de `serie` que aún no existen (comparando
+    UPPER(TRIM(...)) en el servidor) y devuelve el mapa completo
+    [columna id, columna clave] de esos valores en UNA sola sentencia.
+    La clave devuelta viene normalizada con UPPER/TRIM.
+    Toma el bloqueo de `tabla` hasta el fin de la transacción de `conn`
+    (conviene una transacción corta, ver bloqueos.py).
+    """
+    columna_id, columna, tipo = DIMENSIONES[tabla]
+    bloquear(conn, tabla)  # Dos cargas no insertan el mismo valor a la vez
+    clave_sql = f"UPPER(TRIM(d.{columna}::text))"
+
+    resultado = pd.read_sql(text(f"""
+        WITH entrada AS (
+            SELECT DISTINCT UPPER(TRIM(v)) AS clave
+            FROM unnest(CAST(:valores AS text[])) AS t(v)
+            WHERE v IS NOT NULL
+        ), nuevos AS (
+            INSERT INTO {tabla} ({columna})
+            SELECT CAST(e.clave AS {tipo})
+            FROM entrada e
+            WHERE NOT EXISTS (SELECT 1 FROM {tabla} d WHERE {clave_sql} = e.clave)
+            ON CONFLICT DO NOTHING
+            RETURNING {columna_id} AS id, UPPER(TRIM({columna}::text)) AS clave
+        )
+        SELECT id, clave, TRUE AS nuevo FROM nuevos
+        UNION ALL
+        SELECT MIN(d.{columna_id}), e.clave, FALSE
+        FROM entrada e
+        JOIN {tabla} d ON {clave_sql} = e.clave
+        GROUP BY e.clave
+    """), conn, params={"valores": _valores(serie)})
+
+    logging.info(f"🆕 Nuevos en '{tabla}': {int(resultado['nuevo'].sum())} de {len(resultado)}")
+    return resultado.rename(columns={'id': columna_id, 'clave': columna})[[columna_id, columna]]
+
+
+# ==============================
+# Ciudad (depende de provincia)
+# ==============================
+def asegurar_ciudades(conn, df_ciudad):
+    """
+    Recibe un DataFrame con columnas 'ciudad' y 'provincia'. Inserta las
+    ciudades nuevas con el id_provincia resuelto en el servidor y devuelve
+    el mapa [id_ciudad, nombre_ciudad]. Las ciudades cuya provincia no
+    existe no se insertan (igual que el merge anterior).
+    """
+    df_ciudad = df_ciudad[['ciudad', 'provincia']].dropna().drop_duplicates()
+    bloquear(conn, 'ciudad')
+
+    resultado = pd.read_sql(text("""
+        WITH entrada AS (
+            SELECT DISTINCT ON (UPPER(TRIM(c))) UPPER(TRIM(c)) AS clave, UPPER(TRIM(p)) AS provincia
+            FROM unnest(CAST(:ciudades AS text[]), CAST(:provincias AS text[])) AS t(c, p)
+            ORDER BY UPPER(TRIM(c))
+        ), nuevos AS (
+            INSERT INTO ciudad (nombre_ciudad, id_provincia)
+            SELECT e.clave, pr.id_provincia
+            FROM entrada e
+            JOIN LATERAL (
+                SELECT MIN(id_provincia) AS id_provincia
+                FROM provincia
+                WHERE UPPER(TRIM(nombre_provincia::text)) = e.provincia
+            ) pr ON pr.id_provincia IS NOT NULL
+            WHERE NOT EXISTS (SELECT 1 FROM ciudad d WHERE UPPER(TRIM(d.nombre_ciudad::text)) = e.clave)
+            ON CONFLICT DO NOTHING
+            RETURNING id_ciudad AS id, UPPER(TRIM(nombre_ciudad::text)) AS clave
+        )
+        SELECT id, clave, TRUE AS nuevo FROM nuevos
+        UNION ALL
+        SELECT MIN(d.id_ciudad), e.clave, FALSE
+        FROM entrada e
+        JOIN ciudad d ON UPPER(TRIM(d.nombre_ciudad::text)) = e.clave
+        GROUP BY e.clave
+    """), conn, params={
+        "ciudades": df_ciudad['ciudad'].astype(str).tolist(),
+        "provincias": df_ciudad['provincia'].astype(str).tolist(),
+    })
+
+    logging.info(f"🆕 Nuevos en 'ciudad': {int(resultado['nuevo'].sum())} de {len(resultado)}")
+    return resultado.rename(columns={'id': 'id_ciudad', 'clave': 'nombre_ciudad'})[['id_ciudad', 'nombre_ciudad']]
+
+
+# ==============================
+# Plan (clave id_plan + descripción)
+# ==============================
+def asegurar_planes(conn, df_plan):
+    """
+    Inserta los planes (id_plan, descripcion_plan) que aún no existen.
+    La clave del plan es el propio id_plan, así que solo se retorna
+    cuántos se insertaron.
+    """
+    df_plan = df_plan[['id_plan', 'descripcion_plan']].dropna().drop_duplicates()
+    bloquear(conn, 'plan')
+
+    insertados = conn.execute(text("""
+        WITH entrada AS (
+            SELECT DISTINCT ON (UPPER(TRIM(i))) UPPER(TRIM(i)) AS clave, TRIM(d) AS descripcion
+            FROM unnest(CAST(:ids AS text[]), CAST(:descripciones AS text[])) AS t(i, d)
+            ORDER BY UPPER(TRIM(i))
+        ), nuevos AS (
+            INSERT INTO plan (id_plan, descripcion_plan)
+            SELECT e.clave, e.descripcion
+            FROM entrada e
+            WHERE NOT EXISTS (SELECT 1 FROM plan d WHERE UPPER(TRIM(d.id_plan::text)) = e.clave)
+            ON CONFLICT DO NOTHING
+            RETURNING id_plan
+        )
+        SELECT COUNT(*) FROM nuevos
+    """), {
+        "ids": df_plan['id_plan'].astype(str).tolist(),
+        "descripciones": df_plan['descripcion_plan'].astype(str).tolist(),
+    }).scalar()
+
+    logging.info(f"🆕 Nuevos en 'plan': {insertados}")
+    return insertados
+
+
+# ==============================
+# Períodos de carga (año + mes + texto_extraido)
+# ==============================
+def asegurar_periodos(conn, id_anio, df_periodos):
+    """
+    Recibe un DataFrame con columnas 'id_mes', 'texto_extraido' y
+    opcionalmente 'nombre_base'. Inserta los períodos de `id_anio` que
+    aún no existen y devuelve [id_mes, texto_extraido, id_periodo, nuevo]
+    de TODAS las combinaciones en una sola sentencia: los ids nuevos
+    salen de RETURNING (no de MAX(id_periodo), que falla si otra carga
+    inserta al mismo tiempo).
+    texto_extraido se compara sin distinguir mayúsculas; nombre_base solo
+    se compara si viene en el DataFrame.
+    """
+    df_periodos = df_periodos.drop_duplicates(subset=['id_mes', 'texto_extraido'])
+    bloquear(conn, 'periodo_carga')
+    bases = df_periodos['nombre_base'] if 'nombre_base' in df_periodos.columns else [None] * len(df_periodos)
+
+    resultado = pd.read_sql(text("""
+        WITH entrada AS (
+            SELECT m AS id_mes, t AS texto_extraido, b AS nombre_base
+            FROM unnest(CAST(:meses AS integer[]), CAST(:textos AS text[]), CAST(:bases AS text[])) AS e(m, t, b)
+        ), existentes AS (
+            SELECT e.id_mes, e.texto_extraido, MIN(p.id_periodo) AS id_periodo
+            FROM entrada e
+            JOIN periodo_carga p
+              ON p.id_anio = CAST(:id_anio AS integer)
+             AND p.id_mes = e.id_mes
+             AND UPPER(p.texto_extraido) = UPPER(e.texto_extraido)
+             AND (e.nombre_base IS NULL OR p.nombre_base = e.nombre_base)
+            GROUP BY e.id_mes, e.texto_extraido
+        ), nuevos AS (
+            INSERT INTO periodo_carga (id_anio, id_mes, texto_extraido, nombre_base)
+            SELECT CAST(:id_anio AS integer), e.id_mes, e.texto_extraido, e.nombre_base
+            FROM entrada e
+            WHERE NOT EXISTS (
+                SELECT 1 FROM existentes x
+                WHERE x.id_mes = e.id_mes AND x.texto_extraido = e.texto_extraido
+            )
+            RETURNING id_mes, texto_extraido, id_periodo
+        )
+        SELECT id_mes, texto_extraido, id_periodo, TRUE AS nuevo FROM nuevos
+        UNION ALL
+        SELECT id_mes, texto_extraido, id_periodo, FALSE FROM existentes
+    """), conn, params={
+        "id_anio": int(id_anio),
+        "meses": [int(m) for m in df_periodos['id_mes']],
+        "textos": [str(t) for t in df_periodos['texto_extraido']],
+        "bases": [None if pd.isna(b) else str(b) for b in bases],
+    })
+
+    logging.info(f"🆕 Nuevos en 'periodo_carga': {int(resultado['nuevo'].sum())} de {len(resultado)}")
+    return resultado
+
+
+# ==============================
+# nombre_base de los períodos cargados
+# ==============================
+MESES_ABREVIADOS = {
+    "ene": "01", "feb": "02", "mar": "03", "abr": "04",
+    "may": "05", "jun": "06", "jul": "07", "ago": "08",
+    "sep": "09", "oct": "10", "nov": "11", "dic": "12"
+}
+
+
+def _nombre_desde_texto():
+    """
+    Expresión SQL equivalente al paso 13 de cargarbasespospago: texto en
+    minúsculas con la primera abreviatura de mes encontrada (en el orden
+    de MESES_ABREVIADOS) reemplazada por su número.
+    """
+    casos = " ".join(
+        f"WHEN position('{abv}' IN x.texto) > 0 THEN replace(x.texto, '{abv}', '{nro}')"
+        for abv, nro in MESES_ABREVIADOS.items()
+    )
+    return f"CASE {casos} ELSE x.texto END"
+
+
+def actualizar_nombre_base(conn, ids_periodo, nombre=None, prefijo='b_pos_'):
+    """
+    Actualiza nombre_base SOLO en los períodos `ids_periodo` (los que tocó
+    la carga) en una sola sentencia. Con `nombre` se guarda ese nombre;
+    si no, se calcula desde texto_extraido como `prefijo` + texto con el
+    mes en número. Retorna [id_periodo, texto_extraido, nombre_base].
+    """
+    ids = sorted({int(i) for i in ids_periodo})
+    if not ids:
+        return pd.DataFrame(columns=['id_periodo', 'texto_extraido', 'nombre_base'])
+
+    if nombre is not None:
+        sql = """
+            UPDATE periodo_carga p
+            SET nombre_base = :nombre
+            WHERE p.id_periodo = ANY(CAST(:ids AS integer[]))
+            RETURNING p.id_periodo, p.texto_extraido, p.nombre_base
+        """
+    else:
+        sql = f"""
+            UPDATE periodo_carga p
+            SET nombre_base = :prefijo || {_nombre_desde_texto()}
+            FROM (
+                SELECT id_periodo, LOWER(TRIM(texto_extraido)) AS texto
+                FROM periodo_carga
+                WHERE id_periodo = ANY(CAST(:ids AS integer[]))
+                  AND texto_extraido IS NOT NULL AND texto_extraido <> ''
+            ) x
+            WHERE p.id_periodo = x.id_periodo
+            RETURNING p.id_periodo, p.texto_extraido, p.nombre_base
+        """
+
+    resultado = pd.read_sql(text(sql), conn, params={"ids": ids, "nombre": nombre, "prefijo": prefijo})
+    logging.info(f"🗄️ nombre_base actualizado en {len(resultado)} período(s) de 'periodo_carga'")
+    return resultado
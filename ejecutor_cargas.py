@@ -0,0 +1,175 @@
+import subprocess # Ejecutar los scripts de carga
+import os # Rutas y variables de entorno
+import sys # Intérprete actual
+import re # Prefijo de logging en la salida
+import time # Duraciones
+import queue # Eventos hacia la interfaz
+import threading # Bloqueo del índice de scripts
+from collections import deque # Últimas líneas de cada trabajo
+from concurrent.futures import ThreadPoolExecutor # Cola con varios trabajadores
+
+
+# Cargas que se ejecutan a la vez (CARGAS_WORKERS=1 las vuelve secuenciales)
+WORKERS = int(os.environ.get('CARGAS_WORKERS', 0)) or 3
+
+# Líneas de salida que se guardan por trabajo
+MAX_LINEAS = 2000
+
+# Cada línea que imprime un script abre una etapa que dura hasta la línea
+# siguiente ("🚀 Ejecutando cargacompletapos.py..." mide la carga). En el
+# resumen solo se muestran las etapas de al menos UMBRAL_ETAPA segundos
+UMBRAL_ETAPA = 1.0
+# Prefijo de logging.basicConfig ("2025-01-01 10:00:00,000 - INFO - ")
+PREFIJO_LOG = re.compile(r"^\d{4}-\d{2}-\d{2} [\d:,]+ - \w+ - ")
+
+EN_COLA, EJECUTANDO, FINALIZADO, ERROR = 'En cola', 'Ejecutando', 'Finalizado', 'Error'
+
+
+# ==============================
+# Índice de scripts
+# ==============================
+class IndiceScripts:
+    """
+    Índice nombre de archivo → ruta de los .py bajo `carpetas` (la primera
+    tiene prioridad, como la búsqueda anterior). Las carpetas se recorren
+    una sola vez; solo se vuelven a recorrer si un script no aparece o ya
+    no existe en la ruta guardada.
+    """
+
+    def __init__(self, carpetas):
+        self.carpetas = carpetas
+        self._rutas = None
+        self._lock = threading.Lock()
+
+    def _recorrer(self):
+        rutas = {}
+        for carpeta in self.carpetas:
+            for raiz, _, archivos in os.walk(carpeta):
+                for archivo in archivos:
+                    if archivo.lower().endswith('.py'):
+                        rutas.setdefault(archivo, os.path.join(raiz, archivo))
+        self._rutas = rutas
+
+    def buscar(self, nombre_script):
+        """Ruta del script, o None si no está en ninguna carpeta."""
+        with self._lock:
+            if self._rutas is None:
+                self._recorrer()
+            ruta = self._rutas.get(nombre_script)
+            if ruta is None or not os.path.exists(ruta):
+                self._recorrer()
+                ruta = self._rutas.get(nombre_script)
+            return ruta
+
+
+# ==============================
+# Trabajos
+# ==============================
+class Trabajo:
+    """Una ejecución de un script de carga y su estado."""
+
+    def __init__(self, id_trabajo, nombre, ruta):
+        self.id = id_trabajo
+        self.nombre = nombre
+        self.ruta = ruta
+        self.estado = EN_COLA
+        self.encolado = time.perf_counter()
+        self.inicio = None
+        self.fin = None
+        self.codigo = None
+        self.etapa = ''
+        self.inicio_etapa = None
+        self.etapas = []  # [(etapa, segundos)]
+        self.lineas = deque(maxlen=MAX_LINEAS)
+        self.proceso = None
+
+    def duracion(self):
+        """Segundos en cola (si no empezó) o en ejecución."""
+        if self.inicio is None:
+            return time.perf_counter() - self.encolado
+        return (self.fin or time.perf_counter()) - self.inicio
+
+    def cerrar_etapa(self, ahora):
+        if self.etapa:
+            self.etapas.append((self.etapa, ahora - self.inicio_etapa))
+        self.etapa = ''
+
+    def resumen_etapas(self):
+        return "\n".join(
+            f"   {segundos:7.1f} s  {etapa}" for etapa, segundos in self.etapas if segundos >= UMBRAL_ETAPA
+        )
+
+
+class EjecutorCargas:
+    """
+    Cola de cargas con `workers` trabajadores. Cada trabajo corre su script
+    en un proceso aparte (sin bloquear la interfaz) y su salida se lee
+    línea por línea. La interfaz lee `eventos` (tuplas (tipo, trabajo,
+    dato) con tipo 'estado', 'linea' o 'etapa') desde su propio hilo.
+    """
+
+    def __init__(self, indice, workers=None):
+        self.indice = indice
+        self.eventos = queue.Queue()
+        self.trabajos = []
+        self._pool = ThreadPoolExecutor(max_workers=workers or WORKERS, thread_name_prefix='carga')
+
+    def encolar(self, nombre, nombre_script):
+        """Agrega un trabajo a la cola. Lanza FileNotFoundError si el script no existe."""
+        ruta = self.indice.buscar(nombre_script)
+        if ruta is None:
+            raise FileNotFoundError(f"No se encontró '{nombre_script}'.")
+        trabajo = Trabajo(len(self.trabajos) + 1, nombre, ruta)
+        self.trabajos.append(trabajo)
+        self.eventos.put(('estado', trabajo, EN_COLA))
+        self._pool.submit(self._ejecutar, trabajo)
+        return trabajo
+
+    def en_curso(self):
+        return [t for t in self.trabajos if t.estado in (EN_COLA, EJECUTANDO)]
+
+    def cerrar(self):
+        """Cancela lo que sigue en cola y termina los procesos en ejecución."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        for trabajo in self.trabajos:
+            if trabajo.proceso is not None and trabajo.proceso.poll() is None:
+                trabajo.proceso.terminate()
+
+    # ------------------------------
+    # Ejecución (en los hilos del pool)
+    # ------------------------------
+    def _ejecutar(self, trabajo):
+        trabajo.estado = EJECUTANDO
+        trabajo.inicio = time.perf_counter()
+        self.eventos.put(('estado', trabajo, EJECUTANDO))
+
+        # Salida sin búfer y en UTF-8 (emojis) para leerla a medida que se escribe
+        entorno = dict(os.environ, PYTHONUNBUFFERED='1', PYTHONIOENCODING='utf-8')
+        try:
+            trabajo.proceso = subprocess.Popen(
+                [sys.executable, trabajo.ruta],
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                text=True, encoding='utf-8', errors='replace', env=entorno,
+            )
+            for linea in trabajo.proceso.stdout:
+                self._linea(trabajo, linea.rstrip())
+            trabajo.codigo = trabajo.proceso.wait()
+        except Exception as e:
+            self._linea(trabajo, f"❌ No se pudo ejecutar {os.path.basename(trabajo.ruta)}: {e}")
+            trabajo.codigo = -1
+
+        trabajo.fin = time.perf_counter()
+        trabajo.cerrar_etapa(trabajo.fin)
+        trabajo.estado = FINALIZADO if trabajo.codigo == 0 else ERROR
+        self.eventos.put(('estado', trabajo, trabajo.estado))
+
+    def _linea(self, trabajo, linea):
+        trabajo.lineas.append(linea)
+        self.eventos.put(('linea', trabajo, linea))
+        texto = PREFIJO_LOG.sub('', linea).strip()
+        if texto:
+            ahora = time.perf_counter()
+            trabajo.cerrar_etapa(ahora)
+            trabajo.etapa = texto
+            trabajo.inicio_etapa = ahora
+            self.eventos.put(('etapa', trabajo, texto))
@@ -0,0 +1,102 @@
+import csv # CSV por lotes
+import io # Búfer de texto de cada lote
+import logging # Para logging
+import time # Duración de la exportación
+import zlib # Compresión gzip incremental
+import xlsxwriter # Requiere: pip install xlsxwriter
+from sqlalchemy import text # Requiere: pip install sqlalchemy
+
+
+# ==============================
+# Exportaciones con memoria constante (app.py)
+# ==============================
+# Las filas se leen con un cursor del servidor (stream_results) en lotes de
+# LOTE filas y se escriben a medida que llegan: ni el resultado completo ni
+# el archivo completo quedan en memoria.
+LOTE = 20000
+# Excel admite 1.048.576 filas por hoja; una es el encabezado
+MAX_FILAS_HOJA = 1_048_576 - 1
+
+
+def lotes(engine, sql, params=None, lote=LOTE):
+    """
+    Ejecuta `sql` con un cursor del servidor y genera (columnas, filas) por
+    cada lote. Si no hay filas se genera un único lote vacío (para el
+    encabezado).
+    """
+    with engine.connect() as conn:
+        resultado = conn.execution_options(stream_results=True, yield_per=lote).execute(text(sql), params or {})
+        columnas = list(resultado.keys())
+        vacio = True
+        for filas in resultado.partitions():
+            vacio = False
+            yield columnas, filas
+        if vacio:
+            yield columnas, []
+
+
+def lotes_dataframe(df, lote=LOTE):
+    """Los mismos (columnas, filas) que lotes(), a partir de un DataFrame (NaN → celda vacía)."""
+    columnas = [str(c) for c in df.columns]
+    if df.empty:
+        yield columnas, []
+        return
+    for inicio in range(0, len(df), lote):
+        parte = df.iloc[inicio:inicio + lote].astype(object)
+        yield columnas, list(parte.where(parte.notna(), None).itertuples(index=False, name=None))
+
+
+def escribir_excel(destino, lotes_filas, hoja='Datos'):
+    """
+    Escribe los lotes en `destino` (ruta o archivo) con xlsxwriter en modo
+    constant_memory. Pasadas MAX_FILAS_HOJA filas se abre otra hoja
+    (Datos, Datos_2, ...). Retorna el total de filas escritas.
+    """
+    inicio = time.perf_counter()
+    libro = xlsxwriter.Workbook(destino, {'constant_memory': True})
+    total, hojas = 0, 0
+    ws, fila_hoja = None, MAX_FILAS_HOJA
+
+    for columnas, filas in lotes_filas:
+        for fila in filas:
+            if fila_hoja >= MAX_FILAS_HOJA:
+                hojas += 1
+                ws = libro.add_worksheet(hoja if hojas == 1 else f"{hoja}_{hojas}")
+                ws.write_row(0, 0, columnas)
+                fila_hoja = 0
+            fila_hoja += 1
+            ws.write_row(fila_hoja, 0, fila)
+            total += 1
+        if ws is None:
+            # Sin filas: hoja solo con el encabezado
+            hojas = 1
+            ws = libro.add_worksheet(hoja)
+            ws.write_row(0, 0, columnas)
+    libro.close()
+
+    logging.info(f"📤 Excel exportado: {total} filas en {hojas} hoja(s) en {time.perf_counter() - inicio:.1f} s")
+    return total
+
+
+def csv_gzip(lotes_filas, nivel=6):
+    """
+    Genera el CSV comprimido con gzip por partes, para enviarlo en una
+    respuesta en streaming. Lleva BOM UTF-8 para que Excel respete las tildes.
+    """
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)  # 31 = formato gzip
+    encabezado = True
+    total = 0
+    for columnas, filas in lotes_filas:
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        if encabezado:
+            buffer.write('\ufeff')
+            escritor.writerow(columnas)
+            encabezado = False
+        escritor.writerows(filas)
+        total += len(filas)
+        parte = compresor.compress(buffer.getvalue().encode('utf-8'))
+        if parte:
+            yield parte
+    yield compresor.flush()
+    logging.info(f"📤 CSV exportado: {total} filas")
@@ -0,0 +1,211 @@
+import pandas as pd # Requiere: pip install pandas openpyxl
+from openpyxl import load_workbook # Requiere: pip install openpyxl
+import logging # Para logging
+import os # Para la cantidad de núcleos y variables de entorno
+import time # Para medir tiempos por archivo
+from concurrent.futures import ProcessPoolExecutor, Future # Lectura en paralelo
+
+
+# Filas por lote entregado al resto del proceso
+TAMANO_LOTE = 50000
+
+# Procesos para la lectura en paralelo (LECTURA_WORKERS=1 la vuelve secuencial)
+WORKERS = int(os.environ.get('LECTURA_WORKERS', 0)) or os.cpu_count() or 1
+
+
+def _columnas(encabezado):
+    """Encabezados en minúsculas y sin espacios, como en el resto de cargadores."""
+    columnas = []
+    for i, col in enumerate(encabezado):
+        nombre = str(col).lower().strip() if col is not None else f"unnamed: {i}"
+        columnas.append(nombre)
+    return columnas
+
+
+def _celda_texto(valor):
+    """Igual que read_excel(dtype=str): los vacíos quedan nulos y 5.0 se lee como '5'."""
+    if valor is None:
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def _crear_lote(filas, columnas, como_texto):
+    if como_texto:
+        filas = [tuple(_celda_texto(v) for v in fila) for fila in filas]
+    return pd.DataFrame(filas, columns=columnas, dtype=object if como_texto else None)
+
+
+# Textos que pd.read_excel convierte en NaN por defecto
+VALORES_NULOS_EXCEL = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+}
+
+
+def tipos_como_excel(df):
+    """
+    Devuelve una copia de `df` con los tipos que tendría si se guardara con
+    to_excel y se volviera a leer con read_excel: los textos vacíos o 'nan'
+    pasan a NaN y las columnas float sin nulos y con valores enteros pasan a
+    int64. Permite entregar el DataFrame en memoria a los módulos de carga
+    sin cambiar lo que antes recibían desde la copia en Excel.
+    """
+    df = df.copy()
+    for col in df.columns:
+        serie = df[col]
+        if serie.dtype == object:
+            df[col] = serie.map(lambda v: float('nan') if isinstance(v, str) and v in VALORES_NULOS_EXCEL else v)
+        elif pd.api.types.is_float_dtype(serie) and serie.notna().all() and (serie % 1 == 0).all():
+            df[col] = serie.astype('int64')
+    return df
+
+
+def leer_excel_por_lotes(ruta_excel, tamano_lote=TAMANO_LOTE, hojas=None, como_texto=False):
+    """
+    Lee un Excel hoja por hoja con openpyxl en modo read_only y entrega
+    tuplas (nombre_hoja, DataFrame) de como máximo `tamano_lote` filas.
+    Nunca se tiene más de un lote en memoria, así que el consumo es el
+    mismo para un archivo de 10 mil o de 5 millones de filas.
+    `hojas` limita las hojas a leer; con `como_texto=True` las celdas se
+    entregan como str (equivalente a read_excel(dtype=str)).
+    """
+    wb = load_workbook(ruta_excel, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            if hojas is not None and ws.title not in hojas:
+                continue
+
+            filas = ws.iter_rows(values_only=True)
+            encabezado = next(filas, None)
+            if encabezado is None:
+                continue
+            columnas = _columnas(encabezado)
+
+            lote = []
+            total = 0
+            for fila in filas:
+                # Las filas totalmente vacías (formato al final de la hoja) se ignoran
+                if all(v is None for v in fila):
+                    continue
+                lote.append(fila[:len(columnas)])
+                if len(lote) >= tamano_lote:
+                    total += len(lote)
+                    yield ws.title, _crear_lote(lote, columnas, como_texto)
+                    lote = []
+            if lote:
+                total += len(lote)
+                yield ws.title, _crear_lote(lote, columnas, como_texto)
+
+            logging.info(f"📄 Hoja '{ws.title}' leída por lotes: {total} filas.")
+    finally:
+        wb.close()
+
+
+# ==============================
+# Lectura en paralelo (un proceso por archivo u hoja)
+# ==============================
+def _leer_tarea(ruta_excel, normalizar, argumentos):
+    """
+    Se ejecuta en un proceso hijo: lee todas las hojas del archivo con
+    dtype=str y les aplica `normalizar`. Retorna ([(hoja, df)], segundos).
+    """
+    inicio = time.perf_counter()
+    hojas = pd.read_excel(ruta_excel, sheet_name=None, dtype=str)
+    resultado = [(nombre, normalizar(df_hoja, **argumentos)) for nombre, df_hoja in hojas.items()]
+    return resultado, time.perf_counter() - inicio
+
+
+def _normalizar_tarea(nombre, df_hoja, normalizar, argumentos):
+    """Se ejecuta en un proceso hijo: normaliza una hoja ya leída."""
+    inicio = time.perf_counter()
+    resultado = [(nombre, normalizar(df_hoja, **argumentos))]
+    return resultado, time.perf_counter() - inicio
+
+
+def _enviar(pool, funcion, *args):
+    """Envía la tarea al pool; sin pool la ejecuta aquí mismo."""
+    if pool is not None:
+        return pool.submit(funcion, *args)
+    try:
+        return funcion(*args)
+    except Exception as e:
+        return e
+
+
+def _salida(tarea):
+    """Resultado de la tarea, o la excepción que lanzó."""
+    if not isinstance(tarea, Future):
+        return tarea
+    try:
+        return tarea.result()
+    except Exception as e:
+        return e
+
+
+def leer_excels_en_paralelo(archivos, normalizar, workers=None, por_hoja=False):
+    """
+    Lee y normaliza varios Excel en un ProcessPoolExecutor.
+    `archivos` es una lista de (ruta, argumentos) donde argumentos es un
+    dict que se pasa a normalizar(df_hoja, **argumentos). `normalizar` debe
+    ser una función a nivel de módulo (se envía a los procesos hijos).
+    Sin por_hoja cada archivo es una tarea. Con por_hoja=True el libro se
+    abre una sola vez en este proceso (sharedStrings incluido) y cada hoja,
+    a medida que se lee, se envía a normalizar en otro proceso.
+
+    Retorna una lista de dicts en el MISMO orden de `archivos`, con:
+    ruta, hojas [(nombre, df)], filas, segundos y error (None si se leyó bien).
+    """
+    workers = workers or WORKERS
+    if not por_hoja:
+        workers = min(workers, len(archivos))
+    workers = max(1, workers)
+    inicio = time.perf_counter()
+
+    resultados = [
+        {'ruta': ruta, 'hojas': [], 'filas': 0, 'segundos': 0.0, 'error': None}
+        for ruta, _ in archivos
+    ]
+
+    # Sin procesos hijos con un solo worker: útil para depurar o con un solo archivo
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    tareas = []  # (índice del archivo, futuro o resultado)
+    try:
+        for i, (ruta, argumentos) in enumerate(archivos):
+            if not por_hoja:
+                tareas.append((i, _enviar(pool, _leer_tarea, ruta, normalizar, argumentos)))
+                continue
+            inicio_archivo = time.perf_counter()
+            try:
+                with pd.ExcelFile(ruta) as libro:
+                    for nombre in libro.sheet_names:
+                        df_hoja = libro.parse(nombre, dtype=str)
+                        tareas.append((i, _enviar(pool, _normalizar_tarea, nombre, df_hoja, normalizar, argumentos)))
+            except Exception as e:
+                resultados[i]['error'] = e
+            resultados[i]['segundos'] += time.perf_counter() - inicio_archivo
+        salidas = [(i, _salida(tarea)) for i, tarea in tareas]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # Reagrupar por archivo respetando el orden de entrada
+    for i, salida in salidas:
+        if isinstance(salida, Exception):
+            resultados[i]['error'] = resultados[i]['error'] or salida
+            continue
+        hojas, segundos = salida
+        resultados[i]['hojas'].extend(hojas)
+        resultados[i]['filas'] += sum(len(df_hoja) for _, df_hoja in hojas)
+        resultados[i]['segundos'] += segundos
+
+    for r in resultados:
+        if r['error'] is None:
+            logging.info(f"⏱️ {os.path.basename(r['ruta'])}: {r['filas']} filas en {r['segundos']:.2f} s")
+
+    logging.info(
+        f"⏱️ Lectura en paralelo: {len(archivos)} archivo(s), {len(tareas)} tarea(s), "
+        f"{workers} proceso(s), {time.perf_counter() - inicio:.2f} s en total."
+    )
+    return resultados
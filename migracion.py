@@ -6,201 +6,225 @@ from sqlalchemy import create_engine  # motor de conexión a BD
 from sqlalchemy.engine import URL # para crear URL de conexión
 from sqlalchemy.exc import OperationalError # manejo de errores de conexión
 import logging # para logging de información y errores 
+from cache_dimensiones import obtener_cache # Archivo local: cache_dimensiones.py
+from cargamasiva import insertar_con_ids # Archivo local: cargamasiva.py
+from bloqueos import seccion_critica # Archivo local: bloqueos.py
+from lectura_excel import leer_excels_en_paralelo # Archivo local: lectura_excel.py
+from registro_cargas import archivos_pendientes, registrar_cargas, forzar_recarga # Archivo local: registro_cargas.py
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-# ========= Conexión a la base de datos (PostgreSQL) =========
-usuario = "analista"
-contraseña = "2025Anal1st@"  
-host = "192.168.10.37"
-puerto = 5432
-base_datos = "BcorpMigracionPrueba"
-
-
-# Requiere: pip install psycopg2-binary
-url = URL.create(
-    drivername="postgresql+psycopg2",
-    username=usuario,
-    password=contraseña,
-    host=host,
-    port=puerto,
-    database=base_datos,
-)
-
-try:
-    engine = create_engine(
-        url,
-        pool_pre_ping=True,
-        pool_size=5,
-        max_overflow=10,
-        pool_timeout=60,
-    )
-    with engine.connect() as conn:
-        logging.info("✅ Conexión a PostgreSQL OK.")
-except OperationalError as e:
-    logging.exception("❌ Error de conexión a PostgreSQL.")
-    raise SystemExit(e)
-
-
-
-
-
-
-# ==============================
-# 2️⃣ Leer todos los Excel de la carpeta
-# ==============================
-carpeta_principal = r'C:\Users\pasante.ti2\Documents\MOVISTAR\MIGRACION'
-rutas_excel = glob.glob(os.path.join(carpeta_principal, '**', '*.xlsx'), recursive=True)
-if not rutas_excel:
-    sys.exit("❌ No se encontraron archivos Excel en la carpeta indicada.")
-
-df_list = []
-
-# ==============================
-# 2️⃣ Leer hojas y mantener datos exactos
-# ==============================
-for ruta_excel in rutas_excel:
-    nombre_archivo = os.path.basename(ruta_excel)
-    if nombre_archivo.startswith('~$'):
-        continue
-    
-    carpeta_relativa = os.path.relpath(os.path.dirname(ruta_excel), carpeta_principal)
-    mes_carpeta = carpeta_relativa.split(os.sep)[0].upper()
-
-    try:
-        hojas = pd.read_excel(ruta_excel, sheet_name=None, dtype=str)
-        for nombre_hoja, df_hoja in hojas.items():
-            df_hoja.columns = [col.lower().strip() for col in df_hoja.columns]
-
-            # Mantener mes
-            df_hoja['mes'] = df_hoja.get('mes', mes_carpeta).fillna(mes_carpeta).astype(str).str.strip().str.upper()
-
-            # Texto extraído
-            df_hoja['texto_extraido'] = df_hoja.get('texto_extraido', '').apply(lambda x: x.strip() if pd.notna(x) else '')
-
-            # Identificación, nombre completo y celular
-            for campo in ['identificacion', 'nombre_completo', 'celular']:
-                df_hoja[campo] = df_hoja.get(campo, '').apply(lambda x: x.strip() if pd.notna(x) else '')
-
-            # Celular: limpiar y asegurar que empiece con 0
-            df_hoja['celular'] = df_hoja['celular'].astype(str).str.replace(r'\.0$', '', regex=True)
-            df_hoja['celular'] = df_hoja['celular'].apply(lambda x: x if x.startswith('0') else '0'+x if x and x.isdigit() else x)
-
-            # Campos adicionales
-            for campo in ['tbs', 'decil_online', 'decil_pago', 'dpa_provincia']:
-                if campo not in df_hoja.columns:
-                    df_hoja[campo] = ''
-
-            df_list.append(df_hoja)
-
-        total_registros = sum(len(df_hoja) for df_hoja in hojas.values())
-        print(f"✅ Leído {nombre_archivo} ({total_registros} filas) con mes {mes_carpeta}")
-    except Exception as e:
-        print(f"⚠️ Error leyendo {nombre_archivo}: {e}")
-
-if not df_list:
-    sys.exit("❌ No se pudo leer ningún Excel correctamente.")
 
 # ==============================
-# 🔧 Normalizar columnas antes de concatenar
+# 🧹 Normalización de cada hoja (corre en los procesos de lectura)
 # ==============================
-columnas_finales = [
-    'año', 'mes', 'texto_extraido',
-    'nombre_completo', 'identificacion', 'celular',
-    'tbs', 'decil_online', 'decil_pago', 'dpa_provincia'
-]
-
-df_limpios = []
-for df_hoja in df_list:
-    df_hoja.columns = [col.lower().strip().split('_m')[0] for col in df_hoja.columns]
-    for c in columnas_finales:
-        if c not in df_hoja.columns:
-            df_hoja[c] = ''
-    df_hoja = df_hoja[columnas_finales]
-    df_limpios.append(df_hoja)
-
-df = pd.concat(df_limpios, ignore_index=True)
-print(f"📊 Total registros combinados (limpios): {len(df)}")
+def normalizar_hoja(df_hoja, mes_carpeta):
+    """Limpia una hoja de MIGRACION dejando los datos exactos del Excel."""
+    df_hoja.columns = [col.lower().strip() for col in df_hoja.columns]
 
-# ==============================
-# 3️⃣ Normalizar columnas adicionales
-# ==============================
-df['año'] = '2025'
-df['mes'] = df['mes'].str.replace(r'^\d{2}\.', '', regex=True).str.upper()
+    # Mantener mes
+    df_hoja['mes'] = df_hoja.get('mes', mes_carpeta).fillna(mes_carpeta).astype(str).str.strip().str.upper()
 
-# ==============================
-# 4️⃣ Obtener IDs de años y meses
-# ==============================
-anio_db = pd.read_sql('SELECT id_anio, valor FROM anio', engine)
-anio_db['valor'] = anio_db['valor'].astype(str).str.strip()
-mes_db = pd.read_sql('SELECT id_mes, nombre_mes FROM mes', engine)
-mes_db['nombre_mes'] = mes_db['nombre_mes'].astype(str).str.strip().str.upper()
+    # Texto extraído
+    df_hoja['texto_extraido'] = df_hoja.get('texto_extraido', '').apply(lambda x: x.strip() if pd.notna(x) else '')
 
-df = df.merge(anio_db, left_on='año', right_on='valor', how='left')
-df = df.merge(mes_db, left_on='mes', right_on='nombre_mes', how='left')
+    # Identificación, nombre completo y celular
+    for campo in ['identificacion', 'nombre_completo', 'celular']:
+        df_hoja[campo] = df_hoja.get(campo, '').apply(lambda x: x.strip() if pd.notna(x) else '')
 
-if df['id_anio'].isnull().any() or df['id_mes'].isnull().any():
-    sys.exit("❌ Hay años o meses que no existen en la DB.")
+    # Celular: limpiar y asegurar que empiece con 0
+    df_hoja['celular'] = df_hoja['celular'].astype(str).str.replace(r'\.0$', '', regex=True)
+    df_hoja['celular'] = df_hoja['celular'].apply(lambda x: x if x.startswith('0') else '0'+x if x and x.isdigit() else x)
 
-# ==============================
-# 5️⃣ Insertar periodos únicos
-# ==============================
-df_periodos = df[['id_anio','id_mes','texto_extraido']].drop_duplicates()
-df_periodos.to_sql('periodo_carga', engine, if_exists='append', index=False, method='multi')
-print(f"✅ Periodos únicos insertados: {len(df_periodos)}")
+    # Campos adicionales
+    for campo in ['tbs', 'decil_online', 'decil_pago', 'dpa_provincia']:
+        if campo not in df_hoja.columns:
+            df_hoja[campo] = ''
 
-# ==============================
-# 6️⃣ Asignar id_periodo
-# ==============================
-df_periodos_db = pd.read_sql('SELECT * FROM periodo_carga', engine)
-periodo_map = df_periodos_db.set_index(['id_anio','id_mes','texto_extraido'])['id_periodo'].to_dict()
-df['id_periodo'] = df.apply(lambda row: periodo_map.get((row['id_anio'], row['id_mes'], row['texto_extraido'])), axis=1)
+    return df_hoja
 
-# ==============================
-# 7️⃣ Insertar provincias automáticamente
-# ==============================
-prov_db = pd.read_sql('SELECT id_provincia, nombre_provincia FROM provincia', engine)
-prov_excel = df['dpa_provincia'].str.strip().str.upper().dropna().unique()
-prov_nuevas = [p for p in prov_excel if p not in prov_db['nombre_provincia'].str.upper().values]
 
-if prov_nuevas:
-    df_prov_nuevas = pd.DataFrame({'nombre_provincia': prov_nuevas})
-    df_prov_nuevas.to_sql('provincia', engine, if_exists='append', index=False, method='multi')
+def main():
+    """Carga completa de los Excel de MIGRACION."""
+    # ========= Conexión a la base de datos (PostgreSQL) =========
+    usuario = "analista"
+    contraseña = "2025Anal1st@"  
+    host = "192.168.10.37"
+    puerto = 5432
+    base_datos = "BcorpMigracionPrueba"
 
-# Actualizar mapeo final
-prov_db = pd.read_sql('SELECT id_provincia, nombre_provincia FROM provincia', engine)
-prov_map = dict(zip(prov_db['nombre_provincia'].str.upper(), prov_db['id_provincia']))
 
-# ==============================
-# 8️⃣ Insertar clientes con id_provincia tal cual
-# ==============================
-df['id_provincia'] = df['dpa_provincia'].str.strip().str.upper().map(prov_map)
-df_cliente = df[['identificacion','nombre_completo','celular','id_provincia']].copy()
-df_cliente.to_sql('cliente', engine, if_exists='append', index=False, method='multi')
-print(f"✅ Clientes insertados: {len(df_cliente)}")
-
-# ==============================
-# 9️⃣ Asignar id_cliente
-# ==============================
-df_clientes_db = pd.read_sql('SELECT id_cliente, identificacion, nombre_completo, celular FROM cliente', engine)
-excel_keys = list(zip(df['identificacion'], df['nombre_completo'], df['celular']))
-db_keys = list(zip(df_clientes_db['identificacion'], df_clientes_db['nombre_completo'], df_clientes_db['celular']))
-id_cliente_map = dict(zip(db_keys, df_clientes_db['id_cliente']))
-df['id_cliente'] = [id_cliente_map.get(k) for k in excel_keys]
-
-# ==============================
-# 🔟 Insertar cliente_plan_info (sin tocar provincias)
-# ==============================
-df_plan_info = df[['id_cliente','id_periodo','tbs','decil_online','decil_pago']].copy()
-df_plan_info.to_sql('cliente_plan_info', engine, if_exists='append', index=False, method='multi')
-print(f"✅ Cliente_plan_info insertados: {len(df_plan_info)}")
-
-# ==============================
-# 1️⃣1️⃣ Resumen final
-# ==============================
-resumen_mes = df.groupby('mes').size().reset_index(name='registros')
-print("\n📊 Registros por mes:")
-print(resumen_mes)
+    # Requiere: pip install psycopg2-binary
+    url = URL.create(
+        drivername="postgresql+psycopg2",
+        username=usuario,
+        password=contraseña,
+        host=host,
+        port=puerto,
+        database=base_datos,
+    )
 
-print("\n🎉 ¡Carga completa en PostgreSQL con todos los registros exactos y relaciones de provincia correctas!")
+    try:
+        engine = create_engine(
+            url,
+            pool_pre_ping=True,
+            pool_size=5,
+            max_overflow=10,
+            pool_timeout=60,
+        )
+        with engine.connect() as conn:
+            logging.info("✅ Conexión a PostgreSQL OK.")
+    except OperationalError as e:
+        logging.exception("❌ Error de conexión a PostgreSQL.")
+        raise SystemExit(e)
+
+    cache = obtener_cache(engine)
+
+
+
+
+
+
+    # ==============================
+    # 2️⃣ Leer todos los Excel de la carpeta
+    # ==============================
+    carpeta_principal = r'C:\Users\pasante.ti2\Documents\MOVISTAR\MIGRACION'
+    rutas_excel = glob.glob(os.path.join(carpeta_principal, '**', '*.xlsx'), recursive=True)
+    if not rutas_excel:
+        sys.exit("❌ No se encontraron archivos Excel en la carpeta indicada.")
+
+    # Omitir los archivos que ya están en load_ledger (salvo con --force)
+    rutas_excel = [r for r in rutas_excel if not os.path.basename(r).startswith('~$')]
+    pendientes = archivos_pendientes(engine, rutas_excel, forzar=forzar_recarga())
+    if not pendientes:
+        print("ℹ️ Todos los archivos ya fueron cargados. Use --force para recargarlos.")
+        return
+
+    df_list = []
+
+    # ==============================
+    # 2️⃣ Leer hojas en paralelo y mantener datos exactos
+    # ==============================
+    archivos = []
+    for archivo in pendientes:
+        ruta_excel = archivo['ruta']
+        carpeta_relativa = os.path.relpath(os.path.dirname(ruta_excel), carpeta_principal)
+        mes_carpeta = carpeta_relativa.split(os.sep)[0].upper()
+        archivos.append((ruta_excel, {'mes_carpeta': mes_carpeta}))
+
+    cargados = []
+    resultados = leer_excels_en_paralelo(archivos, normalizar_hoja)
+    for archivo, (_, argumentos), r in zip(pendientes, archivos, resultados):
+        nombre_archivo = os.path.basename(r['ruta'])
+        if r['error'] is not None:
+            print(f"⚠️ Error leyendo {nombre_archivo}: {r['error']}")
+            continue
+        df_list.extend(df_hoja for _, df_hoja in r['hojas'])
+        archivo['filas'] = r['filas']
+        cargados.append(archivo)
+        print(f"✅ Leído {nombre_archivo} ({r['filas']} filas) con mes {argumentos['mes_carpeta']} en {r['segundos']:.2f} s")
+
+    if not df_list:
+        sys.exit("❌ No se pudo leer ningún Excel correctamente.")
+
+    # ==============================
+    # 🔧 Normalizar columnas antes de concatenar
+    # ==============================
+    columnas_finales = [
+        'año', 'mes', 'texto_extraido',
+        'nombre_completo', 'identificacion', 'celular',
+        'tbs', 'decil_online', 'decil_pago', 'dpa_provincia'
+    ]
+
+    df_limpios = []
+    for df_hoja in df_list:
+        df_hoja.columns = [col.lower().strip().split('_m')[0] for col in df_hoja.columns]
+        for c in columnas_finales:
+            if c not in df_hoja.columns:
+                df_hoja[c] = ''
+        df_hoja = df_hoja[columnas_finales]
+        df_limpios.append(df_hoja)
+
+    df = pd.concat(df_limpios, ignore_index=True)
+    print(f"📊 Total registros combinados (limpios): {len(df)}")
+
+    # ==============================
+    # 3️⃣ Normalizar columnas adicionales
+    # ==============================
+    df['año'] = '2025'
+    df['mes'] = df['mes'].str.replace(r'^\d{2}\.', '', regex=True).str.upper()
+
+    # ==============================
+    # 4️⃣ Obtener IDs de años y meses
+    # ==============================
+    anio_db = cache.tabla(engine, 'anio')
+    mes_db = cache.tabla(engine, 'mes')
+
+    df = df.merge(anio_db, left_on='año', right_on='valor', how='left')
+    df = df.merge(mes_db, left_on='mes', right_on='nombre_mes', how='left')
+
+    if df['id_anio'].isnull().any() or df['id_mes'].isnull().any():
+        sys.exit("❌ Hay años o meses que no existen en la DB.")
+
+    # ==============================
+    # 5️⃣ Insertar periodos únicos
+    # ==============================
+    df_periodos = df[['id_anio','id_mes','texto_extraido']].drop_duplicates()
+    # Solo los períodos que aún no existen (antes se duplicaban en cada ejecución)
+    # Con el bloqueo de periodo_carga: otra carga simultánea no inserta el mismo período
+    with seccion_critica(engine, 'periodo_carga') as conn:
+        df_periodos_db = pd.read_sql('SELECT id_anio, id_mes, texto_extraido FROM periodo_carga', conn)
+        df_periodos = df_periodos.merge(df_periodos_db, on=['id_anio','id_mes','texto_extraido'], how='left', indicator=True)
+        df_periodos = df_periodos[df_periodos['_merge'] == 'left_only'].drop(columns='_merge')
+        df_periodos.to_sql('periodo_carga', conn, if_exists='append', index=False, method='multi')
+        df_periodos_db = pd.read_sql('SELECT * FROM periodo_carga', conn)
+    print(f"✅ Periodos nuevos insertados: {len(df_periodos)}")
+
+    # ==============================
+    # 6️⃣ Asignar id_periodo
+    # ==============================
+    periodo_map = df_periodos_db.set_index(['id_anio','id_mes','texto_extraido'])['id_periodo'].to_dict()
+    df['id_periodo'] = df.apply(lambda row: periodo_map.get((row['id_anio'], row['id_mes'], row['texto_extraido'])), axis=1)
+
+    # ==============================
+    # 7️⃣ Insertar provincias automáticamente
+    # ==============================
+    # Desde el caché; solo las provincias que falten se insertan en el servidor
+    with engine.begin() as conn:
+        prov_db = cache.resolver(conn, 'provincia', df['dpa_provincia'])
+    prov_map = dict(zip(prov_db['nombre_provincia'], prov_db['id_provincia']))
+
+    # ==============================
+    # 8️⃣ Insertar clientes con id_provincia tal cual
+    # ==============================
+    df['id_provincia'] = df['dpa_provincia'].str.strip().str.upper().map(prov_map)
+    df_cliente = df[['identificacion','nombre_completo','celular','id_provincia']].copy()
+    # id_cliente reservado de la secuencia: no se busca por contenido en cliente
+    # Clientes, cliente_plan_info y load_ledger en UNA transacción: si algo
+    # falla no queda nada a medias y el archivo se vuelve a cargar completo
+    with engine.begin() as conn:
+        df['id_cliente'] = insertar_con_ids(df_cliente, 'cliente', 'id_cliente', conn)
+        print(f"✅ Clientes insertados: {len(df_cliente)}")
+
+        # 🔟 cliente_plan_info (sin tocar provincias)
+        df_plan_info = df[['id_cliente','id_periodo','tbs','decil_online','decil_pago']].copy()
+        df_plan_info.to_sql('cliente_plan_info', conn, if_exists='append', index=False, method='multi')
+        print(f"✅ Cliente_plan_info insertados: {len(df_plan_info)}")
+
+        # 📒 Registrar los archivos en load_ledger para no volver a cargarlos
+        registrar_cargas(conn, cargados, df['id_periodo'])
+
+    # ==============================
+    # 1️⃣1️⃣ Resumen final
+    # ==============================
+    resumen_mes = df.groupby('mes').size().reset_index(name='registros')
+    print("\n📊 Registros por mes:")
+    print(resumen_mes)
+
+    print("\n🎉 ¡Carga completa en PostgreSQL con todos los registros exactos y relaciones de provincia correctas!")
+
+
+# Necesario para ProcessPoolExecutor: los procesos hijos importan este archivo
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+-- Índices de las búsquedas de app.py (/buscar, /buscar_ciclo) y de las cargas.
+-- Se crean con CONCURRENTLY para no bloquear las cargas ni las consultas:
+-- aplicar_migraciones.py ejecuta cada sentencia fuera de una transacción.
+
+-- /buscar: c.identificacion IN (...) OR c.celular IN (...)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_cliente_identificacion ON cliente (identificacion);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_cliente_celular ON cliente (celular);
+
+-- Unión cliente → cliente_plan_info y último período por cliente (ORIGEN.PY)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_cliente_plan_info_cliente ON cliente_plan_info (id_cliente, id_periodo);
+
+-- /buscar_ciclo y /descargar_excel: períodos de los años elegidos y un ciclo.
+-- INCLUDE (id_cliente) permite resolverlo solo con el índice.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_cliente_plan_info_periodo_ciclo
+    ON cliente_plan_info (id_periodo, id_ciclo) INCLUDE (id_cliente);
+
+-- asegurar_periodos (dimensiones.py): período por año, mes y texto
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_periodo_carga_anio_mes_texto
+    ON periodo_carga (id_anio, id_mes, texto_extraido);
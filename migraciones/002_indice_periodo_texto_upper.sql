@@ -0,0 +1,8 @@
+-- asegurar_periodos (dimensiones.py) busca el período con
+-- UPPER(p.texto_extraido) = UPPER(:texto): el índice de 001 sobre
+-- texto_extraido solo servía por (id_anio, id_mes). Este índice funcional
+-- compara el texto en mayúsculas desde el índice y reemplaza al de 001, que
+-- ninguna otra consulta usa.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_periodo_carga_anio_mes_texto_upper
+    ON periodo_carga (id_anio, id_mes, (UPPER(texto_extraido)));
+DROP INDEX CONCURRENTLY IF EXISTS ix_periodo_carga_anio_mes_texto;
@@ -0,0 +1,121 @@
+import argparse # Argumentos de línea de comandos
+import logging # Para logging
+import os # Rutas y carpetas
+import sys # Código de salida
+import time # Duración por archivo
+from concurrent.futures import ProcessPoolExecutor # Varios archivos en paralelo
+
+
+# ==============================
+# Modo por lotes de pospago.py / prepago.py / pyme.py
+# ==============================
+# Uso: python pospago.py [archivo.xlsx | carpeta ...] [--sin-copia] [--workers N]
+# Sin rutas se abre el explorador de archivos como antes. Tkinter y la
+# conexión a PostgreSQL se cargan solo cuando hacen falta.
+
+EXTENSIONES = ('.xlsx', '.csv')
+# Archivos que generan las propias cargas (y temporales de Excel): no se cargan
+PREFIJOS_EXCLUIDOS = ('copia-', 'INCORRECTA_', '~$')
+
+
+def archivos_de(rutas):
+    """Archivos .xlsx / .csv de `rutas`; las carpetas se expanden (sin subcarpetas)."""
+    archivos = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            archivos.extend(
+                os.path.join(ruta, nombre) for nombre in sorted(os.listdir(ruta))
+                if nombre.lower().endswith(EXTENSIONES) and not nombre.startswith(PREFIJOS_EXCLUIDOS)
+            )
+        elif os.path.isfile(ruta):
+            archivos.append(ruta)
+        else:
+            logging.warning(f"⚠️ No existe: {ruta}")
+    return archivos
+
+
+def seleccionar_archivo():
+    """Explorador de archivos (Tkinter se importa solo en modo interactivo)."""
+    import tkinter as tk # Interfaz gráfica
+    from tkinter import filedialog # Explorador de archivos
+
+    root = tk.Tk()
+    root.withdraw()  # Oculta la ventana principal de Tkinter
+    ruta = filedialog.askopenfilename(
+        title="Selecciona el archivo Excel o CSV a procesar",
+        filetypes=[("Archivos Excel o CSV", "*.xlsx *.csv")]
+    )
+    root.destroy()
+    return ruta
+
+
+def parsear_argumentos(argv):
+    parser = argparse.ArgumentParser(description="Carga de bases (sin rutas abre el explorador de archivos).")
+    parser.add_argument('rutas', nargs='*', help="Archivos .xlsx/.csv o carpetas que los contienen")
+    parser.add_argument('--sin-copia', action='store_true', help="No guardar la copia en Excel")
+    parser.add_argument('--workers', type=int, default=1, help="Archivos que se cargan a la vez (procesos)")
+    return parser.parse_args(argv)
+
+
+def _en_proceso(run, crear_engine, ruta, opciones):
+    """Se ejecuta en un proceso hijo: conexión propia y carga de un archivo."""
+    engine = crear_engine()
+    try:
+        return run(ruta, engine, opciones)
+    except SystemExit as e:
+        # SystemExit no debe terminar el proceso del pool
+        raise RuntimeError(str(e)) from None
+    finally:
+        engine.dispose()
+
+
+def main(run, crear_engine, argv=None):
+    """
+    Ejecuta `run(ruta, engine, opciones)` por cada archivo. Con --workers N
+    los archivos se reparten en N procesos, cada uno con su conexión.
+    Termina con código 1 si algún archivo falló.
+    """
+    args = parsear_argumentos(sys.argv[1:] if argv is None else argv)
+    opciones = {'sin_copia': args.sin_copia}
+
+    if args.rutas:
+        archivos = archivos_de(args.rutas)
+        if not archivos:
+            raise SystemExit("No hay archivos .xlsx o .csv para procesar.")
+    else:
+        ruta = seleccionar_archivo()
+        if not ruta:
+            logging.error("❌ No se seleccionó ningún archivo. Proceso cancelado.")
+            raise SystemExit("No se seleccionó ningún archivo.")
+        archivos = [ruta]
+
+    workers = max(1, min(args.workers, len(archivos)))
+    fallidos = []
+    inicio = time.perf_counter()
+
+    if workers == 1:
+        engine = crear_engine()
+        for ruta in archivos:
+            inicio_archivo = time.perf_counter()
+            try:
+                run(ruta, engine, opciones)
+                logging.info(f"⏱️ {os.path.basename(ruta)}: {time.perf_counter() - inicio_archivo:.1f} s")
+            except (Exception, SystemExit) as e:
+                logging.error(f"❌ {os.path.basename(ruta)}: {e}")
+                fallidos.append(ruta)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = {pool.submit(_en_proceso, run, crear_engine, ruta, opciones): ruta for ruta in archivos}
+            for futuro, ruta in futuros.items():
+                try:
+                    futuro.result()
+                except Exception as e:
+                    logging.error(f"❌ {os.path.basename(ruta)}: {e}")
+                    fallidos.append(ruta)
+
+    logging.info(
+        f"🏁 {len(archivos) - len(fallidos)} de {len(archivos)} archivo(s) cargados en "
+        f"{time.perf_counter() - inicio:.1f} s ({workers} proceso(s))."
+    )
+    if fallidos:
+        raise SystemExit(1)
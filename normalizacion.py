@@ -0,0 +1,337 @@
+import pandas as pd # Requiere: pip install pandas numpy
+import numpy as np # Matriz de caracteres de los textos
+import unicodedata # Para quitar tildes
+import re # Para expresiones regulares
+
+
+# ==============================
+# Normalizadores vectorizados compartidos por los cargadores
+# ==============================
+# Cada función recibe una Serie y devuelve una Serie con EXACTAMENTE el
+# mismo resultado que la función por fila que reemplaza (ver
+# tests/test_normalizacion.py). Los textos se pasan a una matriz de
+# bytes y los casos comunes se resuelven con operaciones de numpy sobre
+# toda la matriz; los raros (1e3, 12.50, ' 99', ²...) se pasan por la
+# función por fila, solo esas filas.
+
+# Filas por bloque: la matriz de caracteres ocupa hasta ANCHO bytes por fila
+BLOQUE = 100_000
+
+# Los textos de más de ANCHO caracteres o con caracteres fuera de ASCII
+# (², ٣, espacios no ASCII...) se resuelven con la función por fila
+ANCHO = 20
+
+CERO, NUEVE, PUNTO, ESPACIO = ord('0'), ord('9'), ord('.'), ord(' ')
+
+
+def _textos(serie):
+    """str(valor) de cada elemento, igual que hacen las funciones por fila."""
+    serie = serie.astype(object)
+    if pd.api.types.infer_dtype(serie, skipna=False) == 'string':
+        return serie
+    return serie.map(str)
+
+
+def _por_bloques(funcion, serie):
+    """Aplica funcion a los valores de la Serie de textos por bloques de BLOQUE filas."""
+    valores = serie.to_numpy(dtype=object)
+    partes = [funcion(valores[i:i + BLOQUE]) for i in range(0, len(valores), BLOQUE)]
+    return np.concatenate(partes) if partes else np.empty(0, dtype=object)
+
+
+def _caracteres(valores):
+    """
+    Códigos de los caracteres de los textos en una matriz uint8 de
+    (ancho, filas): codigos[j, i] es el carácter j del texto i, o 0 si el
+    texto es más corto. Así cada operación por texto recorre filas contiguas.
+    Retorna (rapidas, codigos, largo): `rapidas` marca los textos que entran
+    en la matriz (cortos y ASCII); codigos y largo son solo de esos.
+    """
+    largo = np.fromiter(map(len, valores), dtype=np.intp, count=len(valores))
+    rapidas = largo <= ANCHO
+    cortos = valores if rapidas.all() else valores[rapidas]
+    # Con el ancho explícito numpy no recorre los textos para calcularlo
+    ancho = max(1, int(largo[rapidas].max(initial=0)))
+    try:
+        # Lo común: todo ASCII, se convierte directo a bytes
+        codigos = np.asarray(cortos, dtype=f'S{ancho}').view(np.uint8).reshape(-1, ancho)
+    except UnicodeEncodeError:
+        codigos = np.asarray(cortos, dtype=f'U{ancho}').view(np.uint32).reshape(-1, ancho)
+        ascii_ = codigos.max(axis=1, initial=0) < 128
+        rapidas[rapidas] = ascii_
+        codigos = codigos[ascii_].astype(np.uint8)
+    return rapidas, np.ascontiguousarray(codigos.T), largo[rapidas]
+
+
+def _a_textos(codigos):
+    """
+    Inverso de _caracteres para textos del mismo largo y sin saltos de
+    línea: cada columna de códigos vuelve a ser un str. Se decodifica todo
+    junto y se separa con split, sin pasar por un arreglo de numpy.
+    """
+    matriz = np.empty((codigos.shape[1], len(codigos) + 1), dtype=np.uint8)
+    matriz[:, :-1] = codigos.T
+    matriz[:, -1] = ord('\n')
+    return matriz.tobytes().decode('ascii').split('\n')[:-1]
+
+
+def _recortes(resultado, filas, largo, codigos, elegidos, inicio, fin, prefijo, prefijos):
+    """
+    Para cada texto i de `elegidos` escribe en resultado[filas[i]] el texto
+    prefijos[prefijo[i]] + codigos[inicio[i]:fin[i], i]. `resultado` ya trae
+    los textos originales: los que quedan iguales (texto completo y
+    prefijos[0], que es '') no se vuelven a armar. Los textos con el mismo
+    recorte se arman juntos con un solo corte de la matriz; en los datos
+    reales hay muy pocos recortes distintos.
+    """
+    elegidos = elegidos & ((inicio > 0) | (fin != largo) | (prefijo > 0))
+    elegidos = np.flatnonzero(elegidos)
+    inicio, fin, prefijo = inicio[elegidos], fin[elegidos], prefijo[elegidos]
+    clave = (inicio * (codigos.shape[0] + 1) + fin) * len(prefijos) + prefijo
+    claves = np.flatnonzero(np.bincount(clave)) if len(clave) else clave
+    if len(claves) <= 16:
+        grupos = (np.flatnonzero(clave == c) for c in claves)
+    else:
+        # Muchos recortes distintos (datos muy variados): agrupar ordenando
+        orden = np.argsort(clave, kind='stable')
+        grupos = np.split(orden, np.flatnonzero(np.diff(clave[orden])) + 1)
+    for grupo in grupos:
+        i, j, p = inicio[grupo[0]], fin[grupo[0]], prefijo[grupo[0]]
+        columnas = elegidos[grupo]
+        partes = codigos[i:j, columnas]
+        if prefijos[p]:
+            delante = np.array([ord(c) for c in prefijos[p]], dtype=np.uint8)
+            partes = np.vstack([np.repeat(delante[:, None], len(columnas), axis=1), partes])
+        resultado[filas[columnas]] = _a_textos(partes) if len(partes) else ''
+
+
+def _es_digito(codigos):
+    return (codigos >= CERO) & (codigos <= NUEVE)
+
+
+def _al_inicio(conservar):
+    """True en los textos cuyos caracteres marcados están todos al inicio."""
+    return ~(conservar[1:] & ~conservar[:-1]).any(axis=0)
+
+
+# ==============================
+# Solo dígitos (validación y duplicados de celular)
+# ==============================
+def _solo_digitos_fila(valor):
+    return ''.join(filter(str.isdigit, valor))
+
+
+def _solo_digitos(valores):
+    resultado = valores.copy()
+    rapidas, codigos, largo = _caracteres(valores)
+    digitos = _es_digito(codigos)
+    cuantos = digitos.sum(axis=0)
+    # Los que tienen los dígitos al inicio ('0991234567', '991234567 ', '0991.')
+    # se recortan; los que ya son solo dígitos quedan igual (mismo objeto str)
+    directas = _al_inicio(digitos)
+    filas = np.flatnonzero(rapidas)
+    ceros = np.zeros_like(cuantos)
+    _recortes(resultado, filas, largo, codigos, directas, ceros, cuantos, ceros, [''])
+    # Lo demás con la función por fila
+    lentas = ~rapidas
+    lentas[filas[~directas]] = True
+    resultado[lentas] = [_solo_digitos_fila(v) for v in valores[lentas]]
+    return resultado
+
+
+def solo_digitos(serie):
+    """Equivale a ''.join(filter(str.isdigit, x)) sobre una Serie de textos."""
+    return pd.Series(_por_bloques(_solo_digitos, _textos(serie)), index=serie.index, dtype=object)
+
+
+def _celular_invalido(valores):
+    invalido = np.empty(len(valores), dtype=bool)
+    rapidas, codigos, _ = _caracteres(valores)
+    invalido[rapidas] = _es_digito(codigos).sum(axis=0) < 8
+    invalido[~rapidas] = [len(_solo_digitos_fila(v)) < 8 for v in valores[~rapidas]]
+    return invalido
+
+
+def mask_celular_invalido(serie):
+    """True donde el celular tiene menos de 8 dígitos."""
+    # Solo se cuentan los dígitos, sin armar el texto
+    return pd.Series(_por_bloques(_celular_invalido, _textos(serie)).astype(bool), index=serie.index)
+
+
+def celular_norm(serie):
+    """Solo los dígitos del celular (clave para detectar duplicados)."""
+    return solo_digitos(serie)
+
+
+# ==============================
+# Celular en pospago / prepago / pyme
+# ==============================
+def _celular_fila(valor):
+    valor = _solo_digitos_fila(valor.strip().replace(".0", ""))
+    if len(valor) == 9:
+        return "0" + valor
+    elif len(valor) == 8:
+        return "09" + valor
+    return valor
+
+
+def _celular(valores):
+    resultado = valores.copy()
+    rapidas, codigos, largo = _caracteres(valores)
+    # replace('.0', ''): el '0' que sigue a un '.' se descarta (el '.' no es
+    # dígito). '.0' no se solapa consigo mismo, así que basta mirar el anterior.
+    digitos = _es_digito(codigos)
+    digitos[1:] &= ~((codigos[:-1] == PUNTO) & (codigos[1:] == CERO))
+    cuantos = digitos.sum(axis=0)
+    directas = _al_inicio(digitos)
+    prefijo = np.where(cuantos == 9, 1, np.where(cuantos == 8, 2, 0))
+    filas = np.flatnonzero(rapidas)
+    _recortes(resultado, filas, largo, codigos, directas, np.zeros_like(cuantos), cuantos, prefijo, ['', '0', '09'])
+    # Dígitos separados (' 099 123', '99-123') con la función por fila
+    lentas = ~rapidas
+    lentas[filas[~directas]] = True
+    resultado[lentas] = [_celular_fila(v) for v in valores[lentas]]
+    return resultado
+
+
+def normalizar_celular(serie):
+    """
+    Versión vectorizada de normalizar_celular de pospago/prepago/pyme:
+    quita '.0', deja solo dígitos y completa con '0' (9 dígitos) o '09'
+    (8 dígitos). Los nulos quedan como "".
+    """
+    resultado = pd.Series(_por_bloques(_celular, _textos(serie)), index=serie.index, dtype=object)
+    resultado[serie.isna()] = ""
+    return resultado
+
+
+# ==============================
+# Celular e identificación en las cargas de prepago
+# ==============================
+def _entero(codigos, largo):
+    """
+    Analiza los textos 'ddd' o 'ddd.0' (solo dígitos ASCII, como los que
+    deja Excel). Retorna (punto_cero, valido, inicio, cifras): los dígitos
+    son codigos[inicio:cifras] sin los ceros a la izquierda (todo ceros
+    deja un '0'). `valido` excluye lo que int(float(x)) no reproduciría así
+    (más de 15 cifras significativas, signos, exponentes...).
+    """
+    textos = np.arange(codigos.shape[1])
+    punto_cero = ((largo >= 2) & (codigos[np.maximum(largo - 2, 0), textos] == PUNTO)
+                  & (codigos[np.maximum(largo - 1, 0), textos] == CERO))
+    cifras = largo - 2 * punto_cero
+    dentro = np.arange(len(codigos))[:, None] < cifras
+    # Ceros a la izquierda: se cuentan columna por columna hasta el primer no cero
+    ceros = np.zeros(codigos.shape[1], dtype=np.intp)
+    siguen = np.ones(codigos.shape[1], dtype=bool)
+    for es_cero in dentro & (codigos == CERO):
+        siguen &= es_cero
+        ceros += siguen
+    inicio = np.minimum(ceros, cifras - 1)
+    # Hasta 15 cifras significativas el float es exacto
+    valido = (cifras >= 1) & ~(dentro & ~_es_digito(codigos)).any(axis=0) & (cifras - inicio <= 15)
+    return punto_cero, valido, inicio, cifras
+
+
+def _celular_prepago_fila(valor):
+    valor = str(valor).strip()
+    if valor == '':
+        return ''
+    try:
+        return str(int(float(valor))).zfill(10)
+    except ValueError:
+        return valor
+
+
+def _celular_prepago(valores):
+    resultado = valores.copy()
+    rapidas, codigos, largo = _caracteres(valores)
+    _, valido, inicio, cifras = _entero(codigos, largo)
+    # zfill(10): con 10 o más cifras se dejan las últimas max(10, significativas);
+    # con menos se completan con ceros adelante
+    inicio = np.where(cifras - inicio >= 10, inicio, np.maximum(cifras - 10, 0))
+    relleno = np.maximum(10 - cifras, 0)
+    filas = np.flatnonzero(rapidas)
+    _recortes(resultado, filas, largo, codigos, valido, inicio, cifras, relleno, ['0' * k for k in range(11)])
+    # Lo demás (1e3, 12.50, ' 99', textos...) con la función por fila; '' queda ''
+    lentas = ~rapidas
+    lentas[filas[~valido]] = True
+    resultado[lentas] = [_celular_prepago_fila(v) for v in valores[lentas]]
+    return resultado
+
+
+def normalizar_celular_prepago(serie):
+    """
+    Versión vectorizada de normalizar_celular de cargacompletapre.py y
+    cargarbasesprepago.py: str(int(float(valor))).zfill(10), o el valor
+    tal cual si no es numérico.
+    """
+    return pd.Series(_por_bloques(_celular_prepago, _textos(serie)), index=serie.index, dtype=object)
+
+
+def _identificacion_fila(valor):
+    valor = str(valor).strip()
+    if valor.endswith('.0'):
+        try:
+            return str(int(float(valor)))
+        except ValueError:
+            return valor
+    return valor
+
+
+def _identificacion(valores):
+    resultado = valores.copy()
+    rapidas, codigos, largo = _caracteres(valores)
+    punto_cero, valido, inicio, cifras = _entero(codigos, largo)
+    convertir = punto_cero & valido
+    filas = np.flatnonzero(rapidas)
+    _recortes(resultado, filas, largo, codigos, convertir, inicio, cifras, np.zeros_like(cifras), [''])
+    # Por fila: los que strip() cambiaría y los '.0' que no son 'ddd.0' (-5.0, 1e3.0...)
+    ultimo = codigos[np.maximum(largo - 1, 0), np.arange(codigos.shape[1])]
+    por_fila = (punto_cero & ~valido) | ((largo > 0) & ((codigos[0] <= ESPACIO) | (ultimo <= ESPACIO)))
+    lentas = ~rapidas
+    lentas[filas[por_fila]] = True
+    resultado[lentas] = [_identificacion_fila(v) for v in valores[lentas]]
+    return resultado
+
+
+def limpiar_identificacion(serie):
+    """
+    Versión vectorizada de limpiar_identificacion: '1712345678.0' → '1712345678'
+    (como int(float(...)), también se pierden los ceros a la izquierda).
+    """
+    return pd.Series(_por_bloques(_identificacion, _textos(serie)), index=serie.index, dtype=object)
+
+
+# ==============================
+# Texto sin tildes (desc_forma_pago)
+# ==============================
+def _sin_tildes_fila(texto):
+    if pd.isna(texto):
+        return ""
+    try:
+        texto = (
+            texto.encode('latin1', errors='ignore')
+            .decode('utf-8', errors='ignore')
+        )
+    except Exception:
+        pass
+
+    texto = unicodedata.normalize('NFKD', texto)
+    texto = texto.encode('ascii', 'ignore').decode('utf-8')
+    texto = texto.replace('/', ' ')
+    texto = re.sub(r'[^A-Za-z0-9Ññ\s.,-]', '', texto)
+    texto = re.sub(r'\s+', ' ', texto).strip()
+    texto = texto.upper()
+    return texto
+
+
+def limpiar_sin_tildes(serie):
+    """
+    Quita tildes y caracteres especiales y pasa a mayúsculas. Estas columnas
+    tienen pocos valores distintos, así que se limpia cada valor único una
+    sola vez y el resultado se mapea al resto de filas.
+    """
+    # set y no .unique(): pandas trata '123' y '123\x00' como el mismo valor
+    limpios = {valor: _sin_tildes_fila(valor) for valor in set(serie.dropna())}
+    return serie.map(limpios).fillna("")
@@ -0,0 +1,135 @@
+import pandas as pd # Requiere: pip install pandas sqlalchemy psycopg2-binary
+import hashlib # Hash del contenido de cada archivo
+import logging # Para logging
+import os # Tamaño y fecha de modificación de los archivos
+import sys # Para leer --force de la línea de comandos
+from sqlalchemy import text # Requiere: pip install sqlalchemy
+
+
+# ==============================
+# Tabla load_ledger: un registro por archivo cargado en cada base
+# ==============================
+DDL_LEDGER = """
+    CREATE TABLE IF NOT EXISTS load_ledger (
+        id_carga SERIAL PRIMARY KEY,
+        hash_archivo CHAR(64) NOT NULL,
+        ruta_archivo TEXT NOT NULL,
+        tamano_bytes BIGINT NOT NULL,
+        fecha_modificacion DOUBLE PRECISION,
+        filas INTEGER,
+        base_destino VARCHAR(100) NOT NULL,
+        ids_periodo INTEGER[],
+        fecha_carga TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (hash_archivo, base_destino)
+    )
+"""
+
+
+def forzar_recarga(argv=None):
+    """True si se ejecutó con --force (recargar aunque el archivo ya esté en load_ledger)."""
+    return '--force' in (sys.argv[1:] if argv is None else argv)
+
+
+def hash_archivo(ruta, tamano_bloque=1024 * 1024):
+    """SHA-256 del contenido del archivo, leído por bloques."""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(tamano_bloque), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def asegurar_tabla(conn):
+    conn.execute(text(DDL_LEDGER))
+
+
+# ==============================
+# Consulta antes de leer
+# ==============================
+def archivos_pendientes(engine, rutas, forzar=False):
+    """
+    Devuelve la lista de archivos de `rutas` que aún no se cargaron en la
+    base de `engine`, como dicts {ruta, hash, tamano, mtime}.
+    Si la ruta, el tamaño y la fecha de modificación coinciden con una
+    carga registrada el archivo se omite sin leerlo; si no, se calcula el
+    hash y se compara por contenido (un archivo copiado o renombrado
+    también se reconoce). Con forzar=True se devuelven todos.
+    """
+    base_destino = engine.url.database
+    with engine.begin() as conn:
+        asegurar_tabla(conn)
+        registrados = pd.read_sql(text("""
+            SELECT hash_archivo, ruta_archivo, tamano_bytes, fecha_modificacion
+            FROM load_ledger
+            WHERE base_destino = :base
+        """), conn, params={"base": base_destino})
+
+    por_ruta = {
+        (fila.ruta_archivo, fila.tamano_bytes, fila.fecha_modificacion)
+        for fila in registrados.itertuples(index=False)
+    }
+    hashes = set(registrados['hash_archivo'].str.strip())
+
+    pendientes = []
+    for ruta in rutas:
+        info = os.stat(ruta)
+        archivo = {'ruta': ruta, 'hash': None, 'tamano': info.st_size, 'mtime': info.st_mtime}
+        if not forzar and (os.path.abspath(ruta), info.st_size, info.st_mtime) in por_ruta:
+            logging.info(f"⏭️ Ya cargado (sin cambios): {os.path.basename(ruta)}")
+            continue
+        archivo['hash'] = hash_archivo(ruta)
+        if not forzar and archivo['hash'] in hashes:
+            logging.info(f"⏭️ Ya cargado (mismo contenido): {os.path.basename(ruta)}")
+            continue
+        pendientes.append(archivo)
+
+    logging.info(
+        f"📒 load_ledger '{base_destino}': {len(pendientes)} de {len(rutas)} archivo(s) por cargar"
+        + (" (--force)" if forzar else "")
+    )
+    return pendientes
+
+
+# ==============================
+# Registro después de cargar
+# ==============================
+def registrar_cargas(conn, archivos, id_periodo):
+    """
+    Registra en load_ledger los archivos cargados. Cada dict de `archivos`
+    debe traer 'filas'; `id_periodo` es la columna id_periodo del DataFrame
+    final, con las filas en el mismo orden que los archivos (así se obtienen
+    los períodos de cada uno). Una recarga con --force actualiza el registro.
+    `conn` debe ser la transacción que inserta cliente_plan_info: si la
+    carga falla, el archivo tampoco queda registrado y se vuelve a cargar.
+    """
+    base_destino = conn.engine.url.database
+    id_periodo = pd.Series(id_periodo).reset_index(drop=True)
+
+    inicio = 0
+    asegurar_tabla(conn)
+    for archivo in archivos:
+        fin = inicio + archivo['filas']
+        ids = sorted(int(v) for v in id_periodo.iloc[inicio:fin].dropna().unique())
+        inicio = fin
+        conn.execute(text("""
+            INSERT INTO load_ledger (hash_archivo, ruta_archivo, tamano_bytes, fecha_modificacion,
+                                     filas, base_destino, ids_periodo)
+            VALUES (:hash, :ruta, :tamano, :mtime, :filas, :base, :ids)
+            ON CONFLICT (hash_archivo, base_destino) DO UPDATE SET
+                ruta_archivo = EXCLUDED.ruta_archivo,
+                tamano_bytes = EXCLUDED.tamano_bytes,
+                fecha_modificacion = EXCLUDED.fecha_modificacion,
+                filas = EXCLUDED.filas,
+                ids_periodo = EXCLUDED.ids_periodo,
+                fecha_carga = CURRENT_TIMESTAMP
+        """), {
+            "hash": archivo['hash'] or hash_archivo(archivo['ruta']),
+            "ruta": os.path.abspath(archivo['ruta']),
+            "tamano": archivo['tamano'],
+            "mtime": archivo['mtime'],
+            "filas": archivo['filas'],
+            "base": base_destino,
+            "ids": ids,
+        })
+
+    logging.info(f"📒 load_ledger '{base_destino}': {len(archivos)} archivo(s) registrados.")
@@ -0,0 +1,152 @@
+import pandas as pd # Requiere: pip install pandas numpy pytest
+import numpy as np # Generación de entradas aleatorias
+import unicodedata # Para las funciones de referencia
+import re # Para las funciones de referencia
+import pytest # Requiere: pip install pytest
+import normalizacion # Archivo local: normalizacion.py
+
+
+# ==============================
+# Funciones actuales (por fila), copiadas tal cual de los cargadores
+# ==============================
+def ref_limpiar_sin_tildes(texto):  # pospago.py / pyme.py
+    if pd.isna(texto):
+        return ""
+    try:
+        texto = (
+            texto.encode('latin1', errors='ignore')
+            .decode('utf-8', errors='ignore')
+        )
+    except Exception:
+        pass
+
+    texto = unicodedata.normalize('NFKD', texto)
+    texto = texto.encode('ascii', 'ignore').decode('utf-8')
+    texto = texto.replace('/', ' ')
+    texto = re.sub(r'[^A-Za-z0-9Ññ\s.,-]', '', texto)
+    texto = re.sub(r'\s+', ' ', texto).strip()
+    texto = texto.upper()
+    return texto
+
+
+def ref_normalizar_celular(c):  # pospago.py / prepago.py / pyme.py
+    if pd.isna(c):
+        return ""
+    c = str(c).strip().replace(".0", "")
+    c = "".join(filter(str.isdigit, c))
+    if len(c) == 9:
+        return "0" + c
+    elif len(c) == 8:
+        return "09" + c
+    return c
+
+
+def ref_normalizar_celular_prepago(valor):  # cargacompletapre.py / cargarbasesprepago.py
+    valor = str(valor).strip()
+    if valor == '':
+        return ''
+    try:
+        return str(int(float(valor))).zfill(10)
+    except ValueError:
+        return valor
+
+
+def ref_limpiar_identificacion(valor):  # cargacompletapre.py / cargarbasesprepago.py
+    valor = str(valor).strip()
+    if valor.endswith('.0'):
+        try:
+            return str(int(float(valor)))
+        except ValueError:
+            return valor
+    return valor
+
+
+ref_mask_celular_invalido = lambda x: len(''.join(filter(str.isdigit, x))) < 8
+ref_celular_norm = lambda x: ''.join(filter(str.isdigit, x))
+
+PARES = [
+    # (nombre, vectorizada, por fila, admite nulos / no texto)
+    ('limpiar_sin_tildes', normalizacion.limpiar_sin_tildes, ref_limpiar_sin_tildes, False),
+    ('normalizar_celular', normalizacion.normalizar_celular, ref_normalizar_celular, True),
+    ('normalizar_celular_prepago', normalizacion.normalizar_celular_prepago, ref_normalizar_celular_prepago, False),
+    ('limpiar_identificacion', normalizacion.limpiar_identificacion, ref_limpiar_identificacion, False),
+    ('mask_celular_invalido', normalizacion.mask_celular_invalido, ref_mask_celular_invalido, False),
+    ('celular_norm', normalizacion.celular_norm, ref_celular_norm, False),
+]
+
+
+# ==============================
+# Entradas: bordes conocidos y textos aleatorios
+# ==============================
+ALFABETO = list("0123456789" * 4 + "..  -+e/\tabcXYZ,áéíóúÑñü" + "²٣①" + " ")
+
+BORDES = [
+    '', ' ', '0', '00', '.0', '0.0', '00.0', '12.', '12.50', '1e3', '1e3.0', 'nan', 'None', '-5.0',
+    '+7.0', '0991234567', '991234567', '99123456', '99123456.0', '0990.05', ' 098 765 432 ', '٣٣٣٣٣٣٣٣',
+    '²²²²²²²²²', '1234567890123456.0', '12345678901234567890', '1712345678.0', 'ÁÉÍÓÚ/ñ', 'Débito  automático',
+    'TARJETA DE CRÉDITO', 'Débito', 'ÃƒÂ©', ' 123 ', '123\n', '0000000000.0', '..00',
+    '123\x00', '\x00', '12\n3', '99123456.0 ', '0991234567.0', '000000000000000099', '9' * 21,
+]
+
+NO_TEXTO = [np.nan, None, 991234567.0, 99123456.0, 5, 0.5]
+
+
+def textos_aleatorios(n, semilla=2025):
+    rng = np.random.default_rng(semilla)
+    largos = rng.integers(0, 18, n)
+    return [''.join(rng.choice(ALFABETO, k)) for k in largos]
+
+
+def _lanza(funcion, valor):
+    try:
+        funcion(valor)
+        return False
+    except Exception:
+        return True
+
+
+def entradas(admite_nulos, n=20000):
+    datos = BORDES + textos_aleatorios(n)
+    if admite_nulos:
+        datos += NO_TEXTO
+    return pd.Series(datos, dtype=object)
+
+
+# ==============================
+# Propiedad: mismo resultado que la función actual
+# ==============================
+@pytest.mark.parametrize('nombre, vectorizada, por_fila, admite_nulos', PARES, ids=[p[0] for p in PARES])
+def test_igual_a_la_funcion_por_fila(nombre, vectorizada, por_fila, admite_nulos):
+    datos = entradas(admite_nulos)
+    # Entradas con las que la función actual lanza excepción (p. ej. '1e999' → OverflowError)
+    datos = datos[~datos.map(lambda d: _lanza(por_fila, d))]
+    # Índice desordenado y repetido, como tras filtrar o concatenar lotes
+    datos.index = np.arange(len(datos)) % 1000
+
+    esperado = [por_fila(d) for d in datos]
+    obtenido = vectorizada(datos)
+
+    assert obtenido.index.equals(datos.index)
+    distintos = [(d, e, o) for d, e, o in zip(datos, esperado, obtenido) if e != o]
+    assert not distintos, f"{nombre}: {len(distintos)} diferencias, por ejemplo {distintos[:5]}"
+
+
+@pytest.mark.parametrize('nombre, vectorizada, por_fila, admite_nulos', PARES, ids=[p[0] for p in PARES])
+def test_serie_vacia(nombre, vectorizada, por_fila, admite_nulos):
+    assert len(vectorizada(pd.Series([], dtype=object))) == 0
+
+
+def test_celular_con_dtype_str():
+    # read_excel(dtype=str) deja los vacíos como NaN
+    serie = pd.Series(['991234567', None, '99123456.0'], dtype=str)
+    assert normalizacion.normalizar_celular(serie).tolist() == ['0991234567', '', '0999123456']
+
+
+@pytest.mark.parametrize('nombre, vectorizada, por_fila, admite_nulos', PARES, ids=[p[0] for p in PARES])
+def test_varios_bloques(nombre, vectorizada, por_fila, admite_nulos, monkeypatch):
+    # Bloques chicos: uno solo ASCII y otros con tildes (las dos conversiones)
+    monkeypatch.setattr(normalizacion, 'BLOQUE', 7)
+    datos = pd.Series(['991234567', '99123456.0', '0991234567', '1712345678.0', '5', '', '12.50'] + BORDES,
+                      dtype=object)
+    datos = datos[~datos.map(lambda d: _lanza(por_fila, d))]
+    assert vectorizada(datos).tolist() == [por_fila(d) for d in datos]
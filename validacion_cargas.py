@@ -0,0 +1,178 @@
+import pandas as pd # Requiere: pip install pandas numpy openpyxl
+import numpy as np # Máscaras por regla
+import logging # Para logging
+import os # Para rutas en la línea de comandos
+import sys # Para la validación previa desde la línea de comandos
+import time # Para medir la validación
+import normalizacion # Archivo local: normalizacion.py
+import validacion_identificacion # Archivo local: validacion_identificacion.py
+from copia_excel import guardar_excel # Archivo local: copia_excel.py
+
+
+# ==============================
+# Reglas de validación de pospago / prepago / pyme
+# ==============================
+# Las columnas derivadas (dígitos del celular, duplicados, motivo de la
+# identificación...) se calculan una sola vez en _derivadas; cada regla
+# es solo una combinación de esas columnas. `hoja` es la hoja del reporte
+# INCORRECTA_*.xlsx donde van las filas que no cumplen la regla y
+# `columnas` agrega columnas a esa hoja. Las reglas con 'bloqueante': False
+# solo van al reporte: la carga sigue.
+REGLAS = [
+    {
+        'regla': 'identificacion_vacia',
+        'descripcion': "Identificación vacía con nombre",
+        'hoja': 'Incompletos',
+        'mascara': lambda d: d['identificacion_vacia'] & ~d['nombre_vacio'],
+    },
+    {
+        'regla': 'celular_invalido',
+        'descripcion': "Celular con menos de 8 dígitos",
+        'hoja': 'Incompletos',
+        'mascara': lambda d: d['digitos_celular'] < 8,
+    },
+    {
+        'regla': 'celular_duplicado',
+        'descripcion': "Celular repetido en el archivo",
+        'hoja': 'Duplicados_Celular',
+        'mascara': lambda d: d['celular_duplicado'],
+    },
+    {
+        'regla': 'identificacion_invalida',
+        'descripcion': "Cédula o RUC inválido",
+        'hoja': 'Identificacion_Invalida',
+        'bloqueante': False,
+        'mascara': lambda d: d['motivo_identificacion'] != '',
+        'columnas': {'motivo': lambda d: d['motivo_identificacion'].map(validacion_identificacion.MOTIVOS)},
+    },
+]
+
+COLUMNAS_REQUERIDAS = ['nombre_completo', 'identificacion', 'celular']
+
+
+def preparar(df):
+    """Crea las columnas requeridas que falten y las deja como texto sin nulos."""
+    for col_exp in COLUMNAS_REQUERIDAS:
+        if col_exp not in df.columns:
+            logging.warning(f"⚠️ Columna esperada '{col_exp}' no encontrada. Se creará vacía.")
+            df[col_exp] = ""
+        df[col_exp] = df[col_exp].fillna('').astype(str)
+    return df
+
+
+def _vacio(serie):
+    """True donde el texto está vacío o solo tiene espacios."""
+    return pd.Series(
+        np.fromiter((not t.strip() for t in serie.tolist()), dtype=bool, count=len(serie)),
+        index=serie.index,
+    )
+
+
+def _derivadas(df):
+    """Columnas que usan las reglas, calculadas una sola vez."""
+    celular_norm = normalizacion.celular_norm(df['celular'])
+    digitos = np.fromiter(map(len, celular_norm.tolist()), dtype=np.int64, count=len(celular_norm))
+    return {
+        'identificacion_vacia': _vacio(df['identificacion']),
+        'nombre_vacio': _vacio(df['nombre_completo']),
+        'celular_norm': celular_norm,
+        'digitos_celular': pd.Series(digitos, index=df.index),
+        'celular_duplicado': celular_norm.duplicated(keep=False) & (celular_norm != ''),
+        'motivo_identificacion': validacion_identificacion.motivo_identificacion(df['identificacion']),
+    }
+
+
+# ==============================
+# Validación
+# ==============================
+def validar(df, reglas=REGLAS):
+    """
+    Evalúa todas las reglas sobre `df` (ya preparado). Retorna un dict con:
+    mascaras (regla → Serie booleana), conteos (regla → filas que no
+    cumplen), derivadas, reglas, hay_errores (reglas bloqueantes) y
+    hay_avisos (reglas que solo van al reporte).
+    """
+    inicio = time.perf_counter()
+    derivadas = _derivadas(df)
+    mascaras = {r['regla']: r['mascara'](derivadas) for r in reglas}
+    conteos = {regla: int(mascara.sum()) for regla, mascara in mascaras.items()}
+
+    resumen = ", ".join(f"{regla}={n}" for regla, n in conteos.items())
+    logging.info(f"📋 Validación de {len(df)} filas en {time.perf_counter() - inicio:.2f} s: {resumen}")
+    if conteos.get('identificacion_invalida'):
+        motivos = validacion_identificacion.resumen_motivos(derivadas['motivo_identificacion'])
+        logging.warning(f"🪪 Identificaciones inválidas: {motivos}")
+
+    return {
+        'mascaras': mascaras,
+        'conteos': conteos,
+        'derivadas': derivadas,
+        'reglas': reglas,
+        'hay_errores': any(conteos[r['regla']] for r in reglas if r.get('bloqueante', True)),
+        'hay_avisos': any(conteos[r['regla']] for r in reglas if not r.get('bloqueante', True)),
+    }
+
+
+def hojas_reporte(df, resultado):
+    """
+    Hojas del reporte INCORRECTA_*.xlsx: por cada hoja, las filas de `df`
+    que no cumplen alguna de sus reglas (en el orden del archivo), con la
+    columna celular_norm y las columnas extra de las reglas.
+    """
+    derivadas = resultado['derivadas']
+    hojas = {}
+    for hoja in dict.fromkeys(r['hoja'] for r in resultado['reglas']):
+        reglas = [r for r in resultado['reglas'] if r['hoja'] == hoja]
+        mascara = np.logical_or.reduce([resultado['mascaras'][r['regla']].to_numpy() for r in reglas])
+        if not mascara.any():
+            continue
+        filas = df.loc[mascara].copy()
+        filas['celular_norm'] = derivadas['celular_norm'][mascara]
+        for r in reglas:
+            for columna, calcular in r.get('columnas', {}).items():
+                filas[columna] = calcular(derivadas)[mascara]
+        hojas[hoja] = filas
+    return hojas
+
+
+def escribir_reporte(df, resultado, ruta):
+    """Escribe el reporte en streaming (encabezados sin negrita desde el inicio)."""
+    hojas = hojas_reporte(df, resultado)
+    guardar_excel(hojas, ruta)
+    logging.info(f"📄 Reporte de registros incorrectos: {ruta} ({', '.join(f'{h}: {len(f)}' for h, f in hojas.items())})")
+    return hojas
+
+
+# ==============================
+# Validación previa desde la línea de comandos
+# ==============================
+def leer_archivo(ruta):
+    """Lee el archivo como lo hacen pospago.py / prepago.py / pyme.py."""
+    if ruta.lower().endswith(".csv"):
+        df = pd.read_csv(ruta)
+    else:
+        df = pd.read_excel(ruta, sheet_name=0)
+    df.columns = [c.lower().strip() for c in df.columns]
+    return df
+
+
+if __name__ == "__main__":
+    # Uso: python validacion_cargas.py archivo.xlsx [--reporte]
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    argumentos = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if not argumentos:
+        sys.exit("Uso: python validacion_cargas.py archivo.xlsx [--reporte]")
+
+    errores = False
+    for ruta in argumentos:
+        df = preparar(leer_archivo(ruta))
+        resultado = validar(df)
+        for regla in REGLAS:
+            n = resultado['conteos'][regla['regla']]
+            icono = '✅' if not n else '❌' if regla.get('bloqueante', True) else '⚠️'
+            print(f"{icono} {os.path.basename(ruta)} - {regla['descripcion']}: {n}")
+        if (resultado['hay_errores'] or resultado['hay_avisos']) and '--reporte' in sys.argv[1:]:
+            nombre = os.path.splitext(os.path.basename(ruta))[0]
+            escribir_reporte(df, resultado, os.path.join(os.path.dirname(ruta), f"INCORRECTA_{nombre}.xlsx"))
+        errores = errores or resultado['hay_errores']
+    sys.exit(1 if errores else 0)
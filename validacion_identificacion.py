@@ -0,0 +1,176 @@
+import pandas as pd # Requiere: pip install pandas numpy
+import numpy as np # Aritmética sobre la matriz de dígitos
+
+
+# ==============================
+# Validación de cédulas y RUC ecuatorianos por lotes
+# ==============================
+# Misma regla que validar_cedula del script `verificador`, pero sobre una
+# matriz de dígitos (una fila por identificación, una columna por dígito):
+# se validan millones de identificaciones con unas pocas operaciones NumPy.
+
+COEF_CEDULA = np.array([2, 1, 2, 1, 2, 1, 2, 1, 2])
+COEF_SOCIEDAD = np.array([4, 3, 2, 7, 6, 5, 4, 3, 2])   # RUC de sociedades privadas (3er dígito 9)
+COEF_PUBLICA = np.array([3, 2, 7, 6, 5, 4, 3, 2])       # RUC de entidades públicas (3er dígito 6)
+
+MOTIVOS = {
+    'LONGITUD': "Identificación numérica que no tiene 10 ni 13 dígitos",
+    'PROVINCIA': "Código de provincia fuera de 01-24",
+    'TERCER_DIGITO': "Tercer dígito no válido",
+    'DIGITO_VERIFICADOR': "Dígito verificador incorrecto",
+    'ESTABLECIMIENTO': "RUC con establecimiento 000",
+}
+# Códigos internos: posición en esta lista (0 = válida)
+CODIGOS = np.array([''] + list(MOTIVOS), dtype=object)
+LONGITUD, PROVINCIA, TERCER_DIGITO, DIGITO_VERIFICADOR, ESTABLECIMIENTO = range(1, 6)
+
+
+def _matriz(textos, largo):
+    """
+    Matriz (n, largo) con los dígitos de `textos` (todos de `largo`
+    caracteres). Los caracteres que no son dígitos ASCII quedan fuera del
+    rango 0-9 ('replace' mantiene un byte por carácter).
+    """
+    b = np.frombuffer(''.join(textos).encode('ascii', 'replace'), dtype=np.uint8)
+    return b.reshape(-1, largo).astype(np.int16) - 48
+
+
+def _es_numerica(d):
+    return ((d >= 0) & (d <= 9)).all(axis=1)
+
+
+def _modulo_10(d):
+    """Dígito verificador de cédula (columnas 0-8, verificador en la 9)."""
+    productos = d[:, :9] * COEF_CEDULA
+    productos = np.where(productos >= 10, productos - 9, productos)
+    return (productos.sum(axis=1) + d[:, 9]) % 10 == 0
+
+
+def _modulo_11(d, coeficientes, columna):
+    """Dígito verificador de RUC de sociedad o entidad pública."""
+    residuo = (d[:, :len(coeficientes)] * coeficientes).sum(axis=1) % 11
+    esperado = np.where(residuo == 0, 0, 11 - residuo)
+    return (esperado != 10) & (esperado == d[:, columna])
+
+
+def _motivos_cedula(d):
+    provincia = d[:, 0] * 10 + d[:, 1]
+    return np.select(
+        [(provincia < 1) | (provincia > 24), d[:, 2] >= 6, ~_modulo_10(d)],
+        [PROVINCIA, TERCER_DIGITO, DIGITO_VERIFICADOR],
+        default=0,
+    )
+
+
+def _motivos_ruc(d):
+    provincia = d[:, 0] * 10 + d[:, 1]
+    tercero = d[:, 2]
+    natural, publica, sociedad = tercero < 6, tercero == 6, tercero == 9
+
+    verificador = np.select(
+        [natural, publica, sociedad],
+        [_modulo_10(d), _modulo_11(d, COEF_PUBLICA, 8), _modulo_11(d, COEF_SOCIEDAD, 9)],
+        default=False,
+    )
+    # Establecimiento: últimos 3 dígitos (últimos 4 en entidades públicas)
+    establecimiento = np.where(publica, d[:, 9:].sum(axis=1), d[:, 10:].sum(axis=1)) > 0
+
+    return np.select(
+        [(provincia < 1) | (provincia > 24), ~(natural | publica | sociedad), ~verificador, ~establecimiento],
+        [PROVINCIA, TERCER_DIGITO, DIGITO_VERIFICADOR, ESTABLECIMIENTO],
+        default=0,
+    )
+
+
+def _textos(serie):
+    """str(valor) de cada elemento; los nulos quedan como ''."""
+    return np.array(list(map(str, serie.fillna('').to_numpy(dtype=object).tolist())), dtype=object)
+
+
+# Formas en que llegan las identificaciones desde Excel:
+# (largo del texto, termina en '.0', perdió el cero inicial, largo validado)
+FORMAS = [
+    (10, False, False, 10), (9, False, True, 10), (12, True, False, 10), (11, True, True, 10),
+    (13, False, False, 13), (12, False, True, 13), (15, True, False, 13), (14, True, True, 13),
+]
+PUNTO = ord('.') - 48
+
+
+def _clasificar(textos):
+    """
+    Valida los textos que son una cédula o un RUC en alguna de las FORMAS.
+    Retorna (motivo, numerica): `numerica` marca los textos que se pudieron
+    validar; `motivo` es el código de MOTIVOS (0 si es válida).
+    """
+    largo = np.fromiter(map(len, textos), dtype=np.int64, count=len(textos))
+    motivo = np.zeros(len(textos), dtype=np.int8)
+    numerica = np.zeros(len(textos), dtype=bool)
+    for largo_texto, punto_cero, cero_inicial, largo_id in FORMAS:
+        filas = np.flatnonzero((largo == largo_texto) & ~numerica)
+        d = _matriz(textos[filas], largo_texto)
+        forma = np.ones(len(filas), dtype=bool)
+        if punto_cero:
+            forma = (d[:, -2] == PUNTO) & (d[:, -1] == 0)
+            d = d[:, :-2]
+        if cero_inicial:
+            d = np.hstack([np.zeros((len(d), 1), dtype=d.dtype), d])
+        forma &= _es_numerica(d)
+        d, filas = d[forma], filas[forma]
+
+        motivos = _motivos_cedula(d) if largo_id == 10 else _motivos_ruc(d)
+        # Consumidor final (todo nueves) no se valida
+        motivos[(d == 9).all(axis=1)] = 0
+        motivo[filas] = motivos
+        numerica[filas] = True
+    return motivo, numerica
+
+
+# ==============================
+# Funciones públicas
+# ==============================
+def validar_cedulas(serie):
+    """
+    Versión por lotes de validar_cedula: True donde el texto es una cédula
+    válida (10 dígitos, provincia 01-24, tercer dígito < 6 y módulo 10).
+    """
+    textos = _textos(serie)
+    largo = np.fromiter(map(len, textos), dtype=np.int64, count=len(textos))
+    valida = np.zeros(len(textos), dtype=bool)
+    filas = np.flatnonzero(largo == 10)
+    d = _matriz(textos[filas], 10)
+    numerica = _es_numerica(d)
+    valida[filas[numerica]] = _motivos_cedula(d[numerica]) == 0
+    return pd.Series(valida, index=serie.index)
+
+
+def motivo_identificacion(serie):
+    """
+    Motivo (clave de MOTIVOS) por el que cada identificación no es una
+    cédula ni un RUC válido; '' si es válida. Se aceptan las formas que
+    deja Excel ('1712345678.0', '912345678' sin el cero de la provincia).
+    Los valores vacíos, no numéricos (pasaportes) y de consumidor final
+    (9999999999) no se validan.
+    """
+    textos = _textos(serie)
+    motivo, numerica = _clasificar(textos)
+
+    # El resto (espacios alrededor, pasaportes, vacíos...) se revisa por fila:
+    # suelen ser pocas filas
+    revisar = np.flatnonzero(~numerica)
+    if len(revisar):
+        limpias = np.array([t.strip() for t in textos[revisar]], dtype=object)
+        motivo_revisado, numerica_revisada = _clasificar(limpias)
+        sin_decimal = [t.removesuffix('.0') for t in limpias]
+        otra_longitud = np.fromiter(
+            (t.isascii() and t.isdigit() for t in sin_decimal), dtype=bool, count=len(limpias)
+        ) & ~numerica_revisada
+        motivo_revisado[otra_longitud] = LONGITUD
+        motivo[revisar] = motivo_revisado
+
+    return pd.Series(CODIGOS[motivo], index=serie.index)
+
+
+def resumen_motivos(motivo):
+    """Texto con la cantidad de identificaciones inválidas por motivo, para el log."""
+    conteo = motivo[motivo != ''].value_counts()
+    return ", ".join(f"{MOTIVOS[m]}: {n}" for m, n in conteo.items())